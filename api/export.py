@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Stream entries as CSV or newline delimited JSON.
+
+Entries are read in chunks and written row by row, so exports of any size
+use constant memory. Columns are those of the admin export.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django_filters.utils import translate_validation
+
+from core import admin
+
+from . import filters
+
+# Exportable models by name (as used in the API routes), with the resource
+# providing their columns and the filter set used to select entries.
+EXPORTS = {
+    "bmi": (admin.BMIImportExportResource, filters.BMIFilter),
+    "changes": (admin.DiaperChangeImportExportResource, filters.DiaperChangeFilter),
+    "expirables": (admin.ExpirableImportExportResource, filters.ExpirableFilter),
+    "feedings": (admin.FeedingImportExportResource, filters.FeedingFilter),
+    "head-circumference": (
+        admin.HeadCircumferenceImportExportResource,
+        filters.HeadCircumferenceFilter,
+    ),
+    "height": (admin.HeightImportExportResource, filters.HeightFilter),
+    "medications": (admin.MedicationImportExportResource, filters.MedicationFilter),
+    "notes": (admin.NoteImportExportResource, filters.NoteFilter),
+    "pumping": (admin.PumpingImportExportResource, filters.PumpingFilter),
+    "sleep": (admin.SleepImportExportResource, filters.SleepFilter),
+    "temperature": (admin.TemperatureImportExportResource, filters.TemperatureFilter),
+    "tummy-times": (admin.TummyTimeImportExportResource, filters.TummyTimeFilter),
+    "weight": (admin.WeightImportExportResource, filters.WeightFilter),
+}
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """A file-like object returning what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def get_queryset(name, params=None, queryset=None):
+    """
+    Get the entries to export.
+    :param name: a key of EXPORTS.
+    :param params: a dictionary of filter set parameters, e.g. `child` or
+                   `start_min`.
+    :param queryset: a queryset to filter instead of all entries.
+    :returns: a queryset of the model's entries.
+    :raises ValidationError: if the parameters are invalid.
+    """
+    resource_class, filterset_class = EXPORTS[name]
+    model = resource_class._meta.model
+    if queryset is None:
+        queryset = model.objects.all()
+    filterset = filterset_class(params or {}, queryset=queryset)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    queryset = filterset.qs.select_related("child").order_by("pk")
+    if hasattr(model, "tags"):
+        queryset = queryset.prefetch_related("tags")
+    return queryset
+
+
+def stream(name, queryset, file_format="csv", chunk_size=CHUNK_SIZE):
+    """
+    Generate the lines of an export.
+    :param name: a key of EXPORTS.
+    :param queryset: the entries to export, see `get_queryset`.
+    :param file_format: a key of FORMATS.
+    :param chunk_size: the number of entries read from the database at once.
+    :returns: a generator of strings, each ending with a line break.
+    """
+    resource = EXPORTS[name][0]()
+    headers = resource.get_export_headers()
+    entries = queryset.iterator(chunk_size=chunk_size)
+    if file_format == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(headers)
+        for entry in entries:
+            yield writer.writerow(resource.export_resource(entry))
+    else:
+        for entry in entries:
+            row = dict(zip(headers, resource.export_resource(entry)))
+            yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
@@ -24,6 +24,19 @@ class TagsFieldFilter(filters.FilterSet):
         abstract = True
 
 
+class DateFieldFilter(ChildFieldFilter):
+    date_max = filters.DateFilter(
+        field_name="date", label="Max. Date", lookup_expr="lte"
+    )
+    date_min = filters.DateFilter(
+        field_name="date", label="Min. Date", lookup_expr="gte"
+    )
+
+    class Meta:
+        abstract = True
+        fields = sorted(ChildFieldFilter.Meta.fields + ["date", "date_max", "date_min"])
+
+
 class TimeFieldFilter(ChildFieldFilter):
     date = filters.IsoDateTimeFilter(field_name="time", label="DateTime")
     date_max = filters.IsoDateTimeFilter(
@@ -62,6 +75,11 @@ class StartEndFieldFilter(ChildFieldFilter):
         )
 
 
+class BMIFilter(DateFieldFilter):
+    class Meta(DateFieldFilter.Meta):
+        model = models.BMI
+
+
 class ExpirableFilter(TimeFieldFilter, TagsFieldFilter):
     class Meta(TimeFieldFilter.Meta):
         model = models.Expirable
@@ -82,6 +100,16 @@ class FeedingFilter(StartEndFieldFilter, TagsFieldFilter):
         fields = sorted(StartEndFieldFilter.Meta.fields + ["type", "method"])
 
 
+class HeadCircumferenceFilter(DateFieldFilter):
+    class Meta(DateFieldFilter.Meta):
+        model = models.HeadCircumference
+
+
+class HeightFilter(DateFieldFilter):
+    class Meta(DateFieldFilter.Meta):
+        model = models.Height
+
+
 class NoteFilter(TimeFieldFilter, TagsFieldFilter):
     class Meta(TimeFieldFilter.Meta):
         model = models.Note
@@ -122,3 +150,8 @@ class TimerFilter(StartEndFieldFilter):
 class TummyTimeFilter(StartEndFieldFilter, TagsFieldFilter):
     class Meta(StartEndFieldFilter.Meta):
         model = models.TummyTime
+
+
+class WeightFilter(DateFieldFilter):
+    class Meta(DateFieldFilter.Meta):
+        model = models.Weight
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 import datetime
+import json
 from unittest.mock import patch
 
 from babybuddy.models import get_user_model
+from django.contrib.auth.models import Permission
 from core import models
 from core.choices import (
     DiaperColor,
@@ -17,6 +19,8 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
+from reports.pool import RenderFailed, RenderTimeout
+
 
 class TestBase:
     class BabyBuddyAPITestCaseBase(APITestCase):
@@ -1051,6 +1055,281 @@ class TestLastActivitiesView(APITestCase):
         self.assertEqual(response.data["temperature"]["temperature"], 37.1)
 
 
+class TestMedicationAdherenceView(APITestCase):
+    fixtures = ["tests.json"]
+
+    def setUp(self):
+        self.client.login(username="admin", password="admin")
+        self.child = models.Child.objects.first()
+        self.endpoint = reverse(
+            "api:child-medication-adherence", kwargs={"slug": self.child.slug}
+        )
+        self.schedule = models.MedicationSchedule.objects.create(
+            child=self.child,
+            name="Vitamin D",
+            frequency=MedicationFrequency.DAILY,
+            schedule_time=datetime.time(9, 0),
+        )
+        # Doses are due in the user's time zone.
+        with timezone.override("America/New_York"):
+            for day in (1, 3):
+                models.Medication.objects.create(
+                    child=self.child,
+                    medication_schedule=self.schedule,
+                    name="Vitamin D",
+                    time=timezone.make_aware(datetime.datetime(2024, 1, day, 9, 30)),
+                )
+
+    def test_get(self):
+        response = self.client.get(
+            self.endpoint, {"from": "2024-01-01", "to": "2024-01-04"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["from"], datetime.date(2024, 1, 1))
+        (schedule,) = response.data["schedules"]
+        self.assertEqual(schedule["schedule"], self.schedule.id)
+        self.assertEqual(schedule["expected"], 4)
+        self.assertEqual(schedule["taken"], 2)
+        self.assertEqual(schedule["on_time"], 2)
+        self.assertEqual(schedule["missed"], 2)
+        self.assertEqual(schedule["rate"], 0.5)
+        self.assertNotIn("occurrences", schedule)
+
+        response = self.client.get(
+            self.endpoint,
+            {"from": "2024-01-01", "to": "2024-01-02", "occurrences": "true"},
+        )
+        occurrences = response.data["schedules"][0]["occurrences"]
+        self.assertEqual(len(occurrences), 2)
+        self.assertIsNotNone(occurrences[0]["dose_time"])
+        self.assertIsNone(occurrences[1]["dose_time"])
+
+    def test_report(self):
+        response = self.client.get(
+            reverse("api:report", args=["medication-adherence", self.child.slug]),
+            {"from": "2024-01-01", "to": "2024-01-04"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        on_time, late, missed = response.data["data"]
+        self.assertEqual(sum(on_time["y"]), 2)
+        self.assertEqual(sum(late["y"]), 0)
+        self.assertEqual(sum(missed["y"]), 2)
+
+    def test_invalid(self):
+        response = self.client.get(self.endpoint, {"from": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            self.endpoint, {"from": "2024-01-02", "to": "2024-01-01"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_permissions(self):
+        user = get_user_model().objects.create_user(username="nope", password="nope")
+        user.user_permissions.add(*Permission.objects.filter(codename="view_child"))
+        self.client.login(username="nope", password="nope")
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestTimelineView(APITestCase):
+    fixtures = ["tests.json"]
+
+    def setUp(self):
+        self.client.login(username="admin", password="admin")
+        self.endpoint = reverse("api:timeline")
+        self.child = models.Child.objects.first()
+
+    def _collect(self, params):
+        results = []
+        response = self.client.get(self.endpoint, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results += response.data["results"]
+            if not response.data["next"]:
+                return results
+            response = self.client.get(response.data["next"])
+
+    def test_pages_match_full_timeline(self):
+        # Entries sharing a time are ordered by model and id across pages.
+        time = timezone.now().replace(microsecond=0)
+        models.Note.objects.create(child=self.child, note="Note", time=time)
+        models.Note.objects.create(child=self.child, note="Note", time=time)
+        models.DiaperChange.objects.create(
+            child=self.child, time=time, wet=True, solid=False
+        )
+        models.Temperature.objects.create(child=self.child, temperature=37.0, time=time)
+
+        full = self._collect({"limit": 1000})
+        keys = [(entry["type"], entry["data"]["id"]) for entry in full]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(keys[:4], sorted(keys[:4], reverse=True))
+        times = [datetime.datetime.fromisoformat(entry["time"]) for entry in full]
+        self.assertEqual(times, sorted(times, reverse=True))
+
+        for limit in (1, 3, 7):
+            self.assertEqual(self._collect({"limit": limit}), full)
+
+    def test_child_filter(self):
+        other = models.Child.objects.create(
+            first_name="Other", last_name="Child", birth_date=timezone.localdate()
+        )
+        models.Note.objects.create(child=other, note="Note", time=timezone.now())
+        results = self._collect({"child": other.id, "limit": 5})
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["type"], "note")
+        self.assertEqual(results[0]["data"]["child"], other.id)
+
+        response = self.client.get(self.endpoint, {"child": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.endpoint, {"cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_auth(self):
+        self.client.logout()
+        response = self.client.get(self.endpoint)
+        self.assertIn(response.status_code, [401, 403])
+
+
+class TestExportView(APITestCase):
+    fixtures = ["tests.json"]
+
+    def setUp(self):
+        self.client.login(username="admin", password="admin")
+        self.child = models.Child.objects.first()
+
+    def _get(self, name, params=None):
+        response = self.client.get(reverse("api:export", args=[name]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_csv(self):
+        lines = self._get("feedings")
+        self.assertEqual(lines[0].split(",")[:2], ["id", "child_first_name"])
+        self.assertEqual(len(lines) - 1, models.Feeding.objects.count())
+
+    def test_ndjson(self):
+        lines = self._get("changes", {"file_format": "ndjson"})
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), models.DiaperChange.objects.count())
+        self.assertEqual(
+            [int(row["id"]) for row in rows],
+            sorted(models.DiaperChange.objects.values_list("id", flat=True)),
+        )
+
+    def test_filters(self):
+        other = models.Child.objects.create(
+            first_name="Other", last_name="Child", birth_date=timezone.localdate()
+        )
+        time = timezone.now() - datetime.timedelta(days=1)
+        models.Sleep.objects.create(
+            child=other, start=time - datetime.timedelta(hours=1), end=time
+        )
+        lines = self._get("sleep", {"child": other.id, "file_format": "ndjson"})
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["child_first_name"], "Other")
+
+        lines = self._get(
+            "sleep", {"start_min": (time - datetime.timedelta(hours=2)).isoformat()}
+        )
+        self.assertEqual(len(lines), 2)
+
+        response = self.client.get(
+            reverse("api:export", args=["sleep"]), {"start_min": "nope"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid(self):
+        response = self.client.get(reverse("api:export", args=["children"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(
+            reverse("api:export", args=["sleep"]), {"file_format": "xlsx"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_permissions(self):
+        get_user_model().objects.create_user(username="nope", password="nope")
+        self.client.login(username="nope", password="nope")
+        response = self.client.get(reverse("api:export", args=["sleep"]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.logout()
+        response = self.client.get(reverse("api:export", args=["sleep"]))
+        self.assertIn(response.status_code, [401, 403])
+
+
+class TestReportView(APITestCase):
+    fixtures = ["tests.json"]
+
+    def setUp(self):
+        self.client.login(username="admin", password="admin")
+        self.child = models.Child.objects.first()
+        time = timezone.now() - datetime.timedelta(days=1)
+        models.Sleep.objects.create(
+            child=self.child, start=time - datetime.timedelta(hours=1), end=time
+        )
+
+    def _url(self, name, child=None):
+        return reverse("api:report", args=[name, child or self.child.slug])
+
+    def test_get(self):
+        response = self.client.get(self._url("sleep-totals"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        trace = response.data["data"][0]
+        self.assertEqual(trace["type"], "bar")
+        self.assertEqual(len(trace["x"]), len(trace["y"]))
+        self.assertIn("xaxis", response.data["layout"])
+
+        response = self.client.get(
+            self._url("sleep-totals"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_no_data(self):
+        child = models.Child.objects.create(
+            first_name="Other", last_name="Child", birth_date=timezone.localdate()
+        )
+        response = self.client.get(self._url("sleep-totals", child.slug))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"data": [], "layout": {}})
+
+    def test_invalid(self):
+        response = self.client.get(self._url("sleep"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self._url("sleep-totals", "nope"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self._url("sleep-totals"), {"bucket": "year"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_permissions(self):
+        get_user_model().objects.create_user(username="nope", password="nope")
+        self.client.login(username="nope", password="nope")
+        response = self.client.get(self._url("sleep-totals"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_pending(self):
+        with (
+            patch("reports.pool.report_pool._workers", 1),
+            patch("reports.pool.report_pool.render", side_effect=RenderTimeout),
+        ):
+            response = self.client.get(self._url("sleep-pattern"))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn("Retry-After", response)
+        self.assertNotIn("ETag", response)
+
+    def test_failed(self):
+        with (
+            patch("reports.pool.report_pool._workers", 1),
+            patch("reports.pool.report_pool.render", side_effect=RenderFailed),
+        ):
+            response = self.client.get(self._url("sleep-pattern"))
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertNotIn("Retry-After", response)
+        self.assertNotIn("ETag", response)
+
+
 class TestProfileAPITestCase(APITestCase):
     endpoint = reverse("api:profile")
 
@@ -66,6 +66,11 @@ router.register(r"tummy-times", views.TummyTimeViewSet)
 router.register(r"weight", views.WeightViewSet)
 
 router.add_detail_path("profile", "profile", views.ProfileView.as_view())
+router.add_detail_path("timeline", "timeline", views.TimelineView.as_view())
+router.add_detail_path("export/<str:name>", "export", views.ExportView.as_view())
+router.add_detail_path(
+    "reports/<str:name>/<str:child>/", "report", views.ReportView.as_view()
+)
 router.add_detail_path(
     "ha/discovery",
     "ha-discovery",
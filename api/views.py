@@ -1,13 +1,25 @@
 # -*- coding: utf-8 -*-
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 
+from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.schemas.openapi import AutoSchema
+from rest_framework.settings import api_settings
 
-from core import models
+from core import latest, models, occurrences, timeline, totals
 from core.choices import (
     DiaperColor,
     FeedingMethod,
@@ -17,6 +29,9 @@ from core.choices import (
 )
 from babybuddy import models as babybuddy_models
 from mqtt.stats import compute_stats
+from reports import utils as report_utils
+from reports.pool import RenderFailed, RenderTimeout
+from reports.views import REPORTS
 
 from core.metadata import (
     ACTIVITY_TYPES,
@@ -25,14 +40,14 @@ from core.metadata import (
     SENSOR_GROUP_MAP,
 )
 
-from . import serializers, filters
+from . import export, serializers, filters
 from .base import BabyBuddyAPIView, BabyBuddyModelViewSet
 
 
 class BMIViewSet(BabyBuddyModelViewSet):
     queryset = models.BMI.objects.all()
     serializer_class = serializers.BMISerializer
-    filterset_fields = ("child", "date")
+    filterset_class = filters.BMIFilter
     ordering_fields = ("child", "date")
     ordering = "-date"
 
@@ -47,24 +62,23 @@ class BMIViewSet(BabyBuddyModelViewSet):
 
 
 LAST_ACTIVITY_MODELS = [
-    ("feedings", models.Feeding, serializers.FeedingSerializer, "end"),
-    ("changes", models.DiaperChange, serializers.DiaperChangeSerializer, "time"),
-    ("sleep", models.Sleep, serializers.SleepSerializer, "end"),
-    ("pumping", models.Pumping, serializers.PumpingSerializer, "end"),
-    ("tummy-times", models.TummyTime, serializers.TummyTimeSerializer, "end"),
-    ("temperature", models.Temperature, serializers.TemperatureSerializer, "time"),
-    ("weight", models.Weight, serializers.WeightSerializer, "date"),
-    ("height", models.Height, serializers.HeightSerializer, "date"),
+    ("feedings", models.Feeding, serializers.FeedingSerializer),
+    ("changes", models.DiaperChange, serializers.DiaperChangeSerializer),
+    ("sleep", models.Sleep, serializers.SleepSerializer),
+    ("pumping", models.Pumping, serializers.PumpingSerializer),
+    ("tummy-times", models.TummyTime, serializers.TummyTimeSerializer),
+    ("temperature", models.Temperature, serializers.TemperatureSerializer),
+    ("weight", models.Weight, serializers.WeightSerializer),
+    ("height", models.Height, serializers.HeightSerializer),
     (
         "head-circumference",
         models.HeadCircumference,
         serializers.HeadCircumferenceSerializer,
-        "date",
     ),
-    ("bmi", models.BMI, serializers.BMISerializer, "date"),
-    ("notes", models.Note, serializers.NoteSerializer, "time"),
-    ("medications", models.Medication, serializers.MedicationSerializer, "time"),
-    ("timers", models.Timer, serializers.TimerSerializer, "start"),
+    ("bmi", models.BMI, serializers.BMISerializer),
+    ("notes", models.Note, serializers.NoteSerializer),
+    ("medications", models.Medication, serializers.MedicationSerializer),
+    ("timers", models.Timer, serializers.TimerSerializer),
 ]
 
 
@@ -89,15 +103,63 @@ class ChildViewSet(BabyBuddyModelViewSet):
         child = self.get_object()
         return Response(compute_stats(child))
 
+    @action(detail=True, methods=["get"], url_path="medication-adherence")
+    def medication_adherence(self, request, slug=None):
+        """
+        Return the doses of a child's medication schedules expected within the
+        dates of the `from` and `to` parameters (the last 90 days by default),
+        with the numbers taken (on time) and missed. Every expected dose is
+        included with `occurrences=true`.
+        """
+        child = self.get_object()
+        if not request.user.has_perms(
+            ["core.view_medication", "core.view_medicationschedule"]
+        ):
+            raise PermissionDenied()
+        try:
+            start, end = report_utils.date_range(request.query_params)
+        except BadRequest as e:
+            raise ValidationError(str(e))
+        include_occurrences = request.query_params.get("occurrences") == "true"
+
+        schedules = []
+        for adherence in occurrences.get_adherence(
+            models.MedicationSchedule.objects.filter(child=child).order_by("name"),
+            *totals.day_bounds(start, end),
+        ):
+            data = {
+                "schedule": adherence.schedule.pk,
+                "name": adherence.schedule.name,
+                "expected": adherence.expected,
+                "taken": adherence.taken,
+                "on_time": adherence.on_time,
+                "missed": adherence.missed,
+                "extra": len(adherence.extra),
+                "rate": adherence.rate,
+            }
+            if include_occurrences:
+                data["occurrences"] = [
+                    {
+                        "time": timezone.localtime(occurrence.time).isoformat(),
+                        "all_day": occurrence.all_day,
+                        "dose_time": occurrence.dose_time
+                        and timezone.localtime(occurrence.dose_time).isoformat(),
+                    }
+                    for occurrence in adherence.occurrences
+                ]
+            schedules.append(data)
+        return Response({"from": start, "to": end, "schedules": schedules})
+
     @action(detail=True, methods=["get"], url_path="last-activities")
     def last_activities(self, request, slug=None):
         """Return the last entry for every sensor type plus daily stats."""
         child = self.get_object()
+        entries = latest.get_child_latest(
+            child, [model for key, model, serializer_cls in LAST_ACTIVITY_MODELS]
+        )
         data = {}
-        for key, model, serializer_cls, order_field in LAST_ACTIVITY_MODELS:
-            entry = (
-                model.objects.filter(child=child).order_by(f"-{order_field}").first()
-            )
+        for key, model, serializer_cls in LAST_ACTIVITY_MODELS:
+            entry = entries[model]
             data[key] = (
                 serializer_cls(entry, context={"request": request}).data
                 if entry
@@ -143,7 +205,7 @@ class FeedingViewSet(BabyBuddyModelViewSet):
 class HeadCircumferenceViewSet(BabyBuddyModelViewSet):
     queryset = models.HeadCircumference.objects.all()
     serializer_class = serializers.HeadCircumferenceSerializer
-    filterset_fields = ("child", "date")
+    filterset_class = filters.HeadCircumferenceFilter
     ordering_fields = ("date", "head_circumference")
     ordering = "-date"
 
@@ -151,7 +213,7 @@ class HeadCircumferenceViewSet(BabyBuddyModelViewSet):
 class HeightViewSet(BabyBuddyModelViewSet):
     queryset = models.Height.objects.all()
     serializer_class = serializers.HeightSerializer
-    filterset_fields = ("child", "date")
+    filterset_class = filters.HeightFilter
     ordering_fields = ("date", "height")
     ordering = "-date"
 
@@ -238,7 +300,7 @@ class TummyTimeViewSet(BabyBuddyModelViewSet):
 class WeightViewSet(BabyBuddyModelViewSet):
     queryset = models.Weight.objects.all()
     serializer_class = serializers.WeightSerializer
-    filterset_fields = ("child", "date")
+    filterset_class = filters.WeightFilter
     ordering_fields = ("date", "weight")
     ordering = "-date"
 
@@ -260,6 +322,202 @@ class ProfileView(BabyBuddyAPIView):
         return Response(serializer.data)
 
 
+class TimelineView(BabyBuddyAPIView):
+    """
+    Time-ordered entries of all event types for one or all children, newest
+    first. Pages are linked with opaque cursors instead of offsets so reading
+    far back in the history costs the same as reading the first page.
+    """
+
+    schema = AutoSchema(operation_id_base="Timeline")
+    permission_classes = [IsAuthenticated]
+
+    max_limit = 1000
+    model_serializers = {
+        models.DiaperChange: serializers.DiaperChangeSerializer,
+        models.Expirable: serializers.ExpirableSerializer,
+        models.Feeding: serializers.FeedingSerializer,
+        models.Medication: serializers.MedicationSerializer,
+        models.Note: serializers.NoteSerializer,
+        models.Pumping: serializers.PumpingSerializer,
+        models.Sleep: serializers.SleepSerializer,
+        models.Temperature: serializers.TemperatureSerializer,
+        models.TummyTime: serializers.TummyTimeSerializer,
+    }
+
+    def get(self, request):
+        child = self._get_child(request)
+        limit = self._get_limit(request)
+        before = self._decode_cursor(request.query_params.get("cursor"))
+        page_models = [
+            model
+            for model in self.model_serializers
+            if request.user.has_perm(
+                "{}.view_{}".format(model._meta.app_label, model._meta.model_name)
+            )
+        ]
+
+        entries = []
+        next_key = None
+        if page_models:
+            entries, next_key = timeline.get_page(
+                limit, before=before, child=child, models=page_models
+            )
+
+        next_url = None
+        if next_key:
+            query = request.query_params.copy()
+            query["cursor"] = self._encode_cursor(next_key)
+            next_url = request.build_absolute_uri(
+                request.path + "?" + query.urlencode()
+            )
+
+        context = {"request": request}
+        return Response(
+            {
+                "next": next_url,
+                "results": [
+                    {
+                        "type": key.model_name,
+                        "time": timezone.localtime(key.time).isoformat(),
+                        "data": self.model_serializers[type(instance)](
+                            instance, context=context
+                        ).data,
+                    }
+                    for key, instance in entries
+                ],
+            }
+        )
+
+    @staticmethod
+    def _get_child(request):
+        child_id = request.query_params.get("child")
+        if not child_id:
+            return None
+        try:
+            return models.Child.objects.get(pk=int(child_id))
+        except (ValueError, models.Child.DoesNotExist):
+            raise ValidationError({"child": "Select a valid child."})
+
+    def _get_limit(self, request):
+        try:
+            limit = int(request.query_params.get("limit", api_settings.PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({"limit": "A valid integer is required."})
+        if limit < 1:
+            raise ValidationError({"limit": "Ensure this value is at least 1."})
+        return min(limit, self.max_limit)
+
+    @staticmethod
+    def _encode_cursor(key):
+        data = json.dumps([key.time.isoformat(), key.model_name, key.id])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            time, model_name, entry_id = json.loads(base64.urlsafe_b64decode(cursor))
+            time = datetime.fromisoformat(time)
+            if timezone.is_naive(time):
+                raise ValueError
+            return timeline.PageKey(time, str(model_name), int(entry_id))
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+
+class ExportView(BabyBuddyAPIView):
+    """
+    All entries of one type as a CSV or newline delimited JSON download,
+    streamed in chunks so any number of entries can be exported. Entries can
+    be filtered with the same parameters as the type's list endpoint (e.g.
+    `child` and `start_min`).
+    """
+
+    schema = AutoSchema(operation_id_base="Export")
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, name):
+        if name not in export.EXPORTS:
+            raise NotFound()
+        model = export.EXPORTS[name][0]._meta.model
+        if not request.user.has_perm(
+            "{}.view_{}".format(model._meta.app_label, model._meta.model_name)
+        ):
+            raise PermissionDenied()
+
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in export.FORMATS:
+            raise ValidationError(
+                {"file_format": "Select one of: {}.".format(", ".join(export.FORMATS))}
+            )
+        queryset = export.get_queryset(name, request.query_params)
+
+        response = StreamingHttpResponse(
+            export.stream(name, queryset, file_format),
+            content_type=export.FORMATS[file_format],
+        )
+        response["Content-Disposition"] = 'attachment; filename="{}.{}"'.format(
+            name, file_format
+        )
+        return response
+
+
+class ReportView(BabyBuddyAPIView):
+    """
+    The graph of a child report as plotly.js `data` (one trace per series,
+    with `x` and `y` arrays) and `layout`. Both are empty if there is not
+    enough data for the report. Entries are limited to the dates of the
+    `from` and `to` parameters (the last 90 days by default) and grouped by
+    the `bucket` parameter (`day`, `week` or `month`) where reports group
+    them by day. Responses have an ETag and are answered with 304 Not
+    Modified while the child's data is unchanged. Slow reports are answered
+    with 503 Service Unavailable while their graph is being created, and with
+    500 Internal Server Error if it could not be created.
+    """
+
+    schema = AutoSchema(operation_id_base="Report")
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, name, child):
+        if name not in REPORTS:
+            raise NotFound()
+        view = REPORTS[name]()
+        view.setup(request)
+        permissions = list(view.get_permission_required()) + [
+            "{}.view_{}".format(model._meta.app_label, model._meta.model_name)
+            for model in view.report_models
+        ]
+        if not request.user.has_perms(permissions):
+            raise PermissionDenied()
+        child = get_object_or_404(models.Child, slug=child)
+
+        try:
+            view.report_key = view.get_report_key(child)
+        except BadRequest as e:
+            raise ValidationError(str(e))
+        etag = view.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                figure = view.get_cached_report(child) or {"data": [], "layout": {}}
+            except RenderTimeout:
+                return Response(
+                    {"detail": "The report is still being created."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": str(settings.REPORTS["WAIT"])},
+                )
+            except RenderFailed:
+                return Response(
+                    {"detail": "The report could not be created."},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
+            response = Response(figure)
+        response["ETag"] = etag
+        return response
+
+
 def _get_choice_labels(model_class, field_name):
     """Return the display labels for a model choice field."""
     field = model_class._meta.get_field(field_name)
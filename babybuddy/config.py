@@ -112,6 +112,9 @@ class Config:
     allow_uploads: bool = field(  # ALLOW_UPLOADS
         default_factory=lambda: _bool(os.environ.get("ALLOW_UPLOADS"), default=True)
     )
+    event_stream: bool = field(  # EVENT_STREAM
+        default_factory=lambda: _bool(os.environ.get("EVENT_STREAM"))
+    )
 
     # -- Helpers --------------------------------------------------------------
 
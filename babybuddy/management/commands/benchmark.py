@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from babybuddy.models import Settings
+from core import bulk, models, periods, timeline
+from core.choices import FeedingMethod, FeedingType
+from dashboard.templatetags import cards
+from mqtt import stats
+from reports import buckets
+
+# Models seeded by the benchmark, in the order rows are distributed to them.
+SEED_MODELS = [
+    models.DiaperChange,
+    models.Feeding,
+    models.Sleep,
+    models.TummyTime,
+    models.Pumping,
+    models.Medication,
+    models.Temperature,
+    models.Note,
+    models.Weight,
+    models.Height,
+    models.BMI,
+    models.HeadCircumference,
+]
+
+# Value fields of the measurement models, which are recorded by date.
+MEASUREMENT_FIELDS = {
+    models.BMI: "bmi",
+    models.HeadCircumference: "head_circumference",
+    models.Height: "height",
+    models.Weight: "weight",
+}
+
+# Latest entry lookups as used by the MQTT publisher and the API.
+LATEST_ORDER_FIELDS = {
+    models.BMI: "-date",
+    models.DiaperChange: "-time",
+    models.Feeding: "-end",
+    models.HeadCircumference: "-date",
+    models.Height: "-date",
+    models.Medication: "-time",
+    models.Note: "-time",
+    models.Pumping: "-end",
+    models.Sleep: "-end",
+    models.Temperature: "-time",
+    models.TummyTime: "-end",
+    models.Weight: "-date",
+}
+
+# Dashboard cards of the past seven days.
+WEEK_CARDS = [
+    cards.card_breastfeeding,
+    cards.card_diaperchange_types,
+    cards.card_feeding_recent,
+    cards.card_sleep_naps_day,
+    cards.card_sleep_recent,
+]
+
+# Third party modules only imported once they are used (e.g. plotly by
+# processes rendering graphs), to keep them out of the startup time of every
+# process.
+DEFERRED_IMPORTS = ["paho.mqtt.client", "plotly.colors", "zeroconf"]
+
+# Scripts timed from a cold start, in a new interpreter.
+STARTUP_SCRIPTS = {
+    "manage.py check": (
+        "import runpy, sys\n"
+        "sys.argv = ['manage.py', 'check']\n"
+        "runpy.run_path('manage.py', run_name='__main__')\n"
+    ),
+    "first request": (
+        "import django\n"
+        "from django.test import Client\n"
+        "from django.test.utils import setup_test_environment\n"
+        "django.setup()\n"
+        "setup_test_environment()\n"
+        "Client().get('/login/')\n"
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a large number of entries, times common queries and rolls all "
+        "changes back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            dest="rows",
+            default=100000,
+            help="The number of entries to seed.",
+        )
+        parser.add_argument(
+            "--children",
+            dest="children",
+            default=2,
+            help="The number of children to spread entries across.",
+        )
+        parser.add_argument(
+            "--repeat",
+            dest="repeat",
+            default=20,
+            help="How many times to run each query.",
+        )
+        parser.add_argument(
+            "--periods",
+            dest="periods",
+            default=10000,
+            help="The number of sleep entries to validate and insert.",
+        )
+        parser.add_argument(
+            "--intervals",
+            dest="intervals",
+            default=50000,
+            help="The number of intervals to split in to days for pattern graphs.",
+        )
+        parser.add_argument(
+            "--startup",
+            dest="startup",
+            default=5,
+            help="How many times to start new processes to time startup.",
+        )
+        parser.add_argument(
+            "--without-indexes",
+            action="store_true",
+            dest="without_indexes",
+            help="Also time queries after dropping the core model indexes.",
+        )
+
+    def handle(self, *args, **kwargs):
+        rows = int(kwargs["rows"])
+        children = int(kwargs["children"]) or 1
+        self.repeat = int(kwargs["repeat"]) or 1
+        period_count = int(kwargs["periods"])
+        interval_count = int(kwargs["intervals"])
+        startup_count = int(kwargs["startup"])
+        without_indexes = kwargs["without_indexes"]
+
+        if without_indexes and not connection.features.can_rollback_ddl:
+            raise CommandError(
+                "--without-indexes requires a database that can roll back schema "
+                "changes."
+            )
+
+        with transaction.atomic():
+            self.now = timezone.now()
+            self.children = [
+                models.Child.objects.create(
+                    first_name="Benchmark",
+                    last_name=str(i),
+                    birth_date=timezone.localdate() - timedelta(days=730),
+                )
+                for i in range(children)
+            ]
+            for child in self.children:
+                self._seed(child, rows // children)
+
+            results = {"with indexes": self._run()}
+            period_results = self._run_periods(period_count)
+            if without_indexes:
+                self._drop_indexes()
+                results["without indexes"] = self._run()
+
+            # Leave the database exactly as it was.
+            transaction.set_rollback(True)
+
+        self._report(rows, results)
+        self._report_periods(period_count, period_results)
+        self._report_intervals(interval_count, self._run_intervals(interval_count))
+        self._report_startup(startup_count, self._run_startup(startup_count))
+
+    def _seed(self, child, rows):
+        per_model = max(rows // len(SEED_MODELS), 1)
+        step = timedelta(days=730) / per_model
+        for model in SEED_MODELS:
+            model.objects.bulk_create(
+                (
+                    self._entry(model, child, self.now - step * i)
+                    for i in range(per_model)
+                ),
+                batch_size=1000,
+            )
+
+    @staticmethod
+    def _entry(model, child, end):
+        if model is models.DiaperChange:
+            return model(child=child, time=end, wet=True, solid=False)
+        if model in (models.Feeding, models.Pumping, models.Sleep, models.TummyTime):
+            start = end - timedelta(minutes=20)
+            entry = model(child=child, start=start, end=end, duration=end - start)
+            if model is models.Feeding:
+                entry.type = FeedingType.FORMULA
+                entry.method = FeedingMethod.BOTTLE
+            elif model is models.Pumping:
+                entry.amount = 50
+            elif model is models.Sleep:
+                entry.nap = False
+            return entry
+        if model is models.Medication:
+            return model(child=child, time=end, name="Benchmark")
+        if model is models.Temperature:
+            return model(child=child, time=end, temperature=37)
+        if model is models.Note:
+            return model(child=child, time=end, note="Benchmark")
+        return model(
+            child=child,
+            date=timezone.localdate(end),
+            **{MEASUREMENT_FIELDS[model]: 10},
+        )
+
+    def _queries(self, child):
+        day = timezone.localtime(self.now).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        # Cards only read the settings of the request's user.
+        context = {
+            "request": SimpleNamespace(user=SimpleNamespace(settings=Settings()))
+        }
+        return {
+            "latest entry per model": lambda: [
+                model.objects.filter(child=child).order_by(field).first()
+                for model, field in LATEST_ORDER_FIELDS.items()
+            ],
+            "feedings in last 24 hours": lambda: models.Feeding.objects.filter(
+                child=child, start__gte=self.now - timedelta(days=1)
+            ).count(),
+            "timeline day": lambda: timeline.get_objects(day, child),
+            "timeline page": lambda: timeline.get_page(100, child=child),
+            "week cards": lambda: [card(context, child) for card in WEEK_CARDS],
+            # Measure the queries rather than the cache.
+            "stats": lambda: (
+                stats.invalidate([child.id]),
+                stats.compute_stats(child),
+            ),
+        }
+
+    def _run(self):
+        """Get the median latency of each query in milliseconds."""
+        results = {}
+        for name, query in self._queries(self.children[0]).items():
+            timings = []
+            for i in range(self.repeat):
+                start = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(timings)
+        return results
+
+    def _run_periods(self, count):
+        """Get the seconds taken to validate and insert sleep entries."""
+        results = {}
+        if count < 1:
+            return results
+        for name, insert in (
+            ("row by row", self._insert_rows),
+            ("indexed batch", self._insert_batch),
+        ):
+            child = models.Child.objects.create(
+                first_name="Benchmark",
+                last_name=name,
+                birth_date=timezone.localdate() - timedelta(days=730),
+            )
+            # Entries of 30 or 31 minutes with a gap between them, in the past.
+            entries = [
+                models.Sleep(
+                    child=child,
+                    start=self.now - timedelta(minutes=40 * i + 30 + i % 2),
+                    end=self.now - timedelta(minutes=40 * i),
+                    nap=False,
+                )
+                for i in range(1, count + 1)
+            ]
+            start = time.perf_counter()
+            insert(child, entries)
+            results[name] = time.perf_counter() - start
+        return results
+
+    @staticmethod
+    def _insert_rows(child, entries):
+        for entry in entries:
+            entry.full_clean()
+            entry.save()
+
+    @staticmethod
+    def _insert_batch(child, entries):
+        with periods.indexed_periods() as index:
+            for entry in entries:
+                entry.full_clean()
+                bulk.prepare(entry)
+                index.add(entry)
+        models.Sleep.objects.bulk_create(entries, batch_size=1000)
+        bulk.entries_changed(models.Sleep, [child.id])
+
+    def _run_intervals(self, count):
+        """Get the seconds taken to split intervals in to local days."""
+        results = {}
+        if count < 1:
+            return results
+        # Three hour intervals every five hours, crossing midnight regularly.
+        intervals = [
+            (
+                self.now - timedelta(hours=5 * i + 3),
+                self.now - timedelta(hours=5 * i),
+            )
+            for i in range(count, 0, -1)
+        ]
+        for name, split in (
+            ("per-row localtime", self._split_rows),
+            ("day table", self._split_days),
+        ):
+            start = time.perf_counter()
+            split(intervals)
+            results[name] = time.perf_counter() - start
+        return results
+
+    @staticmethod
+    def _split_rows(intervals):
+        # Converting each interval to local time, as the pattern graphs did.
+        days = {}
+        for start, end in intervals:
+            start = timezone.localtime(start)
+            end = timezone.localtime(end)
+            while start.date() != end.date():
+                midnight = timezone.localtime(
+                    timezone.make_aware(
+                        datetime.combine(
+                            start.date() + timedelta(days=1), datetime.min.time()
+                        )
+                    )
+                )
+                days.setdefault(start.date(), []).append((start, midnight))
+                start = midnight
+            days.setdefault(start.date(), []).append((start, end))
+        return days
+
+    @staticmethod
+    def _split_days(intervals):
+        return buckets.day_segments(
+            [(start.timestamp(), end.timestamp()) for start, end in intervals]
+        )
+
+    @staticmethod
+    def _run_startup(count):
+        """
+        Get the median milliseconds taken to run each startup script, as is
+        and with the deferred imports imported up front.
+        """
+        results = {}
+        if count < 1:
+            return results
+        eager = "".join("import {}\n".format(name) for name in DEFERRED_IMPORTS)
+        preludes = {"deferred imports": "", "eager imports": eager}
+        timings = {
+            (column, name): [] for column in preludes for name in STARTUP_SCRIPTS
+        }
+        # Runs are interleaved so both columns are equally affected by noise.
+        for i in range(count):
+            for column, name in timings:
+                start = time.perf_counter()
+                subprocess.run(
+                    [sys.executable, "-c", preludes[column] + STARTUP_SCRIPTS[name]],
+                    cwd=settings.BASE_DIR,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                timings[column, name].append((time.perf_counter() - start) * 1000)
+        for (column, name), values in timings.items():
+            results.setdefault(column, {})[name] = statistics.median(values)
+        return results
+
+    @staticmethod
+    def _drop_indexes():
+        # Only the statement template is taken from the schema editor, as
+        # entering it is not supported inside a transaction on all databases.
+        schema_editor = connection.schema_editor()
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in SEED_MODELS + [models.MedicationSchedule]:
+                for index in model._meta.indexes:
+                    cursor.execute(
+                        schema_editor.sql_delete_index
+                        % {
+                            "name": quote_name(index.name),
+                            "table": quote_name(model._meta.db_table),
+                        }
+                    )
+
+    def _report(self, rows, results):
+        self.stdout.write(
+            "{} entries, median of {} runs (ms):".format(rows, self.repeat)
+        )
+        self._report_columns(results)
+
+    def _report_columns(self, results):
+        columns = list(results)
+        self.stdout.write(
+            "{:<28}".format("") + "".join("{:>18}".format(column) for column in columns)
+        )
+        for name in results[columns[0]]:
+            self.stdout.write(
+                "{:<28}".format(name)
+                + "".join("{:>18.2f}".format(results[c][name]) for c in columns)
+            )
+
+    def _report_periods(self, count, results):
+        if not results:
+            return
+        self.stdout.write(
+            "{} sleep entries validated and inserted (entries/s):".format(count)
+        )
+        for name, seconds in results.items():
+            self.stdout.write("{:<28}{:>18.0f}".format(name, count / seconds))
+
+    def _report_intervals(self, count, results):
+        if not results:
+            return
+        self.stdout.write(
+            "{} intervals split in to local days (intervals/s):".format(count)
+        )
+        for name, seconds in results.items():
+            self.stdout.write("{:<28}{:>18.0f}".format(name, count / seconds))
+
+    def _report_startup(self, count, results):
+        if not results:
+            return
+        self.stdout.write("Cold start, median of {} new processes (ms):".format(count))
+        self._report_columns(results)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from api import export
+
+
+class Command(BaseCommand):
+    help = "Exports entries of one type as CSV or newline delimited JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "name",
+            choices=sorted(export.EXPORTS),
+            help="The type of entries to export.",
+        )
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=sorted(export.FORMATS),
+            default="csv",
+            help="The file format to export (default: csv).",
+        )
+        parser.add_argument(
+            "--output",
+            dest="output",
+            help="The file to write to (default: standard output).",
+        )
+        parser.add_argument(
+            "--child",
+            dest="child",
+            help="Only export entries of the child with this id.",
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            dest="filters",
+            metavar="NAME=VALUE",
+            help=(
+                "Filter entries with an API list endpoint parameter, e.g. "
+                "start_min=2024-01-01T00:00:00Z. May be used more than once."
+            ),
+        )
+
+    def handle(self, *args, **kwargs):
+        params = {}
+        for value in kwargs["filters"]:
+            if "=" not in value:
+                raise CommandError("Filters must be given as NAME=VALUE.")
+            key, value = value.split("=", 1)
+            params[key] = value
+        if kwargs["child"]:
+            params["child"] = kwargs["child"]
+
+        try:
+            queryset = export.get_queryset(kwargs["name"], params)
+        except ValidationError as e:
+            raise CommandError(
+                " ".join(
+                    "{}: {}".format(key, " ".join(errors))
+                    for key, errors in e.detail.items()
+                )
+            )
+
+        lines = export.stream(kwargs["name"], queryset, kwargs["file_format"])
+        if kwargs["output"]:
+            with open(kwargs["output"], "w", newline="", encoding="utf-8") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -411,6 +411,45 @@ BABY_BUDDY = {
 
 ENABLE_HOME_ASSISTANT_SUPPORT = config.enable_home_assistant
 
+# MQTT publishing
+# Changes are published by a background worker that coalesces bursts of changes
+# per child. DEBOUNCE and MAX_DELAY are in seconds.
+
+MQTT_PUBLISH = {
+    "ASYNC": True,
+    "QUEUE_SIZE": 1000,
+    "DEBOUNCE": 0.5,
+    "MAX_DELAY": 5.0,
+}
+
+# Event stream
+# Pages are told about changes of children's data as they happen when ENABLED.
+# Every open page keeps a request running, so this needs workers serving many
+# requests at once (e.g. gunicorn's gthread or gevent workers). Changes are
+# checked every POLL_INTERVAL seconds and streams end after MAX_AGE seconds
+# (browsers reconnect), sending a comment every HEARTBEAT seconds until then.
+
+EVENT_STREAM = {
+    "ENABLED": config.event_stream,
+    "POLL_INTERVAL": 2,
+    "HEARTBEAT": 15,
+    "MAX_AGE": 300,
+}
+
+# Reports
+# Graphs show the last DEFAULT_DAYS days unless another date range is requested.
+# Measurement series with more than MAX_POINTS points are downsampled.
+# Slow graphs are created by WORKERS processes (per web worker, 0 to create them
+# in the request). Requests wait WAIT seconds for them, jobs stop after TIMEOUT.
+
+REPORTS = {
+    "DEFAULT_DAYS": 90,
+    "MAX_POINTS": 500,
+    "WORKERS": 2,
+    "WAIT": 10,
+    "TIMEOUT": 120,
+}
+
 # Logging
 # https://docs.djangoproject.com/en/5.0/ref/logging/
 
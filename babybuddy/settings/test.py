@@ -28,3 +28,11 @@ DBSETTINGS_USE_CACHE = False
 # We want to test the home assistant middleware
 
 ENABLE_HOME_ASSISTANT_SUPPORT = True
+
+# Publish MQTT state synchronously so tests can check what was published.
+
+MQTT_PUBLISH = {**MQTT_PUBLISH, "ASYNC": False}  # noqa: F405
+
+# Create report graphs in the test process, where the test database is.
+
+REPORTS = {**REPORTS, "WORKERS": 0}  # noqa: F405
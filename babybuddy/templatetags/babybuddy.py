@@ -53,6 +53,16 @@ def version_string():
     return config.version_string
 
 
+@register.simple_tag()
+def event_stream_enabled():
+    """
+    Check if pages are told about changes of data as they happen.
+
+    :return: the EVENT_STREAM ENABLED setting.
+    """
+    return settings.EVENT_STREAM["ENABLED"]
+
+
 _UPDATE_CACHE_KEY = "bb_latest_version"
 _UPDATE_CACHE_TTL = 60 * 60 * 12  # 12 hours
 
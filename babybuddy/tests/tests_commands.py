@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
+from io import StringIO
+
 from django.test import TransactionTestCase
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
 
-from core.models import Child
+from core.models import Child, Feeding
 
 
 class CommandsTestCase(TransactionTestCase):
@@ -21,6 +25,63 @@ class CommandsTestCase(TransactionTestCase):
         call_command("fake", children=2, days=7, verbosity=0)
         self.assertEqual(Child.objects.count(), 3)
 
+    def test_benchmark(self):
+        call_command("migrate", verbosity=0)
+        children = Child.objects.count()
+        output = StringIO()
+        call_command(
+            "benchmark",
+            rows=240,
+            repeat=1,
+            periods=20,
+            intervals=50,
+            startup=1,
+            without_indexes=True,
+            stdout=output,
+        )
+        self.assertIn("without indexes", output.getvalue())
+        self.assertIn("indexed batch", output.getvalue())
+        self.assertIn("day table", output.getvalue())
+        self.assertIn("eager imports", output.getvalue())
+        self.assertIn("latest entry per model", output.getvalue())
+        # Seeded entries are rolled back along with the dropped indexes, so the
+        # indexes can be dropped again.
+        self.assertEqual(Child.objects.count(), children)
+        self.assertFalse(Feeding.objects.exists())
+        call_command(
+            "benchmark",
+            rows=24,
+            repeat=1,
+            periods=0,
+            intervals=0,
+            startup=0,
+            without_indexes=True,
+            stdout=output,
+        )
+
+    def test_export(self):
+        call_command("migrate", verbosity=0)
+        call_command("fake", days=2, verbosity=0)
+        child = Child.objects.order_by("id").last()
+        output = StringIO()
+        call_command("export", "feedings", child=child.id, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "id")
+        self.assertEqual(len(lines) - 1, Feeding.objects.filter(child=child).count())
+
+        output = StringIO()
+        call_command(
+            "export",
+            "feedings",
+            file_format="ndjson",
+            filters=["start_min={}".format(timezone.now().isoformat())],
+            stdout=output,
+        )
+        self.assertEqual(output.getvalue(), "")
+
+        with self.assertRaises(CommandError):
+            call_command("export", "feedings", filters=["start_min=nope"])
+
     def test_reset(self):
         call_command("reset", verbosity=0, interactive=False)
         self.assertIsInstance(
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from babybuddy.management.commands.benchmark import DEFERRED_IMPORTS
+
+# Set up Django and load every view, as the first request of a worker does.
+SCRIPT = """
+import django
+from django.urls import get_resolver
+
+django.setup()
+get_resolver().url_patterns
+"""
+
+
+class ImportsTestCase(SimpleTestCase):
+    def test_deferred_imports(self):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "babybuddy.settings.test"},
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        # Lines are "import time: self [us] | cumulative | imported package".
+        imported = {
+            line.split("|")[-1].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        }
+        self.assertIn("django.urls", imported)
+        for name in DEFERRED_IMPORTS:
+            self.assertFalse(name in imported, "{} is imported".format(name))
@@ -13,7 +13,6 @@ import threading
 
 import dbsettings
 from django.utils.translation import gettext_lazy as _
-from zeroconf import ServiceInfo, Zeroconf as ZC
 
 from babybuddy import VERSION
 from babybuddy.config import config
@@ -141,6 +140,9 @@ class ZeroconfService:
                 set_setting_value("babybuddy.zeroconf", "", "instance_id", instance_id)
                 logger.info("Auto-generated Zeroconf instance_id: %s", instance_id)
 
+            # zeroconf is only imported by processes advertising the service.
+            from zeroconf import ServiceInfo, Zeroconf as ZC
+
             port = s.advertised_port or config.bb_port
             path = config.sub_path
             ip = _get_local_ip()
@@ -2,22 +2,101 @@
 from django.contrib import admin
 from django.conf import settings
 
-from import_export import fields, resources
+from import_export import fields, resources, widgets
 from import_export.admin import ImportExportMixin, ExportActionMixin
+from import_export.instance_loaders import CachedInstanceLoader
 
-from core import models
+from core import bulk, models, periods
 
 
 class ImportExportResourceBase(resources.ModelResource):
-    id = fields.Field(attribute="id")
+    """
+    Imports entries in batches with `bulk_create` and `bulk_update`.
+
+    Periods are checked for overlaps against an in-memory index, and derived
+    data (rollups, cached entries, MQTT state) is refreshed once per affected
+    child after the import instead of once per row.
+    """
+
+    # Imported ids are cleaned to integers to match the keys of the instances
+    # cached by CachedInstanceLoader.
+    id = fields.Field(attribute="id", widget=widgets.IntegerWidget())
     child = fields.Field(attribute="child_id", column_name="child_id")
     child_first_name = fields.Field(attribute="child__first_name", readonly=True)
     child_last_name = fields.Field(attribute="child__last_name", readonly=True)
 
+    # Fields derived from other entries, set by `bulk.entries_changed` after
+    # the import rather than imported.
+    derived_fields = ()
+
     class Meta:
         clean_model_instances = True
         exclude = ("duration",)
         export_order = ("id", "child_id", "child_first_name", "child_last_name")
+        use_bulk = True
+        batch_size = 1000
+        instance_loader_class = CachedInstanceLoader
+
+    def import_data(self, dataset, **kwargs):
+        self._child_ids = set()
+        self._pending_m2m = []
+        with periods.indexed_periods() as index:
+            self._period_index = index
+            return super().import_data(dataset, **kwargs)
+
+    def import_instance(self, instance, row, **kwargs):
+        # Keep the previous child of existing entries to refresh it as well.
+        self._child_ids.add(instance.child_id)
+        super().import_instance(instance, row, **kwargs)
+
+    def save_instance(self, instance, is_create, row, **kwargs):
+        bulk.prepare(instance)
+        super().save_instance(instance, is_create, row, **kwargs)
+        self._child_ids.add(instance.child_id)
+        if hasattr(instance, "start") and hasattr(instance, "end"):
+            self._period_index.add(instance)
+
+    def get_bulk_update_fields(self):
+        # Resource fields include related and readonly ones (e.g. the child's
+        # name), and the duration set by `bulk.prepare` is not imported.
+        return [
+            field.name
+            for field in self._meta.model._meta.concrete_fields
+            if not field.primary_key and field.name not in self.derived_fields
+        ]
+
+    def save_m2m(self, instance, row, **kwargs):
+        # Relations are saved once the batch containing the instance is saved.
+        if self._is_using_transactions(kwargs) or not self._is_dry_run(kwargs):
+            self._pending_m2m.append((instance, row))
+
+    def bulk_create(self, *args, **kwargs):
+        super().bulk_create(*args, **kwargs)
+        self._save_pending_m2m()
+
+    def bulk_update(self, *args, **kwargs):
+        super().bulk_update(*args, **kwargs)
+        self._save_pending_m2m()
+
+    def _save_pending_m2m(self):
+        m2m_fields = [
+            field
+            for field in self.get_import_fields()
+            if isinstance(field.widget, widgets.ManyToManyWidget)
+        ]
+        pending = []
+        for instance, row in self._pending_m2m:
+            if instance.pk is None:
+                pending.append((instance, row))
+                continue
+            for field in m2m_fields:
+                self.import_field(field, instance, row, True)
+        self._pending_m2m = pending
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if not kwargs.get("dry_run") and not result.has_errors():
+            bulk.entries_changed(self._meta.model, self._child_ids)
 
 
 class BMIImportExportResource(ImportExportResourceBase):
@@ -251,8 +330,11 @@ class MedicationAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
 
 
 class MedicationScheduleImportExportResource(ImportExportResourceBase):
+    derived_fields = ("last_given_at", "next_due_at")
+
     class Meta:
         model = models.MedicationSchedule
+        exclude = ("last_given_at", "next_due_at")
 
 
 @admin.register(models.MedicationSchedule)
@@ -27,4 +27,6 @@ class CoreConfig(AppConfig):
     name = "core"
 
     def ready(self):
+        from . import signals  # noqa: F401 -- registers signal handlers
+
         post_migrate.connect(add_read_only_group_permissions, sender=self)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Refresh derived data once after entries are saved in bulk.
+
+Entries created or updated with `bulk_create` or `bulk_update` do not send
+model signals. Code saving entries in bulk calls `entries_changed` once with
+the affected children instead, which rebuilds their rollups, invalidates their
+cached latest entries, updates the due times of their medication schedules,
+increments their change counters and sends
+`post_bulk_save` so other apps (e.g. MQTT publishing) can refresh their state
+once per child.
+"""
+
+from django.dispatch import Signal
+
+from core import latest, models, rollups, schedules, versions
+from core.utils import timezone_aware_duration
+
+# Sent with the model as sender and a `child_ids` set.
+post_bulk_save = Signal()
+
+
+def prepare(instance):
+    """
+    Set the values a model's save() would set before it is saved in bulk.
+    :param instance: an unsaved or changed model instance.
+    """
+    if getattr(instance, "start", None) and getattr(instance, "end", None):
+        if hasattr(instance, "duration"):
+            instance.duration = timezone_aware_duration(instance.start, instance.end)
+    if getattr(instance, "nap", False) is None:
+        instance.nap = instance.is_nap_time()
+
+
+def entries_changed(model, child_ids):
+    """
+    Refresh derived data of children after entries were saved in bulk.
+    :param model: the model class of the saved entries.
+    :param child_ids: ids of the children the entries belong (or belonged) to.
+    """
+    child_ids = {child_id for child_id in child_ids if child_id}
+    if not child_ids:
+        return
+    if model.__name__ in rollups.MODEL_ACTIVITIES:
+        for child_id in child_ids:
+            rollups.rebuild(child_id)
+    if model in latest.LATEST_FIELDS:
+        latest.invalidate(child_ids, [model])
+    if model in versions.VERSIONED_MODELS:
+        versions.bump(child_ids, [model])
+    if model in (models.Medication, models.MedicationSchedule):
+        schedules.children_changed(child_ids)
+    post_bulk_save.send(sender=model, child_ids=child_ids)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+The stored values of entries before they are changed.
+
+Handlers of post_save signals refreshing data derived from entries (rollups,
+cached latest entries, change counters, due times of medication schedules,
+MQTT state) need to know where an existing entry was before it was saved, e.g.
+the child it was moved from. `on_pre_save` reads the stored row once per save,
+before the other handlers run, so they do not each query it again.
+"""
+
+
+def on_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember the stored values of an existing entry before it is saved."""
+    instance._changes_previous = None
+    if instance.pk is None or raw:
+        return
+    instance._changes_previous = (
+        sender._base_manager.filter(pk=instance.pk).values().first()
+    )
+
+
+def get_previous(instance):
+    """
+    Get the values an entry had before it was saved.
+    :param instance: a model instance saved with the on_pre_save handler
+                     connected.
+    :returns: a dict of the stored values by field attname (e.g. `child_id`),
+              or `None` for entries that did not exist yet.
+    """
+    return getattr(instance, "_changes_previous", None)
+
+
+def get_child_ids(instance):
+    """
+    Get the children of a saved entry.
+    :param instance: a model instance with a `child` field, saved with the
+                     on_pre_save handler connected.
+    :returns: a set of the id of the entry's child and, if the entry was moved
+              from another child, the id of that child.
+    """
+    previous = get_previous(instance)
+    return {instance.child_id, previous and previous["child_id"]} - {None}
@@ -47,6 +47,13 @@ class MedicationFrequency(models.TextChoices):
     WEEKLY = "weekly", _("Specific days of week")
 
 
+class RollupActivity(models.TextChoices):
+    DIAPER_CHANGE = "diaperchange", _("Diaper Change")
+    FEEDING = "feeding", _("Feeding")
+    NAP = "nap", _("Nap")
+    SLEEP = "sleep", _("Sleep")
+
+
 # ---------------------------------------------------------------------------
 # Color metadata registry -- keyed by enum members.
 # Since TextChoices members ARE strings (DiaperColor.BLACK == "black"),
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Push changes of children's data to open pages.
+
+Event streams subscribe to the hub of their process. The hub polls the change
+counters (see `core.versions`) of the subscribed children, which are kept in
+the cache shared by all worker processes, so changes saved by any worker reach
+every stream. Changes saved in the same process wake the hub up right away.
+Timers are shown for all children (and timers without a child), so changes of
+timers are counted on their own.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from core import models, versions
+
+logger = logging.getLogger(__name__)
+
+TIMERS_KEY = "core.events.timers"
+
+# Changes of the `models` (VERSIONED_MODELS) of a child. Changes of timers
+# have no child.
+Change = namedtuple("Change", ["child_id", "models"])
+
+
+class Subscription:
+    """Changes of some children (and timers) for one event stream.
+
+    Changes are queued up to ``queue_size``.  When the stream falls further
+    behind, changes are dropped and ``overflowed`` is set, so the stream can
+    tell its page to refresh everything instead.
+    """
+
+    def __init__(self, child_ids, queue_size=100):
+        self.child_ids = frozenset(child_ids)
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def put(self, change):
+        try:
+            self._queue.put_nowait(change)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Return the next change, or ``None`` after ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    """Fan changes out to the subscriptions of this process.
+
+    A thread, started with the first subscription, checks the change
+    counters of subscribed children every ``interval`` seconds, or right
+    after ``notify`` is called.  Counters are first read when a child is
+    subscribed to, so only later changes are reported.
+    """
+
+    def __init__(self, interval=2.0):
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._subscriptions = set()
+        self._seen = {}
+        self._seen_timers = None
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def subscribe(self, child_ids, queue_size=100):
+        """Subscribe to changes of children and timers.
+
+        :param child_ids: ids of Child instances.
+        :param queue_size: the number of changes to keep for the subscriber.
+        :returns: a Subscription instance.
+        """
+        subscription = Subscription(child_ids, queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        self.start()
+        self.notify()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def notify(self):
+        """Check for changes without waiting for the next interval."""
+        self._wake.set()
+
+    def start(self):
+        """Start the polling thread if it is not running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="event-hub", daemon=True
+            )
+            self._thread.start()
+
+    def poll(self):
+        """Check for changes once and send them to the subscriptions."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        child_ids = set().union(*(s.child_ids for s in subscriptions))
+        # Forget children nobody listens to, they are read again when
+        # subscribed to again.
+        self._seen = {
+            child_id: seen
+            for child_id, seen in self._seen.items()
+            if child_id in child_ids
+        }
+        if not subscriptions:
+            self._seen_timers = None
+            return
+
+        changes = []
+        current = versions.get_children_versions(child_ids, versions.VERSIONED_MODELS)
+        for child_id, values in current.items():
+            seen = self._seen.get(child_id)
+            self._seen[child_id] = values
+            if seen is None:
+                continue
+            changed = [
+                model
+                for model, old, new in zip(versions.VERSIONED_MODELS, seen, values)
+                if old != new
+            ]
+            if changed:
+                changes.append(Change(child_id, changed))
+
+        timers = cache.get(TIMERS_KEY, 0)
+        if self._seen_timers is not None and timers != self._seen_timers:
+            changes.append(Change(None, [models.Timer]))
+        self._seen_timers = timers
+
+        for change in changes:
+            for subscription in subscriptions:
+                if change.child_id is None or change.child_id in subscription.child_ids:
+                    subscription.put(change)
+
+    # ------------------------------------------------------------------
+    # Polling thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Error checking for changes")
+            finally:
+                close_old_connections()
+
+
+def format_event(change, slugs):
+    """
+    Format a change as a server-sent event.
+    :param change: a Change tuple.
+    :param slugs: a dict of child ids and slugs.
+    :returns: the text of a `change` event (or a `timers` event for changes of
+              timers) with the child's slug and the changed models' names.
+    """
+    if change.child_id is None:
+        return "event: timers\ndata: {}\n\n"
+    data = {
+        "child": slugs.get(change.child_id),
+        "models": [model._meta.model_name for model in change.models],
+    }
+    return "event: change\ndata: {}\n\n".format(json.dumps(data))
+
+
+def stream(child_ids, slugs, heartbeat=15.0, max_age=300.0):
+    """
+    Generate the server-sent events of changes of children.
+    :param child_ids: ids of Child instances.
+    :param slugs: a dict of child ids and slugs.
+    :param heartbeat: seconds without changes after which a comment is sent,
+                      to keep connections open.
+    :param max_age: seconds after which the stream ends (browsers reconnect).
+    :returns: a generator of event strings, subscribed to `hub` from the first
+              event until it is closed.
+    """
+    deadline = time.monotonic() + max_age
+    subscription = hub.subscribe(child_ids)
+    try:
+        yield "retry: 5000\n\n"
+        while time.monotonic() < deadline:
+            change = subscription.get(
+                max(0, min(heartbeat, deadline - time.monotonic()))
+            )
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield "event: refresh\ndata: {}\n\n"
+            elif change is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield format_event(change, slugs)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def on_change(sender, **kwargs):
+    def changed():
+        if sender is models.Timer:
+            cache.set(TIMERS_KEY, time.time_ns(), None)
+        hub.notify()
+
+    # Change counters are incremented again when the transaction commits.
+    transaction.on_commit(changed)
+
+
+# Module-level singleton used by the event stream views.
+hub = EventHub(interval=settings.EVENT_STREAM["POLL_INTERVAL"])
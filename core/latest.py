@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+The latest entry of every tracked model for children.
+
+Latest entries are looked up for any number of children with one query per
+model and cached per child and model until an entry of that model is saved or
+deleted for the child.
+"""
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from core import changes, models
+
+# Tracked models and the field used to find their latest entry.
+LATEST_FIELDS = {
+    models.BMI: "date",
+    models.DiaperChange: "time",
+    models.Expirable: "time",
+    models.Feeding: "end",
+    models.HeadCircumference: "date",
+    models.Height: "date",
+    models.Medication: "time",
+    models.Note: "time",
+    models.Pumping: "end",
+    models.Sleep: "end",
+    models.Temperature: "time",
+    models.Timer: "start",
+    models.TummyTime: "end",
+    models.Weight: "date",
+}
+
+CACHE_KEY = "core.latest.{}.{}"
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(child_id, model):
+    return CACHE_KEY.format(child_id, model._meta.model_name)
+
+
+def get_latest(children, model_classes=None):
+    """
+    Get the latest entry of tracked models for children.
+    :param children: an iterable of Child instances.
+    :param model_classes: the LATEST_FIELDS models to include (all if `None`).
+    :returns: a dictionary keyed by child id of dictionaries with the latest
+              instance (or `None`) keyed by model.
+    """
+    children = list(children)
+    model_classes = list(model_classes or LATEST_FIELDS)
+    keys = {
+        (child.id, model): _cache_key(child.id, model)
+        for child in children
+        for model in model_classes
+    }
+    cached = cache.get_many(keys.values())
+
+    latest = {child.id: {} for child in children}
+    missing = {}
+    for (child_id, model), key in keys.items():
+        if key in cached:
+            # Children without entries are cached as False.
+            latest[child_id][model] = cached[key] or None
+        else:
+            missing.setdefault(model, []).append(child_id)
+
+    fetched = {}
+    for model, child_ids in missing.items():
+        instances = {
+            instance.child_id: instance
+            for instance in _latest_instances(model, LATEST_FIELDS[model], child_ids)
+        }
+        for child_id in child_ids:
+            latest[child_id][model] = instances.get(child_id)
+            fetched[keys[(child_id, model)]] = instances.get(child_id, False)
+    if fetched:
+        cache.set_many(fetched, CACHE_TIMEOUT)
+
+    # Avoid a query for the child when an instance's child is accessed.
+    for child in children:
+        for instance in latest[child.id].values():
+            if instance is not None:
+                instance.child = child
+    return latest
+
+
+def get_child_latest(child, model_classes=None):
+    """
+    Get the latest entry of tracked models for a child.
+    :param child: an instance of the Child model.
+    :param model_classes: the LATEST_FIELDS models to include (all if `None`).
+    :returns: a dictionary with the latest instance (or `None`) keyed by model.
+    """
+    return get_latest([child], model_classes)[child.id]
+
+
+def invalidate(child_ids, model_classes=None):
+    """
+    Remove cached latest entries for children.
+    :param child_ids: ids of Child instances (`None` values are ignored).
+    :param model_classes: the LATEST_FIELDS models to remove entries for (all
+                          if `None`).
+    """
+    keys = [
+        _cache_key(child_id, model)
+        for child_id in child_ids
+        if child_id
+        for model in model_classes or LATEST_FIELDS
+    ]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # Entries read by other connections before the transaction commits may
+    # have been cached in the meantime.
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _latest_instances(model, field, child_ids):
+    """
+    Get the latest instance of a model for each child with as few queries as
+    the database allows.
+    """
+    queryset = model.objects.filter(child_id__in=child_ids)
+    if connection.features.can_distinct_on_fields:
+        return queryset.order_by("child_id", "-" + field, "-id").distinct("child_id")
+    if connection.features.supports_over_clause:
+        return queryset.annotate(
+            latest_rank=Window(
+                RowNumber(),
+                partition_by=F("child_id"),
+                order_by=[F(field).desc(), F("id").desc()],
+            )
+        ).filter(latest_rank=1)
+    instances = [
+        queryset.filter(child_id=child_id).order_by("-" + field, "-id").first()
+        for child_id in child_ids
+    ]
+    return [instance for instance in instances if instance is not None]
+
+
+def on_post_save(sender, instance, **kwargs):
+    invalidate(changes.get_child_ids(instance), [sender])
+
+
+def on_post_delete(sender, instance, origin=None, **kwargs):
+    # Entries deleted along with their child are handled by on_child_delete.
+    if isinstance(origin, models.Child):
+        return
+    invalidate([instance.child_id], [sender])
+
+
+def on_child_delete(sender, instance, **kwargs):
+    invalidate([instance.id])
@@ -0,0 +1,153 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:15
+
+import datetime
+import itertools
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# Activities of rollups as of this migration: the model, its start and end
+# fields and filters of its entries.
+ACTIVITIES = {
+    "diaperchange": ("DiaperChange", "time", "time", {}),
+    "feeding": ("Feeding", "start", "end", {}),
+    "nap": ("Sleep", "start", "end", {"nap": True}),
+    "sleep": ("Sleep", "start", "end", {}),
+}
+
+
+def _summarize(rows, next_start):
+    summary = {
+        "count": len(rows),
+        "duration_total": datetime.timedelta(0),
+        "gap_count": 0,
+        "gap_total": datetime.timedelta(0),
+        "first_time": rows[0][0],
+        "last_time": rows[-1][0],
+    }
+    successors = [start for start, end in rows[1:]] + [next_start]
+    for (start, end), successor in zip(rows, successors):
+        summary["duration_total"] += end - start
+        if successor is not None:
+            summary["gap_count"] += 1
+            summary["gap_total"] += successor - end
+    return summary
+
+
+class Migration(migrations.Migration):
+
+    def build_rollups(apps, schema_editor):
+        """
+        Build daily rollups for all existing children.
+        """
+        tz = timezone.get_default_timezone()
+        child_model = apps.get_model("core", "Child")
+        rollup_model = apps.get_model("core", "DailyRollup")
+        for child_id in child_model.objects.values_list("id", flat=True):
+            rollups = []
+            for activity, (
+                model_name,
+                start_field,
+                end_field,
+                filters,
+            ) in ACTIVITIES.items():
+                rows = list(
+                    apps.get_model("core", model_name)
+                    .objects.filter(child_id=child_id, **filters)
+                    .order_by(start_field, "id")
+                    .values_list(start_field, end_field)
+                )
+                days = [
+                    (date, list(day_rows))
+                    for date, day_rows in itertools.groupby(
+                        rows, key=lambda row: timezone.localtime(row[0], tz).date()
+                    )
+                ]
+                next_starts = [day_rows[0][0] for date, day_rows in days[1:]]
+                for (date, day_rows), next_start in zip(days, next_starts + [None]):
+                    rollups.append(
+                        rollup_model(
+                            child_id=child_id,
+                            activity=activity,
+                            date=date,
+                            **_summarize(day_rows, next_start),
+                        )
+                    )
+            rollup_model.objects.bulk_create(rollups)
+
+    dependencies = [
+        ("core", "0038_expirable"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "activity",
+                    models.CharField(
+                        choices=[
+                            ("diaperchange", "Diaper Change"),
+                            ("feeding", "Feeding"),
+                            ("nap", "Nap"),
+                            ("sleep", "Sleep"),
+                        ],
+                        max_length=32,
+                        verbose_name="Activity",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="Date")),
+                ("count", models.PositiveIntegerField(default=0, verbose_name="Count")),
+                (
+                    "duration_total",
+                    models.DurationField(
+                        default=datetime.timedelta, verbose_name="Total duration"
+                    ),
+                ),
+                (
+                    "gap_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Gap count"),
+                ),
+                (
+                    "gap_total",
+                    models.DurationField(
+                        default=datetime.timedelta, verbose_name="Total gap"
+                    ),
+                ),
+                ("first_time", models.DateTimeField(verbose_name="First time")),
+                ("last_time", models.DateTimeField(verbose_name="Last time")),
+                (
+                    "child",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="core.child",
+                        verbose_name="Child",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily Rollup",
+                "verbose_name_plural": "Daily Rollups",
+                "ordering": ["child", "activity", "date"],
+                "default_permissions": ("view",),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("child", "activity", "date"),
+                        name="unique_child_activity_date",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
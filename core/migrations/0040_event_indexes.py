@@ -0,0 +1,110 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0039_dailyrollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bmi",
+            index=models.Index(fields=["child", "-date"], name="bmi_child_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="diaperchange",
+            index=models.Index(
+                fields=["child", "-time"], name="diaperchange_child_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feeding",
+            index=models.Index(
+                fields=["child", "-start"], name="feeding_child_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feeding",
+            index=models.Index(fields=["child", "-end"], name="feeding_child_end_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="headcircumference",
+            index=models.Index(
+                fields=["child", "-date"], name="headcirc_child_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="height",
+            index=models.Index(fields=["child", "-date"], name="height_child_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="medication",
+            index=models.Index(
+                fields=["child", "-time"], name="medication_child_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="medication",
+            index=models.Index(
+                fields=["medication_schedule", "time"],
+                name="medication_schedule_time_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="medicationschedule",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["child", "active"],
+                name="medschedule_child_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(fields=["child", "-time"], name="note_child_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="pumping",
+            index=models.Index(
+                fields=["child", "-start"], name="pumping_child_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pumping",
+            index=models.Index(fields=["child", "-end"], name="pumping_child_end_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="sleep",
+            index=models.Index(
+                fields=["child", "-start"], name="sleep_child_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sleep",
+            index=models.Index(fields=["child", "-end"], name="sleep_child_end_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="temperature",
+            index=models.Index(
+                fields=["child", "-time"], name="temperature_child_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tummytime",
+            index=models.Index(
+                fields=["child", "-start"], name="tummytime_child_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tummytime",
+            index=models.Index(
+                fields=["child", "-end"], name="tummytime_child_end_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="weight",
+            index=models.Index(fields=["child", "-date"], name="weight_child_date_idx"),
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.1.15 on 2026-10-17 06:35
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+# Weekday fields of schedules as of this migration, from Monday to Sunday.
+DAY_FIELDS = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+
+
+def _next_weekly_occurrence(schedule, days, earliest, tz):
+    for offset in range(8):
+        date = earliest.date() + datetime.timedelta(days=offset)
+        if date.weekday() in days:
+            candidate = timezone.make_aware(
+                datetime.datetime.combine(
+                    date, schedule.schedule_time or datetime.time.min
+                ),
+                tz,
+            )
+            if candidate >= earliest:
+                return candidate
+    return earliest
+
+
+def _next_due_at(schedule):
+    """
+    Get the next due time of a schedule after its last dose, as
+    `MedicationSchedule.get_next_due_at` did as of this migration.
+    """
+    tz = timezone.get_current_timezone()
+    days = [i for i, day in enumerate(DAY_FIELDS) if getattr(schedule, day)]
+    reference = schedule.last_given_at
+    if schedule.frequency == "weekly" and not days:
+        return None
+    if schedule.frequency == "interval":
+        if not schedule.interval_hours or reference is None:
+            return None
+        return reference + datetime.timedelta(hours=schedule.interval_hours)
+    if reference is None:
+        # First doses of daily schedules with a time are due today.
+        if schedule.frequency != "daily" or not schedule.schedule_time:
+            return None
+        return timezone.make_aware(
+            datetime.datetime.combine(timezone.localdate(), schedule.schedule_time),
+            tz,
+        )
+    if schedule.schedule_time:
+        # The next dose time at least half a day after the last dose.
+        earliest = reference + datetime.timedelta(hours=12)
+        if schedule.frequency == "weekly":
+            return _next_weekly_occurrence(schedule, days, earliest, tz)
+        candidate = timezone.make_aware(
+            datetime.datetime.combine(earliest.date(), schedule.schedule_time), tz
+        )
+        if candidate < earliest:
+            candidate += datetime.timedelta(days=1)
+        return candidate
+    next_day = timezone.make_aware(
+        datetime.datetime.combine(
+            reference.date() + datetime.timedelta(days=1), datetime.time.min
+        ),
+        tz,
+    )
+    if schedule.frequency == "weekly":
+        return _next_weekly_occurrence(schedule, days, next_day, tz)
+    return next_day
+
+
+def set_due_times(apps, schema_editor):
+    """
+    Set the last dose and next due times of existing schedules. Due times are
+    computed in the default time zone, until doses are given.
+    """
+    medication_model = apps.get_model("core", "Medication")
+    schedule_model = apps.get_model("core", "MedicationSchedule")
+    last_dose = (
+        medication_model.objects.filter(
+            medication_schedule=OuterRef("pk"), child=OuterRef("child")
+        )
+        .order_by("-time")
+        .values("time")[:1]
+    )
+    for schedule in schedule_model.objects.annotate(last_dose_time=Subquery(last_dose)):
+        schedule.last_given_at = schedule.last_dose_time
+        schedule.next_due_at = _next_due_at(schedule)
+        schedule.save(update_fields=["last_given_at", "next_due_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0040_event_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="medicationschedule",
+            name="last_given_at",
+            field=models.DateTimeField(
+                editable=False, null=True, verbose_name="Last given"
+            ),
+        ),
+        migrations.AddField(
+            model_name="medicationschedule",
+            name="next_due_at",
+            field=models.DateTimeField(
+                editable=False, null=True, verbose_name="Next due"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="medicationschedule",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["next_due_at"],
+                name="medschedule_next_due_idx",
+            ),
+        ),
+        migrations.RunPython(set_due_times, migrations.RunPython.noop),
+    ]
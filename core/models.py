@@ -22,8 +22,10 @@ from core.choices import (
     FeedingType,
     MedicationFrequency,
     MedicationUnit,
+    RollupActivity,
     Sex,
 )
+from core.periods import active_index
 from core.utils import random_color, timezone_aware_duration
 
 
@@ -40,7 +42,11 @@ def validate_date(date, field_name):
         )
 
 
-def validate_duration(model, max_duration=datetime.timedelta(hours=24)):
+# The maximum duration of entries with a start and end time.
+MAX_DURATION = datetime.timedelta(hours=24)
+
+
+def validate_duration(model, max_duration=MAX_DURATION):
     """
     Basic sanity checks for models with a duration
     :param model: a model instance with 'start' and 'end' attributes
@@ -67,14 +73,27 @@ def validate_unique_period(queryset, model):
     :param model: a model instance with 'start' and 'end' attributes
     :return:
     """
-    if model.id:
-        queryset = queryset.exclude(id=model.id)
-    if model.start and model.end:
-        if queryset.filter(start__lt=model.end, end__gt=model.start):
-            raise ValidationError(
-                _("Another entry intersects the specified time period."),
-                code="period_intersection",
-            )
+    if not (model.start and model.end):
+        return
+    index = active_index()
+    if index is not None:
+        overlaps = index.overlaps(model)
+    else:
+        if model.id:
+            queryset = queryset.exclude(id=model.id)
+        # Entries can not be longer than MAX_DURATION, so only entries starting
+        # within that time before this one need to be checked. This keeps the
+        # scan of the (child, start) index short.
+        overlaps = queryset.filter(
+            start__gt=model.start - MAX_DURATION,
+            start__lt=model.end,
+            end__gt=model.start,
+        ).exists()
+    if overlaps:
+        raise ValidationError(
+            _("Another entry intersects the specified time period."),
+            code="period_intersection",
+        )
 
 
 def validate_time(time, field_name):
@@ -167,6 +186,9 @@ class BMI(models.Model):
         ordering = ["-date", "-id"]
         verbose_name = _("BMI")
         verbose_name_plural = _("BMI")
+        indexes = [
+            models.Index(fields=["child", "-date"], name="bmi_child_date_idx"),
+        ]
 
     def __str__(self):
         return str(_("BMI"))
@@ -243,6 +265,53 @@ post_save.connect(_invalidate_child_count, sender=Child)
 post_delete.connect(_invalidate_child_count, sender=Child)
 
 
+class DailyRollup(models.Model):
+    """
+    Per-child, per-day summary of an activity, maintained by the handlers in
+    `core.rollups`. Days are bucketed in the default time zone and gaps are
+    attributed to the day of the entry that starts the gap.
+    """
+
+    model_name = "dailyrollup"
+    child = models.ForeignKey(
+        "Child",
+        on_delete=models.CASCADE,
+        related_name="daily_rollups",
+        verbose_name=_("Child"),
+    )
+    activity = models.CharField(
+        choices=RollupActivity.choices, max_length=32, verbose_name=_("Activity")
+    )
+    date = models.DateField(verbose_name=_("Date"))
+    count = models.PositiveIntegerField(default=0, verbose_name=_("Count"))
+    duration_total = models.DurationField(
+        default=datetime.timedelta, verbose_name=_("Total duration")
+    )
+    gap_count = models.PositiveIntegerField(default=0, verbose_name=_("Gap count"))
+    gap_total = models.DurationField(
+        default=datetime.timedelta, verbose_name=_("Total gap")
+    )
+    first_time = models.DateTimeField(verbose_name=_("First time"))
+    last_time = models.DateTimeField(verbose_name=_("Last time"))
+
+    objects = models.Manager()
+
+    class Meta:
+        default_permissions = ("view",)
+        ordering = ["child", "activity", "date"]
+        verbose_name = _("Daily Rollup")
+        verbose_name_plural = _("Daily Rollups")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["child", "activity", "date"],
+                name="unique_child_activity_date",
+            )
+        ]
+
+    def __str__(self):
+        return "{} {} {}".format(self.child_id, self.activity, self.date)
+
+
 class DiaperChange(models.Model):
     model_name = "diaperchange"
     child = models.ForeignKey(
@@ -273,6 +342,9 @@ class DiaperChange(models.Model):
         ordering = ["-time"]
         verbose_name = _("Diaper Change")
         verbose_name_plural = _("Diaper Changes")
+        indexes = [
+            models.Index(fields=["child", "-time"], name="diaperchange_child_time_idx"),
+        ]
 
     def __str__(self):
         return str(_("Diaper Change"))
@@ -332,6 +404,10 @@ class Feeding(models.Model):
         ordering = ["-start"]
         verbose_name = _("Feeding")
         verbose_name_plural = _("Feedings")
+        indexes = [
+            models.Index(fields=["child", "-start"], name="feeding_child_start_idx"),
+            models.Index(fields=["child", "-end"], name="feeding_child_end_idx"),
+        ]
 
     def __str__(self):
         return str(_("Feeding"))
@@ -423,6 +499,9 @@ class HeadCircumference(models.Model):
         ordering = ["-date", "-id"]
         verbose_name = _("Head Circumference")
         verbose_name_plural = _("Head Circumference")
+        indexes = [
+            models.Index(fields=["child", "-date"], name="headcirc_child_date_idx"),
+        ]
 
     def __str__(self):
         return str(_("Head Circumference"))
@@ -453,6 +532,9 @@ class Height(models.Model):
         ordering = ["-date", "-id"]
         verbose_name = _("Height")
         verbose_name_plural = _("Height")
+        indexes = [
+            models.Index(fields=["child", "-date"], name="height_child_date_idx"),
+        ]
 
     def __str__(self):
         return str(_("Height"))
@@ -504,6 +586,9 @@ class Note(models.Model):
         ordering = ["-time"]
         verbose_name = _("Note")
         verbose_name_plural = _("Notes")
+        indexes = [
+            models.Index(fields=["child", "-time"], name="note_child_time_idx"),
+        ]
 
     def __str__(self):
         return str(_("Note"))
@@ -545,6 +630,10 @@ class Pumping(models.Model):
         ordering = ["-start"]
         verbose_name = _("Pumping")
         verbose_name_plural = _("Pumping")
+        indexes = [
+            models.Index(fields=["child", "-start"], name="pumping_child_start_idx"),
+            models.Index(fields=["child", "-end"], name="pumping_child_end_idx"),
+        ]
 
     def __str__(self):
         return str(_("Pumping"))
@@ -589,17 +678,17 @@ class Sleep(models.Model):
         ordering = ["-start"]
         verbose_name = _("Sleep")
         verbose_name_plural = _("Sleep")
+        indexes = [
+            models.Index(fields=["child", "-start"], name="sleep_child_start_idx"),
+            models.Index(fields=["child", "-end"], name="sleep_child_end_idx"),
+        ]
 
     def __str__(self):
         return str(_("Sleep"))
 
     def save(self, *args, **kwargs):
         if self.nap is None:
-            self.nap = (
-                Sleep.settings.nap_start_min
-                <= timezone.localtime(self.start).time()
-                <= Sleep.settings.nap_start_max
-            )
+            self.nap = self.is_nap_time()
         if self.start and self.end:
             self.duration = timezone_aware_duration(self.start, self.end)
         super(Sleep, self).save(*args, **kwargs)
@@ -610,6 +699,14 @@ class Sleep(models.Model):
         validate_duration(self)
         validate_unique_period(Sleep.objects.filter(child=self.child), self)
 
+    def is_nap_time(self):
+        """Check if the sleep starts within the configured nap times."""
+        return (
+            Sleep.settings.nap_start_min
+            <= timezone.localtime(self.start).time()
+            <= Sleep.settings.nap_start_max
+        )
+
 
 class Temperature(models.Model):
     model_name = "temperature"
@@ -635,6 +732,9 @@ class Temperature(models.Model):
         ordering = ["-time"]
         verbose_name = _("Temperature")
         verbose_name_plural = _("Temperature")
+        indexes = [
+            models.Index(fields=["child", "-time"], name="temperature_child_time_idx"),
+        ]
 
     def __str__(self):
         return str(_("Temperature"))
@@ -746,6 +846,10 @@ class TummyTime(models.Model):
         ordering = ["-start"]
         verbose_name = _("Tummy Time")
         verbose_name_plural = _("Tummy Time")
+        indexes = [
+            models.Index(fields=["child", "-start"], name="tummytime_child_start_idx"),
+            models.Index(fields=["child", "-end"], name="tummytime_child_end_idx"),
+        ]
 
     def __str__(self):
         return str(_("Tummy Time"))
@@ -821,6 +925,14 @@ class MedicationSchedule(models.Model):
     active = models.BooleanField(default=True, verbose_name=_("Active"))
     notes = models.TextField(blank=True, null=True, verbose_name=_("Notes"))
 
+    # Kept up to date by core.schedules.
+    last_given_at = models.DateTimeField(
+        editable=False, null=True, verbose_name=_("Last given")
+    )
+    next_due_at = models.DateTimeField(
+        editable=False, null=True, verbose_name=_("Next due")
+    )
+
     objects = models.Manager()
 
     class Meta:
@@ -828,10 +940,30 @@ class MedicationSchedule(models.Model):
         ordering = ["name"]
         verbose_name = _("Medication Schedule")
         verbose_name_plural = _("Medication Schedules")
+        indexes = [
+            models.Index(
+                fields=["child", "active"],
+                condition=models.Q(active=True),
+                name="medschedule_child_active_idx",
+            ),
+            models.Index(
+                fields=["next_due_at"],
+                condition=models.Q(active=True),
+                name="medschedule_next_due_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Values may still be strings (e.g. "08:00") before they are saved.
+        for name in ("schedule_time", "interval_hours"):
+            field = self._meta.get_field(name)
+            setattr(self, name, field.to_python(getattr(self, name)))
+        self.next_due_at = self.get_next_due_at()
+        super(MedicationSchedule, self).save(*args, **kwargs)
+
     def get_scheduled_days(self):
         """Return list of active weekday numbers (0=Monday, 6=Sunday)."""
         return [i for i, day in enumerate(self.DAY_FIELDS) if getattr(self, day)]
@@ -911,6 +1043,33 @@ class MedicationSchedule(models.Model):
             )
         return now
 
+    def get_next_due_at(self):
+        """
+        Return the value of `next_due_at`: the next due time of schedules
+        after their last dose (`last_given_at`).
+
+        First doses of interval schedules, of daily schedules without a time
+        and of weekly schedules are due "now" and never overdue, so they have
+        no stored due time. First doses of daily schedules with a time are due
+        today, see `core.schedules.rollover`. Due times are computed in the
+        default time zone, whoever saves the schedule or its doses.
+        """
+        with timezone.override(timezone.get_default_timezone()):
+            return self._get_next_due_at()
+
+    def _get_next_due_at(self):
+        if self.frequency == MedicationFrequency.WEEKLY:
+            if not self.get_scheduled_days():
+                return None
+        if self.frequency == MedicationFrequency.INTERVAL:
+            if not self.interval_hours:
+                return None
+        if self.last_given_at is not None:
+            return self.next_due_time(self.last_given_at)
+        if self.frequency == MedicationFrequency.DAILY and self.schedule_time:
+            return self.next_due_time()
+        return None
+
     def _next_weekly_occurrence(self, earliest, tz):
         """
         Return the first scheduled weekday occurrence on or after *earliest*.
@@ -976,6 +1135,13 @@ class Medication(models.Model):
         ordering = ["-time"]
         verbose_name = _("Medication")
         verbose_name_plural = _("Medications")
+        indexes = [
+            models.Index(fields=["child", "-time"], name="medication_child_time_idx"),
+            models.Index(
+                fields=["medication_schedule", "time"],
+                name="medication_schedule_time_idx",
+            ),
+        ]
 
     def __str__(self):
         return str(_("Medication"))
@@ -1006,6 +1172,9 @@ class Weight(models.Model):
         ordering = ["-date", "-id"]
         verbose_name = _("Weight")
         verbose_name_plural = _("Weight")
+        indexes = [
+            models.Index(fields=["child", "-date"], name="weight_child_date_idx"),
+        ]
 
     def __str__(self):
         return str(_("Weight"))
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Expected doses of medication schedules and their adherence.
+
+`MedicationSchedule.next_due_time` only tells when the next dose is due. The
+occurrences of a schedule are all doses expected within a time range: dose
+times of daily and weekly schedules are computed for all days of the range at
+once, stepping through the days of each scheduled weekday. Doses of interval
+schedules are due a number of hours after the previous dose, so they are
+computed from the gaps between doses, the number of doses missed in a gap
+being its length divided by the interval.
+
+Occurrences are matched to the doses (Medication instances) of the schedules,
+taken within half a day of daily and weekly doses (or on the day, for
+schedules without a time) and within half the interval of interval doses.
+Schedules have no start or end date, so they are taken to start with their
+first dose and inactive schedules to end with their last dose.
+"""
+
+import bisect
+import datetime
+import math
+from collections import namedtuple
+
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from core import models
+from core.choices import MedicationFrequency
+
+# Doses within half a day of a daily or weekly dose time, like
+# `MedicationSchedule.next_due_time`.
+HALF_DAY = datetime.timedelta(hours=12)
+# Doses taken this long after (or before) their due time are on time.
+ON_TIME = datetime.timedelta(hours=1)
+
+
+class Occurrence(namedtuple("Occurrence", ["time", "all_day", "dose_time"])):
+    """An expected dose: its due time (the start of the day for schedules
+    without a time), whether it is due all day and the time of the dose taken
+    for it (`None` if it was missed).
+    """
+
+    __slots__ = ()
+
+    @property
+    def on_time(self):
+        return self.dose_time is not None and (
+            self.all_day or abs(self.dose_time - self.time) <= ON_TIME
+        )
+
+
+class Adherence:
+    """The expected doses of a schedule within a time range.
+
+    Only occurrences that were taken, or can no longer be taken, are included.
+    Doses within the range not taken for an occurrence (e.g. twice in a day)
+    are `extra`.
+    """
+
+    def __init__(self, schedule, occurrences, extra):
+        self.schedule = schedule
+        self.occurrences = occurrences
+        self.extra = extra
+
+    @property
+    def expected(self):
+        return len(self.occurrences)
+
+    @property
+    def taken(self):
+        return sum(1 for o in self.occurrences if o.dose_time is not None)
+
+    @property
+    def on_time(self):
+        return sum(1 for o in self.occurrences if o.on_time)
+
+    @property
+    def missed(self):
+        return self.expected - self.taken
+
+    @property
+    def rate(self):
+        """The share of expected doses taken, or `None` if none are expected."""
+        if not self.occurrences:
+            return None
+        return self.taken / self.expected
+
+
+def get_margin(schedule):
+    """
+    Get how long before or after its due time a dose of a schedule may be
+    taken.
+    :param schedule: an instance of the MedicationSchedule model.
+    :returns: a timedelta.
+    """
+    if schedule.frequency == MedicationFrequency.INTERVAL:
+        return datetime.timedelta(hours=schedule.interval_hours or 0) / 2
+    return HALF_DAY
+
+
+def get_occurrences(schedule, start, end):
+    """
+    Get the due times of a daily or weekly schedule.
+    :param schedule: an instance of the MedicationSchedule model.
+    :param start: the first time (inclusive).
+    :param end: the last time (exclusive).
+    :returns: a sorted list of aware datetimes in the current time zone, at
+              the start of days for schedules without a time.
+    """
+    if schedule.frequency == MedicationFrequency.INTERVAL:
+        raise ValueError("Doses of interval schedules depend on earlier doses.")
+    if schedule.frequency == MedicationFrequency.WEEKLY:
+        weekdays = schedule.get_scheduled_days()
+    else:
+        weekdays = range(7)
+    first = timezone.localtime(start).date()
+    days = (timezone.localtime(end).date() - first).days + 1
+    dates = sorted(
+        first + datetime.timedelta(days=day)
+        for weekday in weekdays
+        for day in range((weekday - first.weekday()) % 7, days, 7)
+    )
+    time = schedule.schedule_time or datetime.time.min
+    tz = timezone.get_current_timezone()
+    times = [
+        timezone.make_aware(datetime.datetime.combine(date, time), tz) for date in dates
+    ]
+    return times[bisect.bisect_left(times, start) : bisect.bisect_left(times, end)]
+
+
+def _calendar_occurrences(schedule, doses, start, end, now):
+    """Match doses to the due times of a daily or weekly schedule."""
+    all_day = schedule.schedule_time is None
+    if all_day:
+        # Any dose on a day is taken for its occurrence, including the day of
+        # `start` when it does not start at midnight.
+        times = get_occurrences(schedule, start - datetime.timedelta(days=1), end)
+        bounds = [
+            (
+                time,
+                timezone.make_aware(
+                    datetime.datetime.combine(
+                        timezone.localtime(time).date() + datetime.timedelta(days=1),
+                        datetime.time.min,
+                    ),
+                    time.tzinfo,
+                ),
+            )
+            for time in times
+        ]
+    else:
+        times = get_occurrences(schedule, start - HALF_DAY, end)
+        bounds = [(time - HALF_DAY, time + HALF_DAY) for time in times]
+
+    occurrences = []
+    used = set()
+    for time, (lower, upper) in zip(times, bounds):
+        if upper <= schedule.first_dose_time:
+            continue
+        if not schedule.active and lower > schedule.last_dose_time:
+            break
+        # The closest dose within the bounds (which overlap on days shortened
+        # by DST changes).
+        i = bisect.bisect_left(doses, lower)
+        j = bisect.bisect_left(doses, upper, lo=i)
+        dose = min(
+            (k for k in range(i, j) if k not in used),
+            key=lambda k: abs(doses[k] - time),
+            default=None,
+        )
+        if dose is not None:
+            used.add(dose)
+            dose_time = doses[dose]
+        elif upper <= now:
+            dose_time = None
+        else:
+            # Not missed yet.
+            continue
+        if time >= start:
+            occurrences.append(Occurrence(time, all_day, dose_time))
+    extra = [dose for i, dose in enumerate(doses) if i not in used]
+    return occurrences, extra
+
+
+def _interval_occurrences(schedule, doses, start, end, now):
+    """Match doses to the due times of an interval schedule."""
+    interval = datetime.timedelta(hours=schedule.interval_hours)
+    margin = interval / 2
+    occurrences = []
+    extra = []
+    previous = schedule.previous_dose_time
+    if previous is None and doses:
+        # The first dose of the schedule.
+        previous = doses[0]
+        occurrences.append(Occurrence(previous, False, previous))
+        doses = doses[1:]
+    for dose in doses:
+        gap = dose - previous
+        if gap < margin:
+            extra.append(dose)
+        else:
+            # The dose is taken for the n-th due time after the previous
+            # dose, the others were missed.
+            n = math.floor((gap + margin) / interval)
+            occurrences.extend(
+                Occurrence(previous + interval * i, False, None) for i in range(1, n)
+            )
+            occurrences.append(Occurrence(previous + interval * n, False, dose))
+        previous = dose
+    if previous is not None and schedule.active:
+        # Due times after the last dose that can no longer be taken.
+        n = min(
+            math.floor((now - margin - previous) / interval),
+            math.ceil((end - previous) / interval) - 1,
+        )
+        occurrences.extend(
+            Occurrence(previous + interval * i, False, None) for i in range(1, n + 1)
+        )
+    return [o for o in occurrences if start <= o.time < end], extra
+
+
+def get_adherence(schedules, start, end, now=None):
+    """
+    Get the adherence of medication schedules within a time range.
+    :param schedules: a QuerySet of MedicationSchedule instances.
+    :param start: the first time (inclusive).
+    :param end: the last time (exclusive).
+    :param now: the time until which doses are missed (defaults to now).
+    :returns: a list of Adherence instances, in the order of `schedules`.
+    """
+    now = now or timezone.now()
+    doses = models.Medication.objects.filter(
+        medication_schedule=OuterRef("pk"), child=OuterRef("child")
+    )
+    schedules = list(
+        schedules.annotate(
+            first_dose_time=Subquery(doses.order_by("time").values("time")[:1]),
+            last_dose_time=Subquery(doses.order_by("-time").values("time")[:1]),
+        )
+    )
+    # Schedules without doses (or due times) expect none.
+    dosed = [
+        schedule
+        for schedule in schedules
+        if schedule.first_dose_time is not None and _has_occurrences(schedule)
+    ]
+    if not dosed:
+        return [Adherence(schedule, [], []) for schedule in schedules]
+
+    # Doses within the margins of the first and last due times, and the last
+    # dose before them (for interval schedules).
+    margin = max(get_margin(schedule) for schedule in dosed)
+    lower, upper = start - margin, end + margin
+    schedule_doses = {schedule.pk: [] for schedule in dosed}
+    interval_ids = [
+        schedule.pk
+        for schedule in dosed
+        if schedule.frequency == MedicationFrequency.INTERVAL
+    ]
+    previous_dose_times = {}
+    if interval_ids:
+        previous_dose_times = dict(
+            models.MedicationSchedule.objects.filter(pk__in=interval_ids)
+            .annotate(
+                previous_dose_time=Subquery(
+                    doses.filter(time__lt=lower).order_by("-time").values("time")[:1]
+                )
+            )
+            .values_list("pk", "previous_dose_time")
+        )
+    for schedule_id, time in (
+        models.Medication.objects.filter(
+            medication_schedule__in=schedule_doses,
+            child=F("medication_schedule__child"),
+            time__gte=lower,
+            time__lt=upper,
+        )
+        .order_by("time")
+        .values_list("medication_schedule_id", "time")
+    ):
+        schedule_doses[schedule_id].append(time)
+
+    adherence = []
+    for schedule in schedules:
+        if schedule.pk not in schedule_doses:
+            occurrences, extra = [], []
+        elif schedule.frequency == MedicationFrequency.INTERVAL:
+            schedule.previous_dose_time = previous_dose_times[schedule.pk]
+            occurrences, extra = _interval_occurrences(
+                schedule, schedule_doses[schedule.pk], start, end, now
+            )
+        else:
+            occurrences, extra = _calendar_occurrences(
+                schedule, schedule_doses[schedule.pk], start, end, now
+            )
+        adherence.append(
+            Adherence(
+                schedule, occurrences, [dose for dose in extra if start <= dose < end]
+            )
+        )
+    return adherence
+
+
+def _has_occurrences(schedule):
+    if schedule.frequency == MedicationFrequency.INTERVAL:
+        return bool(schedule.interval_hours)
+    if schedule.frequency == MedicationFrequency.WEEKLY:
+        return bool(schedule.get_scheduled_days())
+    return True
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Growth percentile curves.
+
+The WeightPercentile and HeightPercentile tables are static reference data, so
+the curves of each measure and sex are read once per process in to compact
+arrays. Curves for any age range are served by slicing the arrays and
+measurements are ranked by interpolating between them.
+"""
+
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from core import models
+from core.choices import Sex
+
+# The percentiles of the reference data, in ascending order.
+PERCENTILES = (3, 15, 50, 85, 97)
+
+# Reference data models by measure, with the suffix of their value fields.
+MEASURES = {
+    "height": (models.HeightPercentile, "height"),
+    "weight": (models.WeightPercentile, "weight"),
+}
+
+_curves = {}
+_lock = threading.Lock()
+
+
+class PercentileCurves:
+    """
+    Percentile values of a measure by age.
+
+    `ages` holds the ages (in days) of the reference data in ascending order
+    and `values` the values of each of PERCENTILES at those ages.
+    """
+
+    __slots__ = ("ages", "values")
+
+    def __init__(self, ages, values):
+        self.ages = ages
+        self.values = values
+
+    def __len__(self):
+        return len(self.ages)
+
+    def until(self, age):
+        """
+        Get the curves up to an age.
+        :param age: the last age (in days) to include.
+        :returns: a PercentileCurves instance.
+        """
+        end = bisect_right(self.ages, age)
+        return PercentileCurves(
+            self.ages[:end], tuple(values[:end] for values in self.values)
+        )
+
+    def at(self, age):
+        """
+        Get the percentile values at an age, interpolating between the ages
+        of the reference data.
+        :param age: an age in days (may be fractional).
+        :returns: a list of values in the order of PERCENTILES, or `None` if
+                  the age is outside of the reference data.
+        """
+        if not self.ages or not self.ages[0] <= age <= self.ages[-1]:
+            return None
+        i = bisect_left(self.ages, age)
+        if self.ages[i] == age:
+            return [values[i] for values in self.values]
+        weight = (age - self.ages[i - 1]) / (self.ages[i] - self.ages[i - 1])
+        return [
+            values[i - 1] + (values[i] - values[i - 1]) * weight
+            for values in self.values
+        ]
+
+    def rank(self, age, value):
+        """
+        Get the percentile rank of a measurement, interpolating linearly
+        between the percentile curves.
+        :param age: the age (in days) at the time of the measurement.
+        :param value: the measured value.
+        :returns: a float between the first and last of PERCENTILES (values
+                  outside of their curves are clamped), or `None` if the age
+                  is outside of the reference data.
+        """
+        values = self.at(age)
+        if values is None:
+            return None
+        if value <= values[0]:
+            return float(PERCENTILES[0])
+        if value >= values[-1]:
+            return float(PERCENTILES[-1])
+        i = bisect_right(values, value)
+        lower, upper = values[i - 1], values[i]
+        weight = (value - lower) / (upper - lower) if upper > lower else 0
+        return PERCENTILES[i - 1] + (PERCENTILES[i] - PERCENTILES[i - 1]) * weight
+
+
+def _load(measure, sex):
+    model, suffix = MEASURES[measure]
+    fields = ["p{}_{}".format(percentile, suffix) for percentile in PERCENTILES]
+    rows = (
+        model.objects.filter(sex=sex)
+        .order_by("age_in_days")
+        .values_list("age_in_days", *fields)
+    )
+    ages = array("l")
+    values = tuple(array("d") for _ in PERCENTILES)
+    for age_in_days, *row in rows.iterator():
+        ages.append(age_in_days.days)
+        for column, value in zip(values, row):
+            column.append(value)
+    return PercentileCurves(ages, values)
+
+
+def get_curves(measure, sex):
+    """
+    Get the percentile curves of a measure.
+    :param measure: a key of MEASURES.
+    :param sex: a value of `models.Sex`.
+    :returns: a PercentileCurves instance, or `None` if there is no reference
+              data for the sex.
+    """
+    # The reference data only covers the choices of `Sex`, so children without
+    # a sex never have curves.
+    if sex not in Sex.values:
+        return None
+    key = (measure, sex)
+    curves = _curves.get(key)
+    if curves is None:
+        with _lock:
+            curves = _curves.get(key)
+            if curves is None:
+                curves = _load(measure, sex)
+                # Missing data is read again, in case it is added later.
+                if curves:
+                    _curves[key] = curves
+    return curves or None
+
+
+def percentile_rank(measure, sex, age, value):
+    """
+    Get the percentile rank of a measurement.
+    :param measure: a key of MEASURES.
+    :param sex: a value of `models.Sex`.
+    :param age: the age (in days) at the time of the measurement.
+    :param value: the measured value.
+    :returns: see `PercentileCurves.rank`, or `None` if there is no reference
+              data for the sex.
+    """
+    curves = get_curves(measure, sex)
+    return curves.rank(age, value) if curves else None
+
+
+def clear():
+    """Forget the loaded curves, e.g. after the reference data changed."""
+    _curves.clear()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory overlap checks for entries with a start and end time.
+
+When many entries are validated together (e.g. an import), each child's
+existing periods are loaded once into sorted lists and every new period is
+checked with a binary search instead of a query per entry.
+"""
+
+import bisect
+import contextlib
+from contextvars import ContextVar
+
+_active_index = ContextVar("core_period_index", default=None)
+
+
+class PeriodIndex:
+    """Sorted, non-overlapping periods of entries per model and child."""
+
+    def __init__(self):
+        self._periods = {}
+
+    def _get(self, model):
+        key = (type(model), model.child_id)
+        if key not in self._periods:
+            self._periods[key] = list(
+                type(model)
+                .objects.filter(child_id=model.child_id)
+                .order_by("start", "id")
+                .values_list("start", "end", "id")
+            )
+        return self._periods[key]
+
+    def overlaps(self, model):
+        """
+        Check if a model instance's period intersects an indexed period.
+        :param model: a model instance with 'start' and 'end' attributes.
+        :returns: True if another entry intersects the period.
+        """
+        periods = self._get(model)
+        # Periods do not overlap, so the one starting last before the end of
+        # this period also ends last.
+        i = bisect.bisect_left(periods, (model.end,))
+        while i > 0:
+            i -= 1
+            start, end, pk = periods[i]
+            if model.id is None or pk != model.id:
+                return end > model.start
+        return False
+
+    def add(self, model):
+        """
+        Add (or move) a model instance's period in the index.
+        :param model: a model instance with 'start' and 'end' attributes.
+        """
+        if model.id is not None:
+            for (model_class, child_id), periods in self._periods.items():
+                if model_class is type(model):
+                    periods[:] = [period for period in periods if period[2] != model.id]
+        bisect.insort(self._get(model), (model.start, model.end, model.id or 0))
+
+
+@contextlib.contextmanager
+def indexed_periods():
+    """Check periods against a shared in-memory index within the block."""
+    token = _active_index.set(PeriodIndex())
+    try:
+        yield _active_index.get()
+    finally:
+        _active_index.reset(token)
+
+
+def active_index():
+    """Get the period index of the current `indexed_periods` block, if any."""
+    return _active_index.get()
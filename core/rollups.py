@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Per-child daily rollups of activity statistics.
+
+Each `DailyRollup` row summarizes one child's entries of one activity for one
+day: the number of entries, their total duration, the first and last start
+times and the gaps between each entry and the entry that follows it. Rows are
+recomputed for the affected days whenever an entry is saved or deleted, so
+statistics over long windows can be read without loading the full history.
+"""
+
+import datetime
+import itertools
+from typing import NamedTuple
+
+from django.apps import apps as global_apps
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core import changes
+from core.choices import RollupActivity
+
+
+class Activity(NamedTuple):
+    model_name: str
+    start_field: str
+    end_field: str
+    filters: dict
+
+
+ACTIVITIES = {
+    RollupActivity.DIAPER_CHANGE: Activity("DiaperChange", "time", "time", {}),
+    RollupActivity.FEEDING: Activity("Feeding", "start", "end", {}),
+    RollupActivity.NAP: Activity("Sleep", "start", "end", {"nap": True}),
+    RollupActivity.SLEEP: Activity("Sleep", "start", "end", {}),
+}
+
+# Model names of the core models that feed rollups, mapped to their activities.
+MODEL_ACTIVITIES = {
+    model_name: [
+        activity
+        for activity, spec in ACTIVITIES.items()
+        if spec.model_name == model_name
+    ]
+    for model_name in {spec.model_name for spec in ACTIVITIES.values()}
+}
+
+
+def _local_date(value):
+    """Get the date of *value* in the default time zone."""
+    tz = timezone.get_default_timezone()
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, tz)
+    return timezone.localtime(value, tz).date()
+
+
+def _day_bounds(date):
+    """Get the aware start and end datetimes of *date* in the default time zone."""
+    tz = timezone.get_default_timezone()
+    start = datetime.datetime.combine(date, datetime.time.min)
+    end = datetime.datetime.combine(
+        date + datetime.timedelta(days=1), datetime.time.min
+    )
+    return timezone.make_aware(start, tz), timezone.make_aware(end, tz)
+
+
+def _queryset(activity, child_id, apps=global_apps):
+    spec = ACTIVITIES[activity]
+    model = apps.get_model("core", spec.model_name)
+    return model.objects.filter(child_id=child_id, **spec.filters)
+
+
+def _rows(queryset, spec):
+    """Get time ordered (start, end) tuples from *queryset*."""
+    if spec.start_field == spec.end_field:
+        return [
+            (start, start)
+            for start in queryset.order_by(spec.start_field, "id").values_list(
+                spec.start_field, flat=True
+            )
+        ]
+    return list(
+        queryset.order_by(spec.start_field, "id").values_list(
+            spec.start_field, spec.end_field
+        )
+    )
+
+
+def _next_start(queryset, spec, after):
+    """Get the start of the first entry in *queryset* starting on/after *after*."""
+    return (
+        queryset.filter(**{spec.start_field + "__gte": after})
+        .order_by(spec.start_field, "id")
+        .values_list(spec.start_field, flat=True)
+        .first()
+    )
+
+
+def _summarize(rows, next_start=None):
+    """
+    Summarize time ordered (start, end) tuples.
+    :param rows: a non-empty list of (start, end) tuples.
+    :param next_start: start time of the entry following the last row, if any.
+    :returns: a dictionary of DailyRollup field values.
+    """
+    summary = {
+        "count": len(rows),
+        "duration_total": datetime.timedelta(0),
+        "gap_count": 0,
+        "gap_total": datetime.timedelta(0),
+        "first_time": rows[0][0],
+        "last_time": rows[-1][0],
+    }
+    successors = [start for start, end in rows[1:]] + [next_start]
+    for (start, end), successor in zip(rows, successors):
+        summary["duration_total"] += end - start
+        if successor is not None:
+            summary["gap_count"] += 1
+            summary["gap_total"] += successor - end
+    return summary
+
+
+def recompute_day(child_id, activity, date, apps=global_apps):
+    """
+    Recompute (or remove) the rollup of *activity* for a child on *date*.
+    :param child_id: the id of a Child instance.
+    :param activity: a RollupActivity value.
+    :param date: the date (in the default time zone) to recompute.
+    """
+    spec = ACTIVITIES[activity]
+    queryset = _queryset(activity, child_id, apps)
+    rollup_model = apps.get_model("core", "DailyRollup")
+    day_start, day_end = _day_bounds(date)
+
+    rows = _rows(
+        queryset.filter(
+            **{
+                spec.start_field + "__gte": day_start,
+                spec.start_field + "__lt": day_end,
+            }
+        ),
+        spec,
+    )
+    if not rows:
+        rollup_model.objects.filter(
+            child_id=child_id, activity=activity, date=date
+        ).delete()
+        return
+
+    rollup_model.objects.update_or_create(
+        child_id=child_id,
+        activity=activity,
+        date=date,
+        defaults=_summarize(rows, _next_start(queryset, spec, day_end)),
+    )
+
+
+def rebuild(child_id, apps=global_apps):
+    """
+    Rebuild all rollups for a child from scratch in one pass per activity.
+    :param child_id: the id of a Child instance.
+    """
+    rollup_model = apps.get_model("core", "DailyRollup")
+    rollup_model.objects.filter(child_id=child_id).delete()
+
+    rollups = []
+    for activity, spec in ACTIVITIES.items():
+        rows = _rows(_queryset(activity, child_id, apps), spec)
+        days = [
+            (date, list(day_rows))
+            for date, day_rows in itertools.groupby(
+                rows, key=lambda row: _local_date(row[0])
+            )
+        ]
+        next_starts = [day_rows[0][0] for date, day_rows in days[1:]] + [None]
+        for (date, day_rows), next_start in zip(days, next_starts):
+            rollups.append(
+                rollup_model(
+                    child_id=child_id,
+                    activity=activity,
+                    date=date,
+                    **_summarize(day_rows, next_start),
+                )
+            )
+    rollup_model.objects.bulk_create(rollups)
+
+
+def totals(child, activity, since=None):
+    """
+    Get totals of *activity* entries for a child, optionally limited to entries
+    starting after a specific time. Whole days are read from rollups and only
+    the entries of the partial first day are queried directly.
+    :param child: an instance of the Child model.
+    :param activity: a RollupActivity value.
+    :param since: an aware datetime or None for the child's full history.
+    :returns: a dictionary with count, duration_total, gap_count, gap_total and
+              days (the number of days with at least one entry).
+    """
+    rollups = global_apps.get_model("core", "DailyRollup").objects.filter(
+        child=child, activity=activity
+    )
+    if since is not None:
+        rollups = rollups.filter(date__gt=_local_date(since))
+    result = rollups.aggregate(
+        count=Sum("count"),
+        duration_total=Sum("duration_total"),
+        gap_count=Sum("gap_count"),
+        gap_total=Sum("gap_total"),
+        days=Count("id"),
+    )
+    result["count"] = result["count"] or 0
+    result["duration_total"] = result["duration_total"] or datetime.timedelta(0)
+    result["gap_count"] = result["gap_count"] or 0
+    result["gap_total"] = result["gap_total"] or datetime.timedelta(0)
+
+    if since is not None:
+        spec = ACTIVITIES[activity]
+        queryset = _queryset(activity, child.id)
+        day_start, day_end = _day_bounds(_local_date(since))
+        rows = _rows(
+            queryset.filter(
+                **{spec.start_field + "__gt": since, spec.start_field + "__lt": day_end}
+            ),
+            spec,
+        )
+        if rows:
+            partial = _summarize(rows, _next_start(queryset, spec, day_end))
+            for key in ("count", "duration_total", "gap_count", "gap_total"):
+                result[key] += partial[key]
+            result["days"] += 1
+
+    return result
+
+
+def _affected_days(activity, positions):
+    """
+    Get the (child id, date) pairs whose rollups change when entries at
+    *positions* are added or removed: the entry's own day and the day of the
+    entry preceding it (whose gap ends at the changed entry).
+    """
+    spec = ACTIVITIES[activity]
+    days = set()
+    for child_id, start in positions:
+        days.add((child_id, _local_date(start)))
+        previous = (
+            _queryset(activity, child_id)
+            .filter(**{spec.start_field + "__lt": start})
+            .order_by("-" + spec.start_field, "-id")
+            .values_list(spec.start_field, flat=True)
+            .first()
+        )
+        if previous is not None:
+            days.add((child_id, _local_date(previous)))
+    return days
+
+
+def _start_field(sender):
+    return ACTIVITIES[MODEL_ACTIVITIES[sender.__name__][0]].start_field
+
+
+def _update(sender, positions):
+    for activity in MODEL_ACTIVITIES[sender.__name__]:
+        for child_id, date in _affected_days(activity, positions):
+            recompute_day(child_id, activity, date)
+
+
+def on_post_save(sender, instance, **kwargs):
+    start_field = _start_field(sender)
+    positions = {(instance.child_id, getattr(instance, start_field))}
+    # Where the entry was before it was changed.
+    previous = changes.get_previous(instance)
+    if previous:
+        positions.add((previous["child_id"], previous[start_field]))
+    _update(sender, positions)
+
+
+def on_post_delete(sender, instance, origin=None, **kwargs):
+    # Rollups of a deleted child are removed by the cascade.
+    if isinstance(origin, global_apps.get_model("core", "Child")):
+        return
+    _update(sender, {(instance.child_id, getattr(instance, _start_field(sender)))})
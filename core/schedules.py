@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Due times of medication schedules, kept on the schedules.
+
+Every schedule stores the time of its last dose (`last_given_at`) and when
+its next dose is due (`next_due_at`), so overdue schedules are found with one
+range query over an index rather than by looking up the last dose of every
+schedule. Both are updated when doses are saved or deleted (before other
+handlers of the dose's signals run) and `next_due_at` when schedules are
+saved.
+
+Stored due times are computed in the default time zone (the TIME_ZONE
+setting), not in the time zone of the user saving a dose or schedule, so they
+are the same for all users: a daily 08:00 dose is due at 08:00 in the default
+time zone.
+
+First doses of daily schedules with a time are due today at that time, so
+they are moved on to the next day once a day (see `rollover`).
+"""
+
+import datetime
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from core import changes, models
+from core.choices import MedicationFrequency
+
+ROLLOVER_KEY = "core.schedules.rollover.{}.{}"
+ROLLOVER_TIMEOUT = 60 * 60 * 48
+
+
+def refresh(schedule_ids, exclude=None, dose=None):
+    """
+    Update the last dose and next due time of schedules from their doses.
+    :param schedule_ids: ids of MedicationSchedule instances (`None` values
+                         are ignored).
+    :param exclude: the id of a Medication instance to ignore, e.g. one about
+                    to be deleted.
+    :param dose: a Medication instance about to be saved, counted as a dose
+                 of its schedule.
+    """
+    schedule_ids = {schedule_id for schedule_id in schedule_ids if schedule_id}
+    if not schedule_ids:
+        return
+    doses = models.Medication.objects.filter(
+        medication_schedule=OuterRef("pk"), child=OuterRef("child")
+    )
+    if exclude is not None:
+        doses = doses.exclude(pk=exclude)
+    schedules = list(
+        models.MedicationSchedule.objects.filter(pk__in=schedule_ids).annotate(
+            last_dose_time=Subquery(doses.order_by("-time").values("time")[:1])
+        )
+    )
+    for schedule in schedules:
+        last_given_at = schedule.last_dose_time
+        if (
+            dose is not None
+            and dose.medication_schedule_id == schedule.pk
+            and dose.child_id == schedule.child_id
+        ):
+            last_given_at = max(filter(None, [last_given_at, dose.time]))
+        schedule.last_given_at = last_given_at
+        schedule.next_due_at = schedule.get_next_due_at()
+    models.MedicationSchedule.objects.bulk_update(
+        schedules, ["last_given_at", "next_due_at"]
+    )
+
+
+def rollover():
+    """
+    Move the due times of first doses of daily schedules to today, once a day
+    in the default time zone.
+    """
+    tz = timezone.get_default_timezone()
+    today = timezone.localdate(timezone=tz)
+    key = ROLLOVER_KEY.format(tz, today)
+    if not cache.add(key, True, ROLLOVER_TIMEOUT):
+        return
+    today_start = timezone.make_aware(
+        datetime.datetime.combine(today, datetime.time.min), tz
+    )
+    schedules = list(
+        models.MedicationSchedule.objects.filter(
+            frequency=MedicationFrequency.DAILY,
+            last_given_at__isnull=True,
+            next_due_at__lt=today_start,
+        )
+    )
+    for schedule in schedules:
+        schedule.next_due_at = schedule.get_next_due_at()
+    models.MedicationSchedule.objects.bulk_update(schedules, ["next_due_at"])
+
+
+def active(child_ids):
+    """
+    Get the active schedules of children.
+    :param child_ids: ids of Child instances.
+    :returns: a QuerySet of MedicationSchedule instances with up to date due
+              times.
+    """
+    rollover()
+    return models.MedicationSchedule.objects.filter(child_id__in=child_ids, active=True)
+
+
+def overdue(now=None, child_ids=None):
+    """
+    Get the active schedules with an overdue dose.
+    :param now: the time doses are overdue at (defaults to now).
+    :param child_ids: ids of Child instances to get schedules of (all children
+                      if `None`).
+    :returns: a QuerySet of MedicationSchedule instances, in the order they
+              became overdue.
+    """
+    rollover()
+    queryset = models.MedicationSchedule.objects.filter(
+        active=True, next_due_at__lt=now or timezone.now()
+    )
+    if child_ids is not None:
+        queryset = queryset.filter(child_id__in=child_ids)
+    return queryset.order_by("next_due_at")
+
+
+def on_pre_save(sender, instance, raw=False, **kwargs):
+    """Count a dose before it is saved, for handlers of post_save."""
+    if raw:
+        return
+    # Connected after changes.on_pre_save.
+    previous = changes.get_previous(instance)
+    refresh(
+        {
+            instance.medication_schedule_id,
+            previous and previous["medication_schedule_id"],
+        },
+        exclude=instance.pk,
+        dose=instance,
+    )
+
+
+def on_pre_delete(sender, instance, origin=None, **kwargs):
+    # Schedules deleted along with their child are not updated.
+    if isinstance(origin, models.Child):
+        return
+    refresh([instance.medication_schedule_id], exclude=instance.pk)
+
+
+def children_changed(child_ids):
+    """
+    Update the schedules of children after doses or schedules were saved in
+    bulk.
+    :param child_ids: ids of Child instances.
+    """
+    refresh(
+        models.MedicationSchedule.objects.filter(child_id__in=child_ids).values_list(
+            "pk", flat=True
+        )
+    )
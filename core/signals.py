@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Connect Django signals for derived core data.
+
+Importing this module (done in ``CoreConfig.ready()``) wires up the handlers
+that keep ``DailyRollup`` rows in sync with the models they summarize, that
+invalidate cached latest entries and increment change counters, that keep the
+due times of medication schedules up to date and that wake up the event
+streams.
+"""
+
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from core import changes, events, latest, models, rollups, schedules, versions
+from core.bulk import post_bulk_save
+
+# The stored values of changed entries are read once, before the handlers
+# below (and those of other apps) use them. All models with derived data are
+# versioned.
+for _model in versions.VERSIONED_MODELS:
+    if _model is not models.Child:
+        pre_save.connect(
+            changes.on_pre_save,
+            sender=_model,
+            dispatch_uid=f"changes_pre_save_{_model.__name__}",
+        )
+
+for _model_name in rollups.MODEL_ACTIVITIES:
+    _model = apps.get_model("core", _model_name)
+    post_save.connect(
+        rollups.on_post_save, sender=_model, dispatch_uid=f"rollup_save_{_model_name}"
+    )
+    post_delete.connect(
+        rollups.on_post_delete,
+        sender=_model,
+        dispatch_uid=f"rollup_delete_{_model_name}",
+    )
+
+for _model in latest.LATEST_FIELDS:
+    post_save.connect(
+        latest.on_post_save,
+        sender=_model,
+        dispatch_uid=f"latest_save_{_model.__name__}",
+    )
+    post_delete.connect(
+        latest.on_post_delete,
+        sender=_model,
+        dispatch_uid=f"latest_delete_{_model.__name__}",
+    )
+
+post_delete.connect(
+    latest.on_child_delete, sender=models.Child, dispatch_uid="latest_delete_Child"
+)
+
+for _model in versions.VERSIONED_MODELS:
+    post_save.connect(
+        versions.on_post_save,
+        sender=_model,
+        dispatch_uid=f"versions_save_{_model.__name__}",
+    )
+    post_delete.connect(
+        versions.on_post_delete,
+        sender=_model,
+        dispatch_uid=f"versions_delete_{_model.__name__}",
+    )
+
+# Doses are counted before they are saved or deleted, so handlers of their
+# post_save and post_delete signals in other apps (e.g. MQTT publishing) see
+# the schedules' new due times.
+pre_save.connect(
+    schedules.on_pre_save,
+    sender=models.Medication,
+    dispatch_uid="schedules_pre_save_Medication",
+)
+pre_delete.connect(
+    schedules.on_pre_delete,
+    sender=models.Medication,
+    dispatch_uid="schedules_pre_delete_Medication",
+)
+
+# Connected after the change counters are incremented.
+for _model in versions.VERSIONED_MODELS:
+    post_save.connect(
+        events.on_change,
+        sender=_model,
+        dispatch_uid=f"events_save_{_model.__name__}",
+    )
+    post_delete.connect(
+        events.on_change,
+        sender=_model,
+        dispatch_uid=f"events_delete_{_model.__name__}",
+    )
+
+post_bulk_save.connect(events.on_change, dispatch_uid="events_bulk_save")
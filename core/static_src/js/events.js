@@ -0,0 +1,60 @@
+/* Baby Buddy Events
+ *
+ * Listens to the event stream of changes of children's data. Dashboard cards
+ * showing the changed data and the timers menu are updated in place.
+ */
+BabyBuddy.Events = (function ($) {
+  var timerNavUrl = null;
+
+  var Events = {
+    listen: function (url, timer_nav_url) {
+      if (typeof EventSource === "undefined") {
+        return false;
+      }
+      timerNavUrl = timer_nav_url;
+
+      var source = new EventSource(url);
+      // Changes may have been missed while (re)connecting.
+      source.addEventListener("open", Events.refresh);
+      source.addEventListener("refresh", Events.refresh);
+      source.addEventListener("change", function (event) {
+        var data = JSON.parse(event.data);
+        Events.updateCards(data.child, data.models);
+      });
+      source.addEventListener("timers", Events.updateTimers);
+      return true;
+    },
+
+    refresh: function () {
+      Events.updateCards(null, null);
+      Events.updateTimers();
+    },
+
+    updateCards: function (child, models) {
+      if (typeof BabyBuddy.Dashboard !== "undefined") {
+        BabyBuddy.Dashboard.updateCards(child, models);
+      }
+    },
+
+    updateTimers: function () {
+      var menu = $("#nav-timer-menu-link").closest("li");
+      if (menu.length === 0) {
+        return;
+      }
+      fetch(timerNavUrl, { cache: "no-store", credentials: "same-origin" })
+        .then(function (response) {
+          if (!response.ok || response.redirected) {
+            return;
+          }
+          return response.text().then(function (html) {
+            menu.replaceWith(html);
+          });
+        })
+        .catch(function (error) {
+          console.error("Baby Buddy: Timers menu update failed.", error);
+        });
+    },
+  };
+
+  return Events;
+})(jQuery);
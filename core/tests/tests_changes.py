@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import changes, models
+
+
+class ChangesTestCase(TestCase):
+    def setUp(self):
+        self.children = [
+            models.Child.objects.create(
+                first_name="Child", last_name=str(i), birth_date=timezone.localdate()
+            )
+            for i in range(2)
+        ]
+
+    def _row_queries(self, instance, context):
+        table = instance._meta.db_table
+        where = 'FROM "{0}" WHERE "{0}"."id" = '.format(table)
+        return [
+            q["sql"]
+            for q in context.captured_queries
+            if q["sql"].startswith("SELECT") and where in q["sql"]
+        ]
+
+    def test_previous(self):
+        child, other = self.children
+        end = timezone.now()
+        sleep = models.Sleep.objects.create(
+            child=child, start=end - datetime.timedelta(hours=1), end=end
+        )
+        self.assertIsNone(changes.get_previous(sleep))
+        self.assertEqual(changes.get_child_ids(sleep), {child.id})
+
+        start = sleep.start
+        sleep.child = other
+        sleep.start -= datetime.timedelta(hours=1)
+        # The stored row is read once for all handlers.
+        with CaptureQueriesContext(connection) as context:
+            sleep.save()
+        self.assertEqual(len(self._row_queries(sleep, context)), 1)
+        self.assertEqual(changes.get_previous(sleep)["start"], start)
+        self.assertEqual(changes.get_child_ids(sleep), {child.id, other.id})
+
+    def test_previous_dose(self):
+        child = self.children[0]
+        schedule = models.MedicationSchedule.objects.create(
+            child=child, name="Iron", frequency="interval", interval_hours=8
+        )
+        dose = models.Medication.objects.create(
+            child=child, medication_schedule=schedule, name="Iron", time=timezone.now()
+        )
+        dose.time -= datetime.timedelta(hours=1)
+        with CaptureQueriesContext(connection) as context:
+            dose.save()
+        self.assertEqual(len(self._row_queries(dose, context)), 1)
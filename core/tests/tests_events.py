@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import events, models
+
+
+class EventHubTestCase(TestCase):
+    def setUp(self):
+        self.children = [
+            models.Child.objects.create(
+                first_name="Child",
+                last_name=str(i),
+                birth_date=timezone.localdate(),
+            )
+            for i in range(2)
+        ]
+        self.hub = events.EventHub()
+        # Changes are polled by the tests, rather than a thread.
+        patcher = mock.patch.object(self.hub, "start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _changes(self, subscription):
+        changes = []
+        while True:
+            change = subscription.get(0)
+            if change is None:
+                return changes
+            changes.append(change)
+
+    def test_poll(self):
+        child, other = self.children
+        subscription = self.hub.subscribe([child.id])
+        other_subscription = self.hub.subscribe([other.id])
+        self.hub.poll()
+        self.assertEqual(self._changes(subscription), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.DiaperChange.objects.create(
+                child=child, time=timezone.now(), wet=True, solid=False
+            )
+        self.hub.poll()
+        self.assertEqual(
+            self._changes(subscription),
+            [events.Change(child.id, [models.DiaperChange])],
+        )
+        self.assertEqual(self._changes(other_subscription), [])
+
+        # Changes of timers are sent to all subscriptions.
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Timer.objects.create(user=get_user_model().objects.create())
+        self.hub.poll()
+        self.assertEqual(
+            self._changes(subscription), [events.Change(None, [models.Timer])]
+        )
+        self.assertEqual(
+            self._changes(other_subscription), [events.Change(None, [models.Timer])]
+        )
+
+        # Nothing is sent after unsubscribing.
+        self.hub.unsubscribe(subscription)
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Sleep.objects.create(
+                child=child,
+                start=timezone.now() - timezone.timedelta(hours=1),
+                end=timezone.now(),
+            )
+        self.hub.poll()
+        self.assertEqual(self._changes(subscription), [])
+        self.assertNotIn(child.id, self.hub._seen)
+
+    def test_overflow(self):
+        child = self.children[0]
+        subscription = self.hub.subscribe([child.id], queue_size=1)
+        self.hub.poll()
+        for _ in range(2):
+            cache.set(events.TIMERS_KEY, timezone.now().timestamp(), None)
+            self.hub.poll()
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(len(self._changes(subscription)), 1)
+
+    def test_format_event(self):
+        child = self.children[0]
+        event = events.format_event(
+            events.Change(child.id, [models.Feeding, models.Sleep]),
+            {child.id: child.slug},
+        )
+        self.assertTrue(event.startswith("event: change\ndata: "))
+        self.assertTrue(event.endswith("\n\n"))
+        self.assertEqual(
+            json.loads(event.split("data: ")[1]),
+            {"child": child.slug, "models": ["feeding", "sleep"]},
+        )
+        self.assertEqual(
+            events.format_event(events.Change(None, [models.Timer]), {}),
+            "event: timers\ndata: {}\n\n",
+        )
+
+    def test_stream(self):
+        child = self.children[0]
+        with mock.patch.object(events, "hub", self.hub):
+            stream = events.stream(
+                [child.id], {child.id: child.slug}, heartbeat=0, max_age=60
+            )
+            self.assertEqual(next(stream), "retry: 5000\n\n")
+            self.assertEqual(len(self.hub._subscriptions), 1)
+            self.assertEqual(next(stream), ": heartbeat\n\n")
+
+            (subscription,) = self.hub._subscriptions
+            subscription.put(events.Change(child.id, [models.Feeding]))
+            self.assertTrue(next(stream).startswith("event: change\n"))
+            subscription.overflowed = True
+            self.assertEqual(next(stream), "event: refresh\ndata: {}\n\n")
+
+            stream.close()
+            self.assertEqual(self.hub._subscriptions, set())
+
+            # Streams end after max_age.
+            stream = events.stream([child.id], {}, heartbeat=0, max_age=0)
+            self.assertEqual(list(stream), ["retry: 5000\n\n"])
+            self.assertEqual(self.hub._subscriptions, set())
+
+
+class EventViewsTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="events", password="events", is_superuser=True
+        )
+        self.client.force_login(self.user)
+
+    def test_event_stream(self):
+        page = self.client.get("/events/")
+        self.assertEqual(page.status_code, 404)
+
+        child = models.Child.objects.create(
+            first_name="Child", last_name="Events", birth_date=timezone.localdate()
+        )
+        hub = events.EventHub()
+        with (
+            override_settings(
+                EVENT_STREAM={
+                    "ENABLED": True,
+                    "POLL_INTERVAL": 2,
+                    "HEARTBEAT": 0,
+                    "MAX_AGE": 0,
+                }
+            ),
+            mock.patch.object(events, "hub", hub),
+            mock.patch.object(hub, "start"),
+        ):
+            page = self.client.get("/events/")
+            self.assertEqual(page.status_code, 200)
+            self.assertEqual(page["Content-Type"], "text/event-stream")
+            self.assertEqual(page["X-Accel-Buffering"], "no")
+            self.assertEqual(b"".join(page.streaming_content), b"retry: 5000\n\n")
+            self.assertEqual(hub._subscriptions, set())
+
+            # The page listens to the stream.
+            page = self.client.get("/children/{}/dashboard/".format(child.slug))
+            self.assertContains(page, "BabyBuddy.Events.listen(")
+
+    def test_timer_nav(self):
+        models.Timer.objects.create(user=self.user, name="Nav timer")
+        page = self.client.get("/timers/nav/")
+        self.assertEqual(page.status_code, 200)
+        self.assertContains(page, "nav-timer-menu-link")
+        self.assertContains(page, "Nav timer")
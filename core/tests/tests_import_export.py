@@ -6,8 +6,9 @@ import tablib
 
 from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
 
-from core import admin, models
+from core import admin, bulk, latest, models, schedules
 
 
 class ImportTestCase(TestCase):
@@ -97,3 +98,126 @@ class ImportTestCase(TestCase):
 
     def test_weight(self):
         self.import_data(models.Weight, 5)
+
+    def test_bulk_refresh(self):
+        child = models.Child.objects.get()
+        self.assertIsNone(latest.get_child_latest(child)[models.Sleep])
+        refreshed = []
+
+        def receiver(sender, child_ids, **kwargs):
+            refreshed.append((sender, child_ids))
+
+        bulk.post_bulk_save.connect(receiver)
+        try:
+            self.import_data(models.Sleep, 39)
+        finally:
+            bulk.post_bulk_save.disconnect(receiver)
+
+        self.assertEqual(refreshed, [(models.Sleep, {child.id})])
+        self.assertEqual(
+            latest.get_child_latest(child)[models.Sleep],
+            models.Sleep.objects.order_by("-end").first(),
+        )
+        self.assertTrue(models.DailyRollup.objects.filter(child=child).exists())
+        self.assertTrue(
+            all(sleep.duration for sleep in models.Sleep.objects.all()),
+        )
+
+    def test_bulk_overlap(self):
+        dataset = self.get_dataset("sleep")
+        # Overlaps the row before it.
+        dataset.append(["1", "2020-02-17 01:00:00", "0", "2020-02-17 03:00:00", ""])
+        resource = admin.SleepImportExportResource()
+        result = resource.import_data(dataset, dry_run=False)
+        self.assertEqual([row.number for row in result.invalid_rows], [len(dataset)])
+        self.assertEqual(models.Sleep.objects.count(), len(dataset) - 1)
+
+        # Rows overlapping existing entries are rejected as well.
+        result = resource.import_data(self.get_dataset("sleep"), dry_run=False)
+        self.assertEqual(len(result.invalid_rows), len(dataset) - 1)
+
+    def test_reimport(self):
+        self.import_data(models.Tag, 10)
+        self.import_data(models.Sleep, 39)
+        self.import_data(models.Temperature, 23)
+
+        # Existing entries are updated, along with their durations.
+        sleep = models.Sleep.objects.order_by("start").first()
+        end = sleep.end - datetime.timedelta(minutes=30)
+        dataset = tablib.Dataset(
+            [sleep.id, sleep.child_id, sleep.start, end, 0, ""],
+            headers=["id", "child_id", "start", "end", "nap", "notes"],
+        )
+        result = admin.SleepImportExportResource().import_data(dataset, dry_run=False)
+        self.assertFalse(result.has_errors())
+        self.assertEqual(models.Sleep.objects.count(), 39)
+        updated = models.Sleep.objects.get(pk=sleep.pk)
+        self.assertEqual(updated.end, end)
+        self.assertEqual(
+            updated.duration, sleep.duration - datetime.timedelta(minutes=30)
+        )
+
+        # Including their child and tags.
+        other = models.Child.objects.create(
+            first_name="Child", last_name="Two", birth_date=datetime.date(2020, 2, 10)
+        )
+        tag = models.Tag.objects.get(name="ten")
+        dataset = self.get_dataset("temperature")
+        dataset = tablib.Dataset(
+            *[
+                dict(zip(dataset.headers, row), child_id=other.id, tags=tag.id).values()
+                for row in dataset
+            ],
+            headers=dataset.headers,
+        )
+        result = admin.TemperatureImportExportResource().import_data(
+            dataset, dry_run=False
+        )
+        self.assertFalse(result.has_errors())
+        self.assertEqual(models.Temperature.objects.filter(child=other).count(), 23)
+        entry = models.Temperature.objects.get(pk=65)
+        self.assertQuerySetEqual(entry.tags.names(), ["ten"])
+
+    def test_medicationschedule_due_times(self):
+        child = models.Child.objects.get()
+        now = timezone.now()
+        schedule = models.MedicationSchedule.objects.create(
+            child=child, name="Iron", frequency="interval", interval_hours=6
+        )
+        models.Medication.objects.create(
+            child=child,
+            medication_schedule=schedule,
+            name="Iron",
+            time=now - datetime.timedelta(hours=10),
+        )
+        schedule.refresh_from_db()
+        last_given_at = schedule.last_given_at
+
+        # Updated schedules keep their last dose, new ones get due times.
+        dataset = tablib.Dataset(
+            [schedule.id, child.id, "Iron", "interval", "", 8, 1],
+            ["", child.id, "Vitamin D", "daily", "08:00", "", 1],
+            headers=[
+                "id",
+                "child_id",
+                "name",
+                "frequency",
+                "schedule_time",
+                "interval_hours",
+                "active",
+            ],
+        )
+        resource = admin.MedicationScheduleImportExportResource()
+        self.assertNotIn("next_due_at", resource.get_bulk_update_fields())
+        result = resource.import_data(dataset, dry_run=False)
+        self.assertFalse(result.has_errors())
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.last_given_at, last_given_at)
+        self.assertEqual(
+            schedule.next_due_at, last_given_at + datetime.timedelta(hours=8)
+        )
+        self.assertIn(schedule, schedules.overdue())
+        daily = models.MedicationSchedule.objects.get(name="Vitamin D")
+        self.assertIsNotNone(daily.next_due_at)
+        self.assertEqual(daily.next_due_at, daily.get_next_due_at())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import datetime
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import latest, models
+
+
+class LatestTestCase(TestCase):
+    def setUp(self):
+        self.children = [
+            models.Child.objects.create(
+                first_name="Child",
+                last_name=str(i),
+                birth_date=timezone.localdate(),
+            )
+            for i in range(3)
+        ]
+        self.now = timezone.now()
+
+    def _change(self, child, hours_ago):
+        return models.DiaperChange.objects.create(
+            child=child,
+            time=self.now - datetime.timedelta(hours=hours_ago),
+            wet=True,
+            solid=False,
+        )
+
+    def _model_queries(self, children):
+        """Count queries of core model tables made by an uncached lookup."""
+        latest.invalidate([child.id for child in children])
+        with CaptureQueriesContext(connection) as context:
+            latest.get_latest(children)
+        return len(
+            [query for query in context.captured_queries if '"core_' in query["sql"]]
+        )
+
+    def test_latest_per_child(self):
+        for child in self.children:
+            self._change(child, 3)
+            self._change(child, 1)
+        self._change(self.children[0], 2)
+        models.Note.objects.create(child=self.children[1], note="Note", time=self.now)
+
+        entries = latest.get_latest(self.children)
+        for child in self.children:
+            change = entries[child.id][models.DiaperChange]
+            self.assertEqual(change.child, child)
+            self.assertEqual(change.time, self.now - datetime.timedelta(hours=1))
+        self.assertIsNone(entries[self.children[0].id][models.Note])
+        self.assertEqual(entries[self.children[1].id][models.Note].note, "Note")
+
+    def test_query_count(self):
+        self._change(self.children[0], 1)
+        queries = self._model_queries(self.children[:1])
+        self.assertEqual(queries, len(latest.LATEST_FIELDS))
+        self.assertEqual(self._model_queries(self.children), queries)
+
+        # Cached entries only need the cache lookup.
+        with self.assertNumQueries(1):
+            latest.get_latest(self.children)
+
+    def test_fallback(self):
+        for child in self.children:
+            self._change(child, 2)
+            self._change(child, 1)
+        expected = latest.get_latest(self.children)
+        latest.invalidate([child.id for child in self.children])
+
+        features = connection.features
+        with mock.patch.object(features, "can_distinct_on_fields", False):
+            with mock.patch.object(features, "supports_over_clause", False):
+                self.assertEqual(latest.get_latest(self.children), expected)
+
+    def test_invalidation(self):
+        child = self.children[0]
+        first = self._change(child, 2)
+        self.assertEqual(latest.get_child_latest(child)[models.DiaperChange], first)
+
+        second = self._change(child, 1)
+        self.assertEqual(latest.get_child_latest(child)[models.DiaperChange], second)
+
+        second.delete()
+        self.assertEqual(latest.get_child_latest(child)[models.DiaperChange], first)
+
+        # Moving an entry to another child updates both children.
+        first.child = self.children[1]
+        first.save()
+        entries = latest.get_latest(self.children[:2])
+        self.assertIsNone(entries[child.id][models.DiaperChange])
+        self.assertEqual(entries[self.children[1].id][models.DiaperChange], first)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core import models, occurrences, totals
+from core.choices import MedicationFrequency
+
+
+def _time(day, hour, minute=0):
+    return timezone.make_aware(datetime.datetime(2024, 1, day, hour, minute))
+
+
+class OccurrencesTestCase(TestCase):
+    def setUp(self):
+        self.child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date=datetime.date(2023, 6, 1)
+        )
+        # 2024-01-01 is a Monday.
+        self.start, self.end = totals.day_bounds(
+            datetime.date(2024, 1, 1), datetime.date(2024, 1, 7)
+        )
+
+    def _schedule(self, frequency, **kwargs):
+        return models.MedicationSchedule.objects.create(
+            child=self.child, name=frequency, frequency=frequency, **kwargs
+        )
+
+    def _doses(self, schedule, *times):
+        for time in times:
+            models.Medication.objects.create(
+                child=self.child,
+                medication_schedule=schedule,
+                name=schedule.name,
+                time=time,
+            )
+
+    def _adherence(self, schedule, start=None, end=None):
+        (adherence,) = occurrences.get_adherence(
+            models.MedicationSchedule.objects.filter(pk=schedule.pk),
+            start or self.start,
+            end or self.end,
+        )
+        return adherence
+
+    def test_get_occurrences(self):
+        schedule = self._schedule(
+            MedicationFrequency.WEEKLY,
+            schedule_time=datetime.time(8, 0),
+            monday=True,
+            thursday=True,
+        )
+        self.assertEqual(
+            occurrences.get_occurrences(schedule, self.start, _time(15, 8)),
+            [_time(1, 8), _time(4, 8), _time(8, 8), _time(11, 8)],
+        )
+        schedule.frequency = MedicationFrequency.DAILY
+        schedule.schedule_time = None
+        self.assertEqual(
+            occurrences.get_occurrences(schedule, _time(1, 12), _time(3, 12)),
+            [_time(2, 0), _time(3, 0)],
+        )
+        schedule.frequency = MedicationFrequency.INTERVAL
+        with self.assertRaises(ValueError):
+            occurrences.get_occurrences(schedule, self.start, self.end)
+
+    def test_daily(self):
+        schedule = self._schedule(
+            MedicationFrequency.DAILY, schedule_time=datetime.time(8, 0)
+        )
+        self.assertEqual(self._adherence(schedule).expected, 0)
+
+        # On time, late, missed, on time with an extra dose, then missed.
+        self._doses(
+            schedule, _time(1, 8, 10), _time(2, 10), _time(4, 7, 30), _time(4, 12)
+        )
+        adherence = self._adherence(schedule)
+        self.assertEqual(
+            [o.dose_time for o in adherence.occurrences],
+            [_time(1, 8, 10), _time(2, 10), None, _time(4, 7, 30), None, None, None],
+        )
+        self.assertEqual(adherence.expected, 7)
+        self.assertEqual(adherence.taken, 3)
+        self.assertEqual(adherence.on_time, 2)
+        self.assertEqual(adherence.missed, 4)
+        self.assertEqual(adherence.extra, [_time(4, 12)])
+        self.assertAlmostEqual(adherence.rate, 3 / 7)
+
+        # Inactive schedules end with their last dose.
+        schedule.refresh_from_db()
+        schedule.active = False
+        schedule.save()
+        self.assertEqual(self._adherence(schedule).expected, 4)
+
+    def test_weekly(self):
+        schedule = self._schedule(
+            MedicationFrequency.WEEKLY, monday=True, thursday=True
+        )
+        self._doses(schedule, _time(1, 15), _time(2, 9))
+        adherence = self._adherence(schedule)
+        self.assertEqual(
+            adherence.occurrences,
+            [
+                occurrences.Occurrence(_time(1, 0), True, _time(1, 15)),
+                occurrences.Occurrence(_time(4, 0), True, None),
+            ],
+        )
+        self.assertEqual(adherence.on_time, 1)
+        self.assertEqual(adherence.extra, [_time(2, 9)])
+
+    def test_interval(self):
+        schedule = self._schedule(MedicationFrequency.INTERVAL, interval_hours=8)
+        self._doses(
+            schedule,
+            _time(1, 0),
+            _time(1, 8, 30),
+            # Three hours early for the second due time after the last dose.
+            _time(1, 21, 30),
+            _time(1, 22),
+        )
+        adherence = self._adherence(schedule, end=_time(3, 0))
+        self.assertEqual(
+            [(o.time, o.dose_time) for o in adherence.occurrences],
+            [
+                (_time(1, 0), _time(1, 0)),
+                (_time(1, 8), _time(1, 8, 30)),
+                (_time(1, 16, 30), None),
+                (_time(2, 0, 30), _time(1, 21, 30)),
+                (_time(2, 6), None),
+                (_time(2, 14), None),
+                (_time(2, 22), None),
+            ],
+        )
+        self.assertEqual(adherence.on_time, 2)
+        self.assertEqual(adherence.extra, [_time(1, 22)])
+
+        # Due times follow the last dose before the range.
+        adherence = self._adherence(schedule, start=_time(2, 12), end=_time(3, 0))
+        self.assertEqual(
+            [o.time for o in adherence.occurrences], [_time(2, 14), _time(2, 22)]
+        )
+
+        # Doses not missed yet are left out.
+        (adherence,) = occurrences.get_adherence(
+            models.MedicationSchedule.objects.filter(pk=schedule.pk),
+            self.start,
+            _time(3, 0),
+            now=_time(2, 16),
+        )
+        self.assertEqual(adherence.occurrences[-1].time, _time(2, 6))
+
+    def test_year_of_doses(self):
+        schedule = self._schedule(MedicationFrequency.INTERVAL, interval_hours=4)
+        daily = self._schedule(
+            MedicationFrequency.DAILY, schedule_time=datetime.time(8, 0)
+        )
+        # Every sixth interval dose is missed.
+        models.Medication.objects.bulk_create(
+            [
+                models.Medication(
+                    child=self.child,
+                    medication_schedule=schedule,
+                    name=schedule.name,
+                    time=self.start + datetime.timedelta(hours=4 * i),
+                )
+                for i in range(6 * 366)
+                if i % 6 != 5
+            ]
+            + [
+                models.Medication(
+                    child=self.child,
+                    medication_schedule=daily,
+                    name=daily.name,
+                    time=self.start + datetime.timedelta(days=i, hours=8),
+                )
+                for i in range(366)
+            ]
+        )
+        start, end = totals.day_bounds(
+            datetime.date(2024, 1, 1), datetime.date(2024, 12, 31)
+        )
+        with self.assertNumQueries(3):
+            interval, daily = occurrences.get_adherence(
+                models.MedicationSchedule.objects.filter(child=self.child).order_by(
+                    "-frequency"
+                ),
+                start,
+                end,
+            )
+        self.assertEqual(interval.expected, 6 * 366)
+        self.assertEqual(interval.missed, 366)
+        self.assertEqual(daily.taken, 366)
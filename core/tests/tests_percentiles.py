@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from core import models, percentiles
+
+
+class PercentilesTestCase(TestCase):
+    def setUp(self):
+        percentiles.clear()
+
+    def tearDown(self):
+        percentiles.clear()
+
+    def test_get_curves(self):
+        with self.assertNumQueries(1):
+            curves = percentiles.get_curves("weight", "boy")
+        with self.assertNumQueries(0):
+            self.assertIs(percentiles.get_curves("weight", "boy"), curves)
+
+        rows = models.WeightPercentile.objects.filter(sex="boy")
+        self.assertEqual(len(curves), rows.count())
+        first = rows.order_by("age_in_days").first()
+        self.assertEqual(curves.ages[0], first.age_in_days.days)
+        self.assertEqual(
+            [values[0] for values in curves.values],
+            [first.p3_weight, first.p15_weight, first.p50_weight]
+            + [first.p85_weight, first.p97_weight],
+        )
+        self.assertIsNot(percentiles.get_curves("weight", "girl"), curves)
+        self.assertIsNotNone(percentiles.get_curves("height", "girl"))
+
+    def test_get_curves_missing(self):
+        # There is never reference data for children without a sex.
+        with self.assertNumQueries(0):
+            self.assertIsNone(percentiles.get_curves("weight", None))
+            self.assertIsNone(percentiles.get_curves("height", ""))
+
+        models.WeightPercentile.objects.filter(sex="girl").delete()
+        self.assertIsNone(percentiles.get_curves("weight", "girl"))
+        # Missing data of a sex is not cached, in case it is added later.
+        with self.assertNumQueries(1):
+            percentiles.get_curves("weight", "girl")
+
+    def test_until(self):
+        curves = percentiles.get_curves("height", "girl")
+        sliced = curves.until(30)
+        self.assertEqual(list(sliced.ages), list(range(31)))
+        self.assertEqual(len(sliced.values), len(percentiles.PERCENTILES))
+        self.assertTrue(all(len(values) == 31 for values in sliced.values))
+        self.assertEqual(len(curves.until(-1)), 0)
+
+    def test_at(self):
+        curves = percentiles.get_curves("weight", "boy")
+        self.assertAlmostEqual(curves.at(0)[2], 3.346)
+        self.assertAlmostEqual(curves.at(1)[2], 3.317)
+        self.assertAlmostEqual(curves.at(0.5)[2], (3.346 + 3.317) / 2)
+        self.assertIsNone(curves.at(-1))
+        self.assertIsNone(curves.at(curves.ages[-1] + 1))
+
+    def test_rank(self):
+        curves = percentiles.get_curves("weight", "boy")
+        self.assertEqual(curves.rank(0, 3.346), 50)
+        self.assertEqual(curves.rank(0, 2.865), 15)
+        self.assertAlmostEqual(curves.rank(0, (2.865 + 3.346) / 2), 32.5)
+        self.assertEqual(curves.rank(0, 1), 3)
+        self.assertEqual(curves.rank(0, 10), 97)
+        self.assertIsNone(curves.rank(-1, 3))
+        self.assertEqual(percentiles.percentile_rank("weight", "boy", 0, 3.346), 50)
+        self.assertIsNone(percentiles.percentile_rank("weight", None, 0, 3.346))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import models, periods
+
+
+class PeriodsTestCase(TestCase):
+    def setUp(self):
+        self.child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date=timezone.localdate()
+        )
+        self.now = timezone.now()
+        self.sleep = self._sleep(hours_ago=10, hours=2)
+        self.sleep.save()
+
+    def _sleep(self, hours_ago, hours):
+        return models.Sleep(
+            child=self.child,
+            start=self.now - datetime.timedelta(hours=hours_ago),
+            end=self.now - datetime.timedelta(hours=hours_ago - hours),
+            nap=False,
+        )
+
+    def _assert_periods(self, overlapping, valid):
+        for sleep in overlapping:
+            with self.assertRaises(ValidationError):
+                sleep.full_clean()
+        for sleep in valid:
+            sleep.full_clean()
+
+    def _cases(self):
+        overlapping = [
+            self._sleep(hours_ago=11, hours=2),
+            self._sleep(hours_ago=9, hours=2),
+            self._sleep(hours_ago=9.5, hours=1),
+            self._sleep(hours_ago=12, hours=6),
+        ]
+        valid = [
+            self._sleep(hours_ago=12, hours=2),
+            self._sleep(hours_ago=8, hours=2),
+            self._sleep(hours_ago=30, hours=20),
+            # The existing entry itself.
+            self.sleep,
+        ]
+        return overlapping, valid
+
+    def test_query(self):
+        self._assert_periods(*self._cases())
+
+    def test_index(self):
+        with periods.indexed_periods() as index:
+            with CaptureQueriesContext(connection) as context:
+                self._assert_periods(*self._cases())
+            # Periods are loaded once instead of being queried for each entry.
+            queries = [
+                q for q in context.captured_queries if '"core_sleep"' in q["sql"]
+            ]
+            self.assertEqual(len(queries), 1)
+
+            # Added entries are checked without saving them.
+            sleep = self._sleep(hours_ago=8, hours=2)
+            index.add(sleep)
+            self._assert_periods([self._sleep(hours_ago=7, hours=2)], [])
+
+            # Moved entries are only checked at their new position.
+            self.sleep.start -= datetime.timedelta(hours=5)
+            self.sleep.end -= datetime.timedelta(hours=5)
+            index.add(self.sleep)
+            self._assert_periods(
+                [self._sleep(hours_ago=15, hours=1)],
+                [self._sleep(hours_ago=10, hours=2)],
+            )
+        self.assertIsNone(periods.active_index())
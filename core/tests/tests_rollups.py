@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core import models, rollups
+from core.choices import FeedingMethod, FeedingType, RollupActivity
+
+
+class RollupsTestCase(TestCase):
+    def setUp(self):
+        self.child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date=timezone.localdate()
+        )
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def _feeding(self, hours_ago, minutes=20):
+        start = self.now - datetime.timedelta(hours=hours_ago)
+        return models.Feeding.objects.create(
+            child=self.child,
+            start=start,
+            end=start + datetime.timedelta(minutes=minutes),
+            type=FeedingType.FORMULA,
+            method=FeedingMethod.BOTTLE,
+        )
+
+    def _snapshot(self):
+        return list(
+            models.DailyRollup.objects.filter(child=self.child).values_list(
+                "activity",
+                "date",
+                "count",
+                "duration_total",
+                "gap_count",
+                "gap_total",
+                "first_time",
+                "last_time",
+            )
+        )
+
+    def assertRollupsConsistent(self):
+        incremental = self._snapshot()
+        rollups.rebuild(self.child.id)
+        self.assertEqual(incremental, self._snapshot())
+
+    def test_incremental_matches_rebuild(self):
+        for hours_ago in (100, 80, 50, 49, 30, 26, 3):
+            self._feeding(hours_ago)
+        for hours_ago in (70, 45, 20, 2):
+            models.DiaperChange.objects.create(
+                child=self.child,
+                time=self.now - datetime.timedelta(hours=hours_ago),
+                wet=True,
+                solid=False,
+            )
+        self.assertRollupsConsistent()
+
+    def test_update_and_delete(self):
+        feedings = [self._feeding(hours_ago) for hours_ago in (72, 48, 24, 1)]
+        feedings[1].start = self.now - datetime.timedelta(hours=4)
+        feedings[1].end = feedings[1].start + datetime.timedelta(minutes=10)
+        feedings[1].save()
+        self.assertRollupsConsistent()
+
+        feedings[2].delete()
+        self.assertRollupsConsistent()
+
+        totals = rollups.totals(self.child, RollupActivity.FEEDING)
+        self.assertEqual(totals["count"], 3)
+        self.assertEqual(totals["gap_count"], 2)
+
+    def test_sleep_and_nap(self):
+        start = self.now - datetime.timedelta(days=2)
+        sleep = models.Sleep.objects.create(
+            child=self.child,
+            start=start,
+            end=start + datetime.timedelta(hours=2),
+            nap=True,
+        )
+        models.Sleep.objects.create(
+            child=self.child,
+            start=start + datetime.timedelta(hours=5),
+            end=start + datetime.timedelta(hours=6),
+            nap=False,
+        )
+        self.assertEqual(rollups.totals(self.child, RollupActivity.NAP)["count"], 1)
+        totals = rollups.totals(self.child, RollupActivity.SLEEP)
+        self.assertEqual(totals["count"], 2)
+        self.assertEqual(totals["duration_total"], datetime.timedelta(hours=3))
+        self.assertEqual(totals["gap_total"], datetime.timedelta(hours=3))
+
+        sleep.nap = False
+        sleep.save()
+        self.assertEqual(rollups.totals(self.child, RollupActivity.NAP)["count"], 0)
+        self.assertRollupsConsistent()
+
+    def test_totals_since(self):
+        feedings = [self._feeding(hours_ago) for hours_ago in range(150, 0, -7)]
+        since = self.now - datetime.timedelta(days=3, hours=5)
+
+        # Brute force the expected totals from the raw entries.
+        gaps = [
+            (successor.start - feeding.end)
+            for feeding, successor in zip(feedings, feedings[1:])
+            if feeding.start > since
+        ]
+        totals = rollups.totals(self.child, RollupActivity.FEEDING, since)
+        self.assertEqual(totals["gap_count"], len(gaps))
+        self.assertEqual(totals["gap_total"], sum(gaps, datetime.timedelta(0)))
+        self.assertEqual(totals["count"], len([f for f in feedings if f.start > since]))
+
+    def test_child_delete(self):
+        self._feeding(10)
+        self.assertTrue(models.DailyRollup.objects.exists())
+        self.child.delete()
+        self.assertFalse(models.DailyRollup.objects.exists())
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import bulk, models, schedules
+from core.choices import MedicationFrequency
+
+
+class SchedulesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date=timezone.localdate()
+        )
+        self.schedule = models.MedicationSchedule.objects.create(
+            child=self.child,
+            name="Iron",
+            frequency=MedicationFrequency.INTERVAL,
+            interval_hours=8,
+        )
+        self.now = timezone.now()
+
+    def _dose(self, hours_ago, **kwargs):
+        return models.Medication.objects.create(
+            child=self.child,
+            medication_schedule=self.schedule,
+            name="Iron",
+            time=self.now - datetime.timedelta(hours=hours_ago),
+            **kwargs,
+        )
+
+    def test_first_dose(self):
+        self.assertIsNone(self.schedule.last_given_at)
+        self.assertIsNone(self.schedule.next_due_at)
+
+        daily = models.MedicationSchedule.objects.create(
+            child=self.child,
+            name="Vitamin D",
+            frequency=MedicationFrequency.DAILY,
+            schedule_time="08:00",
+        )
+        self.assertEqual(daily.next_due_at, daily.next_due_time())
+
+    def test_refresh_on_dose_changes(self):
+        first = self._dose(10)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.last_given_at, first.time)
+        self.assertEqual(
+            self.schedule.next_due_at, first.time + datetime.timedelta(hours=8)
+        )
+
+        second = self._dose(2)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.last_given_at, second.time)
+
+        # Moving a dose to an earlier time.
+        second.time = self.now - datetime.timedelta(hours=12)
+        second.save()
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.last_given_at, first.time)
+
+        # Moving a dose to another schedule.
+        other = models.MedicationSchedule.objects.create(
+            child=self.child,
+            name="Other",
+            frequency=MedicationFrequency.INTERVAL,
+            interval_hours=4,
+        )
+        first.medication_schedule = other
+        first.save()
+        self.schedule.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.schedule.last_given_at, second.time)
+        self.assertEqual(other.last_given_at, first.time)
+
+        second.delete()
+        self.schedule.refresh_from_db()
+        self.assertIsNone(self.schedule.last_given_at)
+        self.assertIsNone(self.schedule.next_due_at)
+
+    def test_refresh_on_schedule_changes(self):
+        dose = self._dose(10)
+        self.schedule.refresh_from_db()
+        self.schedule.interval_hours = 4
+        self.schedule.save()
+        self.assertEqual(
+            self.schedule.next_due_at, dose.time + datetime.timedelta(hours=4)
+        )
+
+    def test_refresh_on_bulk_save(self):
+        dose = self._dose(10)
+        # Updates send no signals.
+        models.Medication.objects.filter(pk=dose.pk).update(medication_schedule=None)
+        bulk.entries_changed(models.Medication, {self.child.id})
+        self.schedule.refresh_from_db()
+        self.assertIsNone(self.schedule.last_given_at)
+
+    def test_overdue(self):
+        self._dose(10)
+        other = models.MedicationSchedule.objects.create(
+            child=self.child,
+            name="Later",
+            frequency=MedicationFrequency.INTERVAL,
+            interval_hours=12,
+        )
+        models.Medication.objects.create(
+            child=self.child,
+            medication_schedule=other,
+            name="Later",
+            time=self.now - datetime.timedelta(hours=10),
+        )
+        # The rollover query is made once a day.
+        schedules.rollover()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(list(schedules.overdue()), [self.schedule])
+        queries = [q for q in context.captured_queries if '"core_' in q["sql"]]
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            list(schedules.overdue(self.now + datetime.timedelta(hours=3))),
+            [self.schedule, other],
+        )
+        self.assertEqual(list(schedules.overdue(child_ids=[0])), [])
+
+        self.schedule.active = False
+        self.schedule.save()
+        self.assertEqual(list(schedules.overdue()), [])
+
+    def test_rollover(self):
+        daily = models.MedicationSchedule.objects.create(
+            child=self.child,
+            name="Vitamin D",
+            frequency=MedicationFrequency.DAILY,
+            schedule_time=datetime.time(8, 0),
+        )
+        # Due times of first doses saved on an earlier day.
+        yesterday = daily.next_due_at - datetime.timedelta(days=1)
+        models.MedicationSchedule.objects.filter(pk=daily.pk).update(
+            next_due_at=yesterday
+        )
+        schedules.rollover()
+        daily.refresh_from_db()
+        self.assertEqual(daily.next_due_at, yesterday + datetime.timedelta(days=1))
+
+        # Only once a day.
+        models.MedicationSchedule.objects.filter(pk=daily.pk).update(
+            next_due_at=yesterday
+        )
+        schedules.rollover()
+        daily.refresh_from_db()
+        self.assertEqual(daily.next_due_at, yesterday)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core import models, timeline
+from core.choices import FeedingMethod, FeedingType
+
+
+class TimelineTestCase(TestCase):
+    def setUp(self):
+        self.child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date=timezone.localdate()
+        )
+        self.date = timezone.localtime().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) - datetime.timedelta(days=1)
+
+    def _add_entries(self, hour):
+        time = self.date + datetime.timedelta(hours=hour)
+        entries = [
+            models.DiaperChange.objects.create(
+                child=self.child, time=time, wet=True, solid=False
+            ),
+            models.Feeding.objects.create(
+                child=self.child,
+                start=time,
+                end=time + datetime.timedelta(minutes=15),
+                type=FeedingType.FORMULA,
+                method=FeedingMethod.BOTTLE,
+            ),
+            models.Sleep.objects.create(
+                child=self.child,
+                start=time + datetime.timedelta(minutes=20),
+                end=time + datetime.timedelta(minutes=50),
+            ),
+            models.TummyTime.objects.create(
+                child=self.child,
+                start=time + datetime.timedelta(minutes=55),
+                end=time + datetime.timedelta(minutes=58),
+            ),
+            models.Note.objects.create(child=self.child, note="Note", time=time),
+            models.Medication.objects.create(child=self.child, name="Med", time=time),
+            models.Temperature.objects.create(
+                child=self.child, temperature=37.0, time=time
+            ),
+            models.Expirable.objects.create(child=self.child, name="Milk", time=time),
+        ]
+        for entry in entries:
+            entry.tags.add("tag-{}".format(hour), "common")
+
+    def test_get_objects_order(self):
+        for hour in (2, 9, 15):
+            self._add_entries(hour)
+        events = timeline.get_objects(self.date, self.child)
+        self.assertEqual(len(events), 3 * 11)
+        times = [event["time"] for event in events]
+        self.assertEqual(times, sorted(times, reverse=True))
+        self.assertEqual([tag.name for tag in events[0]["tags"]], ["common", "tag-15"])
+
+    def test_get_objects_query_count(self):
+        self._add_entries(2)
+        # Warm the content type cache.
+        timeline.get_objects(self.date, self.child)
+        with self.assertNumQueries(9):
+            timeline.get_objects(self.date, self.child)
+
+        for hour in (5, 9, 12, 15, 19):
+            self._add_entries(hour)
+        with self.assertNumQueries(9):
+            events = timeline.get_objects(self.date, self.child)
+        self.assertEqual(len(events), 6 * 11)
+        with self.assertNumQueries(9):
+            timeline.get_objects(self.date)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import datetime
+import zoneinfo
+
+from django.db.models import Count, Q, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from core import models, totals
+
+TZ = zoneinfo.ZoneInfo("America/New_York")
+
+
+def _time(*args):
+    return datetime.datetime(*args, tzinfo=TZ)
+
+
+class DailyTotalsTestCase(TestCase):
+    def setUp(self):
+        self.child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date="2024-01-01"
+        )
+
+    def _sleep(self, start, end):
+        models.Sleep.objects.create(child=self.child, start=start, end=end)
+
+    def test_daily_totals(self):
+        self._sleep(_time(2024, 1, 1, 13), _time(2024, 1, 1, 15))
+        self._sleep(_time(2024, 1, 1, 16), _time(2024, 1, 1, 16, 30))
+        # Crosses local (but not UTC) midnight.
+        self._sleep(_time(2024, 1, 1, 18), _time(2024, 1, 2, 6))
+        queryset = models.Sleep.objects.filter(child=self.child)
+        with timezone.override(TZ), self.assertNumQueries(1):
+            days = totals.daily_totals(queryset)
+        hours = datetime.timedelta(hours=1)
+        self.assertEqual(
+            days,
+            {
+                datetime.date(2024, 1, 1): {
+                    "count": 3,
+                    "entries": 2,
+                    "duration": 8.5 * hours,
+                },
+                datetime.date(2024, 1, 2): {
+                    "count": 1,
+                    "entries": 1,
+                    "duration": 6 * hours,
+                },
+            },
+        )
+        with timezone.override(TZ):
+            days = totals.daily_totals(queryset, anchor="start")
+        self.assertEqual(days[datetime.date(2024, 1, 1)]["entries"], 3)
+        self.assertEqual(days[datetime.date(2024, 1, 2)]["entries"], 0)
+
+    def test_daily_totals_dst(self):
+        # Local days are 23 hours long when daylight saving time begins.
+        self._sleep(_time(2024, 3, 9, 20), _time(2024, 3, 11, 2))
+        self._sleep(_time(2024, 3, 9, 20), _time(2024, 3, 11, 2))
+        queryset = models.Sleep.objects.filter(child=self.child)
+        with timezone.override(TZ):
+            days = totals.daily_totals(queryset)
+        hours = datetime.timedelta(hours=1)
+        self.assertEqual(
+            {date: day["duration"] for date, day in days.items()},
+            {
+                datetime.date(2024, 3, 9): 8 * hours,
+                datetime.date(2024, 3, 10): 46 * hours,
+                datetime.date(2024, 3, 11): 4 * hours,
+            },
+        )
+        self.assertEqual([day["count"] for day in days.values()], [2, 2, 2])
+
+    def test_daily_totals_sums(self):
+        for start, amount in [
+            (_time(2024, 1, 1, 8), 2),
+            (_time(2024, 1, 1, 12), None),
+            (_time(2024, 1, 1, 23, 45), 3),
+        ]:
+            models.Feeding.objects.create(
+                child=self.child,
+                start=start,
+                end=start + datetime.timedelta(minutes=30),
+                type="formula",
+                method="bottle",
+                amount=amount,
+            )
+        queryset = models.Feeding.objects.filter(child=self.child)
+        with timezone.override(TZ):
+            days = totals.daily_totals(
+                queryset,
+                sums={"amount": Sum("amount"), "amounts": Count("amount")},
+                dates=(datetime.date(2023, 12, 31), datetime.date(2024, 1, 2)),
+            )
+        self.assertEqual(
+            list(days),
+            [
+                datetime.date(2023, 12, 31),
+                datetime.date(2024, 1, 1),
+                datetime.date(2024, 1, 2),
+            ],
+        )
+        # Amounts belong to the date feedings end on.
+        self.assertEqual(
+            [
+                (day["count"], day["entries"], day["amount"], day["amounts"])
+                for day in days.values()
+            ],
+            [(0, 0, None, None), (3, 2, 2, 1), (1, 1, 3, 1)],
+        )
+        self.assertEqual(
+            days[datetime.date(2024, 1, 2)]["duration"], datetime.timedelta(minutes=15)
+        )
+
+    def test_daily_aggregates(self):
+        for time, wet in [
+            (_time(2024, 1, 1, 0, 0), True),
+            (_time(2024, 1, 1, 20), False),
+            # After UTC (but not local) midnight.
+            (_time(2024, 1, 1, 23, 59), True),
+            (_time(2024, 1, 2, 8), True),
+            # Outside of the dates.
+            (_time(2023, 12, 31, 23, 59), True),
+            (_time(2024, 1, 3, 0, 0), True),
+        ]:
+            models.DiaperChange.objects.create(
+                child=self.child, time=time, wet=wet, solid=not wet
+            )
+        queryset = models.DiaperChange.objects.filter(child=self.child)
+        with timezone.override(TZ), self.assertNumQueries(1):
+            days = totals.daily_aggregates(
+                queryset,
+                "time",
+                {"changes": Count("pk"), "wet": Count("pk", filter=Q(wet=True))},
+                dates=(datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)),
+            )
+        self.assertEqual(
+            days,
+            {
+                datetime.date(2024, 1, 1): {"changes": 3, "wet": 2},
+                datetime.date(2024, 1, 2): {"changes": 1, "wet": 1},
+            },
+        )
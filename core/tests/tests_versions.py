@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core import bulk, models, versions
+
+
+class VersionsTestCase(TestCase):
+    def setUp(self):
+        self.children = [
+            models.Child.objects.create(
+                first_name="Child",
+                last_name=str(i),
+                birth_date=timezone.localdate(),
+            )
+            for i in range(2)
+        ]
+
+    def _versions(self, child):
+        return versions.get_versions(child.id, [models.DiaperChange, models.Sleep])
+
+    def test_bump(self):
+        child, other = self.children
+        before = self._versions(child)
+        self.assertEqual(self._versions(child), before)
+
+        change = models.DiaperChange.objects.create(
+            child=child, time=timezone.now(), wet=True, solid=False
+        )
+        after = self._versions(child)
+        self.assertGreater(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+
+        # Moving an entry to another child changes both children.
+        other_before = self._versions(other)
+        change.child = other
+        change.save()
+        self.assertGreater(self._versions(child)[0], after[0])
+        self.assertGreater(self._versions(other)[0], other_before[0])
+
+        before = self._versions(other)
+        change.delete()
+        self.assertGreater(self._versions(other)[0], before[0])
+
+        before = self._versions(child)
+        bulk.entries_changed(models.Sleep, [child.id])
+        self.assertGreater(self._versions(child)[1], before[1])
+
+    def test_bump_schedule(self):
+        child, other = self.children
+        schedule = models.MedicationSchedule.objects.create(child=child, name="Iron")
+        before = versions.get_versions(child.id, [models.MedicationSchedule])
+
+        # Schedules have no latest entries, but are moved between children too.
+        schedule.child = other
+        schedule.save()
+        self.assertGreater(
+            versions.get_versions(child.id, [models.MedicationSchedule]), before
+        )
+
+    def test_culled(self):
+        child = self.children[0]
+        before = self._versions(child)
+        cache.clear()
+        # Counters removed from the cache do not start over.
+        self.assertGreater(self._versions(child)[0], before[0])
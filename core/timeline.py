@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
-from datetime import timedelta
+import heapq
+import itertools
+from collections import defaultdict
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import NamedTuple
 
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q, prefetch_related_objects
+from django.db.models.functions import Lower
 from django.urls import reverse
 from django.utils import timezone, timesince
 from django.utils.translation import gettext as _
@@ -11,12 +19,41 @@ from core.models import (
     Feeding,
     Medication,
     Note,
+    Pumping,
     Sleep,
+    Tagged,
     TummyTime,
     Temperature,
 )
 from core.utils import duration_string
 
+EXPLICIT_TYPE_ORDERING = {"start": 0, "end": 1}
+
+# Models included in paginated timelines and the field holding each entry's time.
+PAGE_MODELS = {
+    DiaperChange: "time",
+    Expirable: "time",
+    Feeding: "start",
+    Medication: "time",
+    Note: "time",
+    Pumping: "start",
+    Sleep: "start",
+    Temperature: "time",
+    TummyTime: "start",
+}
+
+
+class PageKey(NamedTuple):
+    """Position of an entry in a paginated timeline."""
+
+    time: datetime
+    model_name: str
+    id: int
+
+
+def _event_key(event):
+    return event["time"], EXPLICIT_TYPE_ORDERING.get(event.get("type"), -1)
+
 
 def get_objects(date, child=None):
     """
@@ -27,118 +64,146 @@ def get_objects(date, child=None):
     """
     min_date = date
     max_date = date.replace(hour=23, minute=59, second=59)
-    events = []
-
-    _add_diaper_changes(min_date, max_date, events, child)
-    _add_expirables(min_date, max_date, events, child)
-    _add_feedings(min_date, max_date, events, child)
-    _add_sleeps(min_date, max_date, events, child)
-    _add_tummy_times(min_date, max_date, events, child)
-    _add_notes(min_date, max_date, events, child)
-    _add_medications(min_date, max_date, events, child)
-    _add_temperature_measurements(min_date, max_date, events, child)
-
-    explicit_type_ordering = {"start": 0, "end": 1}
-    events.sort(
-        key=lambda x: (
-            x["time"],
-            explicit_type_ordering.get(x.get("type"), -1),
+
+    instances = {
+        DiaperChange: _get_instances(DiaperChange, "time", min_date, max_date, child),
+        Expirable: _get_instances(Expirable, "time", min_date, max_date, child),
+        Feeding: _get_instances(
+            Feeding, "start", min_date - timedelta(days=1), max_date, child
         ),
-        reverse=True,
-    )
+        Sleep: _get_instances(Sleep, "start", min_date, max_date, child),
+        TummyTime: _get_instances(TummyTime, "start", min_date, max_date, child),
+        Note: _get_instances(Note, "time", min_date, max_date, child),
+        Medication: _get_instances(Medication, "time", min_date, max_date, child),
+        Temperature: _get_instances(Temperature, "time", min_date, max_date, child),
+    }
+    tags = _get_tags(instances)
 
-    return events
+    # Each stream is already in descending event order so a single merge
+    # produces the final timeline.
+    streams = [
+        _diaper_change_events(instances[DiaperChange], tags[DiaperChange]),
+        _expirable_events(instances[Expirable], tags[Expirable]),
+        *_feeding_events(instances[Feeding], tags[Feeding], min_date),
+        *_sleep_events(instances[Sleep], tags[Sleep]),
+        *_tummy_time_events(instances[TummyTime], tags[TummyTime]),
+        _note_events(instances[Note], tags[Note]),
+        _medication_events(instances[Medication], tags[Medication]),
+        _temperature_events(instances[Temperature], tags[Temperature]),
+    ]
+    return list(heapq.merge(*streams, key=_event_key, reverse=True))
 
 
-def _add_tummy_times(min_date, max_date, events, child=None):
-    instances = TummyTime.objects.filter(start__range=(min_date, max_date)).order_by(
-        "-start"
+def _get_instances(model, field, min_date, max_date, child=None):
+    """
+    Get a model's instances in a date range, newest first, with their child.
+    """
+    instances = (
+        model.objects.filter(**{field + "__range": (min_date, max_date)})
+        .select_related("child")
+        .order_by("-" + field, "-id")
     )
     if child:
         instances = instances.filter(child=child)
-    for instance in instances:
-        details = []
-        if instance.milestone:
-            details.append(instance.milestone)
-        edit_link = reverse("core:tummytime-update", args=[instance.id])
-        events.append(
-            {
-                "time": timezone.localtime(instance.start),
-                "event": _("%(child)s started tummy time!")
-                % {"child": instance.child.first_name},
-                "details": details,
-                "edit_link": edit_link,
-                "model_name": instance.model_name,
-                "type": "start",
-                "tags": instance.tags.all(),
-            }
-        )
+    return list(instances)
 
-        end = {
-            "time": timezone.localtime(instance.end),
-            "event": _("%(child)s finished tummy time.")
-            % {"child": instance.child.first_name},
-            "details": details,
-            "edit_link": edit_link,
-            "model_name": instance.model_name,
-            "type": "end",
-            "tags": instance.tags.all(),
-        }
-        if instance.duration > timedelta(seconds=0):
-            end["duration"] = duration_string(instance.duration)
 
-        events.append(end)
+def _get_tags(instances):
+    """
+    Get the tags of all instances with a single query.
+    :param instances: a dictionary of instance lists keyed by model.
+    :returns: a dictionary keyed by model of tag lists keyed by instance id.
+    """
+    tags = defaultdict(lambda: defaultdict(list))
+    content_types = ContentType.objects.get_for_models(*instances)
+    models = {content_type.id: model for model, content_type in content_types.items()}
 
+    query = Q()
+    for model, model_instances in instances.items():
+        if model_instances:
+            query |= Q(
+                content_type=content_types[model],
+                object_id__in=[instance.id for instance in model_instances],
+            )
+    if not query:
+        return tags
 
-def _add_sleeps(min_date, max_date, events, child=None):
-    instances = Sleep.objects.filter(start__range=(min_date, max_date)).order_by(
-        "-start"
+    tagged_items = (
+        Tagged.objects.filter(query).select_related("tag").order_by(Lower("tag__name"))
     )
-    if child:
-        instances = instances.filter(child=child)
+    for tagged in tagged_items:
+        tags[models[tagged.content_type_id]][tagged.object_id].append(tagged.tag)
+    return tags
+
+
+def _start_end_events(instances, tags, url_name, start_message, end_message, details):
+    """
+    Build separate, descending streams of start and end events for models with
+    start and end times.
+    """
+    starts = []
+    ends = []
     for instance in instances:
-        details = []
-        if instance.notes:
-            details.append(instance.notes)
-        edit_link = reverse("core:sleep-update", args=[instance.id])
-        events.append(
+        instance_details = details(instance)
+        edit_link = reverse(url_name, args=[instance.id])
+        starts.append(
             {
                 "time": timezone.localtime(instance.start),
-                "event": _("%(child)s fell asleep.")
-                % {"child": instance.child.first_name},
-                "details": details,
+                "event": start_message % {"child": instance.child.first_name},
+                "details": instance_details,
                 "edit_link": edit_link,
                 "model_name": instance.model_name,
                 "type": "start",
-                "tags": instance.tags.all(),
+                "tags": tags[instance.id],
             }
         )
 
         end = {
             "time": timezone.localtime(instance.end),
-            "event": _("%(child)s woke up.") % {"child": instance.child.first_name},
-            "details": details,
+            "event": end_message % {"child": instance.child.first_name},
+            "details": instance_details,
             "edit_link": edit_link,
             "model_name": instance.model_name,
             "type": "end",
-            "tags": instance.tags.all(),
+            "tags": tags[instance.id],
         }
         if instance.duration > timedelta(seconds=0):
             end["duration"] = duration_string(instance.duration)
-        events.append(end)
+        ends.append(end)
 
+    # Instances are ordered by start, so only the end events need ordering.
+    ends.sort(key=_event_key, reverse=True)
+    return starts, ends
 
-def _add_feedings(min_date, max_date, events, child=None):
-    # Ensure first feeding has a previous.
-    yesterday = min_date - timedelta(days=1)
-    prev_start = None
 
-    instances = Feeding.objects.filter(start__range=(yesterday, max_date)).order_by(
-        "start"
+def _tummy_time_events(instances, tags):
+    return _start_end_events(
+        instances,
+        tags,
+        "core:tummytime-update",
+        _("%(child)s started tummy time!"),
+        _("%(child)s finished tummy time."),
+        lambda instance: [instance.milestone] if instance.milestone else [],
     )
-    if child:
-        instances = instances.filter(child=child)
-    for instance in instances:
+
+
+def _sleep_events(instances, tags):
+    return _start_end_events(
+        instances,
+        tags,
+        "core:sleep-update",
+        _("%(child)s fell asleep."),
+        _("%(child)s woke up."),
+        lambda instance: [instance.notes] if instance.notes else [],
+    )
+
+
+def _feeding_events(instances, tags, min_date):
+    starts = []
+    ends = []
+    # Instances include the previous day so the first feeding has a previous.
+    prev_start = None
+    for instance in reversed(instances):
         details = []
         if instance.notes:
             details.append(instance.notes)
@@ -157,115 +222,97 @@ def _add_feedings(min_date, max_date, events, child=None):
             "details": details,
             "edit_link": edit_link,
             "model_name": instance.model_name,
-            "tags": instance.tags.all(),
+            "tags": tags[instance.id],
         }
 
         if instance.duration > timedelta(seconds=0):
-            start_event = {
-                **base_object,
-                "event": _("%(child)s started feeding.")
-                % {"child": instance.child.first_name},
-                "time_since_prev": time_since_prev,
-                "type": "start",
-            }
-
-            end_event = {
-                **base_object,
-                "time": timezone.localtime(instance.end),
-                "event": _("%(child)s finished feeding.")
-                % {"child": instance.child.first_name},
-                "type": "end",
-                "duration": duration_string(instance.duration),
-            }
-
-            events.extend([start_event, end_event])
+            starts.append(
+                {
+                    **base_object,
+                    "event": _("%(child)s started feeding.")
+                    % {"child": instance.child.first_name},
+                    "time_since_prev": time_since_prev,
+                    "type": "start",
+                }
+            )
+            ends.append(
+                {
+                    **base_object,
+                    "time": timezone.localtime(instance.end),
+                    "event": _("%(child)s finished feeding.")
+                    % {"child": instance.child.first_name},
+                    "type": "end",
+                    "duration": duration_string(instance.duration),
+                }
+            )
         else:
-            feed_event = {
-                **base_object,
-                "event": _("%(child)s had a feeding.")
-                % {"child": instance.child.first_name},
-                "time_since_prev": time_since_prev,
-            }
-            events.append(feed_event)
+            starts.append(
+                {
+                    **base_object,
+                    "event": _("%(child)s had a feeding.")
+                    % {"child": instance.child.first_name},
+                    "time_since_prev": time_since_prev,
+                }
+            )
 
+    starts.reverse()
+    ends.sort(key=_event_key, reverse=True)
+    return starts, ends
 
-def _add_diaper_changes(min_date, max_date, events, child):
-    instances = DiaperChange.objects.filter(time__range=(min_date, max_date)).order_by(
-        "-time"
-    )
-    if child:
-        instances = instances.filter(child=child)
+
+def _diaper_change_events(instances, tags):
     for instance in instances:
         contents = []
         if instance.wet:
             contents.append("💧")
         if instance.solid:
             contents.append("💩")
-        events.append(
-            {
-                "time": timezone.localtime(instance.time),
-                "event": _("%(child)s had a %(type)s diaper change.")
-                % {
-                    "child": instance.child.first_name,
-                    "type": "".join(contents),
-                },
-                "edit_link": reverse("core:diaperchange-update", args=[instance.id]),
-                "model_name": instance.model_name,
-                "tags": instance.tags.all(),
-            }
-        )
+        yield {
+            "time": timezone.localtime(instance.time),
+            "event": _("%(child)s had a %(type)s diaper change.")
+            % {
+                "child": instance.child.first_name,
+                "type": "".join(contents),
+            },
+            "edit_link": reverse("core:diaperchange-update", args=[instance.id]),
+            "model_name": instance.model_name,
+            "tags": tags[instance.id],
+        }
 
 
-def _add_expirables(min_date, max_date, events, child):
-    instances = Expirable.objects.filter(time__range=(min_date, max_date)).order_by(
-        "-time"
-    )
-    if child:
-        instances = instances.filter(child=child)
+def _expirable_events(instances, tags):
     for instance in instances:
         details = []
         if instance.notes:
             details.append(instance.notes)
         status = _("discarded") if instance.discarded else _("open")
         details.append(_("Status") + ": " + status)
-        events.append(
-            {
-                "time": timezone.localtime(instance.time),
-                "event": _("%(child)s opened %(name)s.")
-                % {
-                    "child": instance.child.first_name,
-                    "name": instance.name,
-                },
-                "details": details,
-                "edit_link": reverse("core:expirable-update", args=[instance.id]),
-                "model_name": instance.model_name,
-                "tags": instance.tags.all(),
-            }
-        )
+        yield {
+            "time": timezone.localtime(instance.time),
+            "event": _("%(child)s opened %(name)s.")
+            % {
+                "child": instance.child.first_name,
+                "name": instance.name,
+            },
+            "details": details,
+            "edit_link": reverse("core:expirable-update", args=[instance.id]),
+            "model_name": instance.model_name,
+            "tags": tags[instance.id],
+        }
 
 
-def _add_notes(min_date, max_date, events, child):
-    instances = Note.objects.filter(time__range=(min_date, max_date)).order_by("-time")
-    if child:
-        instances = instances.filter(child=child)
+def _note_events(instances, tags):
     for instance in instances:
-        events.append(
-            {
-                "time": timezone.localtime(instance.time),
-                "details": [instance.note],
-                "edit_link": reverse("core:note-update", args=[instance.id]),
-                "model_name": instance.model_name,
-                "tags": instance.tags.all(),
-            }
-        )
+        yield {
+            "time": timezone.localtime(instance.time),
+            "details": [instance.note],
+            "edit_link": reverse("core:note-update", args=[instance.id]),
+            "model_name": instance.model_name,
+            "tags": tags[instance.id],
+        }
 
 
-def _add_medications(min_date, max_date, events, child):
-    instances = Medication.objects.filter(time__range=(min_date, max_date)).order_by(
-        "-time"
-    )
-    if child:
-        instances = instances.filter(child=child)
+def _medication_events(instances, tags):
     for instance in instances:
         details = []
         if instance.name:
@@ -277,43 +324,103 @@ def _add_medications(min_date, max_date, events, child):
             details.append(_("Amount") + ": " + amount_str)
         if instance.notes:
             details.append(instance.notes)
-        events.append(
-            {
-                "time": timezone.localtime(instance.time),
-                "event": _("%(child)s had a medication.")
-                % {
-                    "child": instance.child.first_name,
-                },
-                "details": details,
-                "edit_link": reverse("core:medication-update", args=[instance.id]),
-                "model_name": instance.model_name,
-                "tags": instance.tags.all(),
-            }
-        )
+        yield {
+            "time": timezone.localtime(instance.time),
+            "event": _("%(child)s had a medication.")
+            % {
+                "child": instance.child.first_name,
+            },
+            "details": details,
+            "edit_link": reverse("core:medication-update", args=[instance.id]),
+            "model_name": instance.model_name,
+            "tags": tags[instance.id],
+        }
 
 
-def _add_temperature_measurements(min_date, max_date, events, child):
-    instances = Temperature.objects.filter(time__range=(min_date, max_date)).order_by(
-        "-time"
-    )
-    if child:
-        instances = instances.filter(child=child)
+def _temperature_events(instances, tags):
     for instance in instances:
         details = []
         if instance.notes:
             details.append(instance.notes)
         if instance.temperature:
             details.append(_("Temperature") + ": " + str(instance.temperature))
-        events.append(
-            {
-                "time": timezone.localtime(instance.time),
-                "event": _("%(child)s had a temperature measurement.")
-                % {
-                    "child": instance.child.first_name,
-                },
-                "details": details,
-                "edit_link": reverse("core:temperature-update", args=[instance.id]),
-                "model_name": instance.model_name,
-                "tags": instance.tags.all(),
-            }
+        yield {
+            "time": timezone.localtime(instance.time),
+            "event": _("%(child)s had a temperature measurement.")
+            % {
+                "child": instance.child.first_name,
+            },
+            "details": details,
+            "edit_link": reverse("core:temperature-update", args=[instance.id]),
+            "model_name": instance.model_name,
+            "tags": tags[instance.id],
+        }
+
+
+def get_page(limit, before=None, child=None, models=None):
+    """
+    Get a page of entries of all timeline models, newest first. Entries are
+    ordered by (time, model name, id) and pages continue from the key of the
+    last entry of the previous page, so each page costs one bounded query per
+    model regardless of how far back it is.
+    :param limit: the maximum number of entries to return.
+    :param before: a PageKey to continue from (exclusive) or `None` to start
+                   with the newest entries.
+    :param child: Child instance to filter results for (no filter if `None`).
+    :param models: the PAGE_MODELS models to include (all if `None`).
+    :returns: a list of (PageKey, instance) tuples and the PageKey of the next
+              page (`None` for the last page).
+    """
+    streams = [
+        _page_entries(model, limit + 1, before, child)
+        for model in models or PAGE_MODELS
+    ]
+    entries = list(
+        itertools.islice(
+            heapq.merge(*streams, key=itemgetter(0), reverse=True), limit + 1
         )
+    )
+    next_key = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_key = entries[-1][0]
+
+    # Only prefetch tags for the entries that made it onto the page.
+    by_model = defaultdict(list)
+    for key, instance in entries:
+        by_model[type(instance)].append(instance)
+    for instances in by_model.values():
+        prefetch_related_objects(instances, "tags")
+
+    return entries, next_key
+
+
+def _page_entries(model, limit, before=None, child=None):
+    """
+    Get (PageKey, instance) tuples of a model's entries, newest first.
+    """
+    field = PAGE_MODELS[model]
+    instances = model.objects.order_by("-" + field, "-id")
+    if child:
+        instances = instances.filter(child=child)
+    if before:
+        instances = instances.filter(_before_query(model, field, before))
+    return [
+        (
+            PageKey(getattr(instance, field), model._meta.model_name, instance.id),
+            instance,
+        )
+        for instance in instances[:limit]
+    ]
+
+
+def _before_query(model, field, key):
+    """
+    Filter a model's entries to those ordered after (older than) a page key.
+    """
+    model_name = model._meta.model_name
+    if model_name < key.model_name:
+        return Q(**{field + "__lte": key.time})
+    if model_name > key.model_name:
+        return Q(**{field + "__lt": key.time})
+    return Q(**{field + "__lt": key.time}) | Q(**{field: key.time, "id__lt": key.id})
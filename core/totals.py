@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Totals of entries per local date.
+
+Entries are grouped by the local dates of their start and end in the
+database, in the current time zone. Entries within one date are summed per
+date by the database. Only the few entries crossing midnight are read one by
+one, to split their time between the dates they cover at the local midnights
+(which may be 23 or 25 hours apart).
+
+Entries of a point in time (or counted by one of their times) are aggregated
+per local date by the database alone, see `daily_aggregates`.
+"""
+
+import datetime
+
+from django.db.models import (
+    Case,
+    Count,
+    DateTimeField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Q,
+    Sum,
+    When,
+)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def _midnight(date, tz):
+    # In UTC, as differences of times in the same zone ignore DST changes.
+    midnight = datetime.datetime.combine(date, datetime.time.min)
+    return timezone.make_aware(midnight, tz).astimezone(datetime.timezone.utc)
+
+
+def local_date(field):
+    """
+    Get the date of a datetime field in the current time zone, for grouping
+    entries by local date in the database.
+    :param field: the name of a datetime field.
+    :returns: a TruncDate expression.
+    """
+    return TruncDate(field, tzinfo=timezone.get_current_timezone())
+
+
+def day_bounds(first, last):
+    """
+    Get the times local dates start and end at, in the current time zone.
+    :param first: the first date.
+    :param last: the last date.
+    :returns: a tuple of the local midnights starting `first` and following
+              `last`, to filter entries with `__gte` and `__lt`.
+    """
+    tz = timezone.get_current_timezone()
+    return _midnight(first, tz), _midnight(last + datetime.timedelta(days=1), tz)
+
+
+def _empty(sums):
+    return {
+        "count": 0,
+        "entries": 0,
+        "duration": datetime.timedelta(0),
+        **{name: None for name in sums},
+    }
+
+
+def _add(totals, name, value):
+    if value is not None:
+        totals[name] = value if totals[name] is None else totals[name] + value
+
+
+def daily_totals(
+    queryset, start_field="start", end_field="end", sums=None, dates=None, anchor=None
+):
+    """
+    Get the totals of entries for each local date they cover.
+    :param queryset: a QuerySet of entries.
+    :param start_field: the name of the field entries start at.
+    :param end_field: the name of the field entries end at.
+    :param sums: a dict of names and aggregates (e.g. `Sum("amount")`) of
+                 entries to add up per date. Aggregates must be additive and
+                 names must differ from the keys of the totals below.
+    :param dates: a tuple of the first and last date to get totals for, or
+                  `None` for all dates with entries.
+    :param anchor: the field (`start_field` or `end_field`) whose date entries
+                   are attributed to for "entries" and `sums` (defaults to
+                   `end_field`).
+    :returns: a dict keyed by date, in order, of dicts with the number of
+              entries covering the date ("count"), the number of entries
+              attributed to it ("entries"), the time of entries within the
+              date ("duration") and a value for each of `sums` (`None` if no
+              entries had a value). With `dates`, every date of the range has
+              totals.
+    """
+    sums = sums or {}
+    anchor = anchor or end_field
+    tz = timezone.get_current_timezone()
+    if dates:
+        start, end = day_bounds(*dates)
+        queryset = queryset.filter(
+            **{end_field + "__gte": start, start_field + "__lt": end}
+        )
+
+    crossing = ~Q(totals_start_date=F("totals_end_date"))
+    rows = (
+        queryset.order_by()
+        .annotate(
+            totals_start_date=local_date(start_field),
+            totals_end_date=local_date(end_field),
+        )
+        .annotate(
+            totals_start=Case(
+                When(crossing, then=F(start_field)), output_field=DateTimeField()
+            ),
+            totals_end=Case(
+                When(crossing, then=F(end_field)), output_field=DateTimeField()
+            ),
+        )
+        .values("totals_start_date", "totals_end_date", "totals_start", "totals_end")
+        .annotate(
+            totals_count=Count("pk"),
+            totals_duration=Sum(
+                ExpressionWrapper(
+                    F(end_field) - F(start_field), output_field=DurationField()
+                )
+            ),
+            **{
+                "totals_sum_{}".format(i): value
+                for i, value in enumerate(sums.values())
+            },
+        )
+    )
+
+    totals = {}
+    for row in rows:
+        anchor_date = row[
+            "totals_start_date" if anchor == start_field else "totals_end_date"
+        ]
+        day = totals.setdefault(anchor_date, _empty(sums))
+        day["entries"] += row["totals_count"]
+        for i, name in enumerate(sums):
+            _add(day, name, row["totals_sum_{}".format(i)])
+
+        if row["totals_start"] is None:
+            day["count"] += row["totals_count"]
+            day["duration"] += row["totals_duration"] or datetime.timedelta(0)
+            continue
+
+        # Split entries crossing midnight (grouped by their exact times) at
+        # each local midnight.
+        start, end = row["totals_start"], row["totals_end"]
+        date = row["totals_start_date"]
+        while True:
+            next_midnight = _midnight(date + datetime.timedelta(days=1), tz)
+            day = totals.setdefault(date, _empty(sums))
+            day["count"] += row["totals_count"]
+            day["duration"] += (min(end, next_midnight) - start) * row["totals_count"]
+            if end <= next_midnight:
+                break
+            start, date = next_midnight, date + datetime.timedelta(days=1)
+
+    if dates:
+        first, last = dates
+        days = [
+            first + datetime.timedelta(days=i) for i in range((last - first).days + 1)
+        ]
+        return {day: totals.get(day) or _empty(sums) for day in days}
+    return dict(sorted(totals.items()))
+
+
+def daily_aggregates(queryset, field, aggregates, dates):
+    """
+    Get aggregates of entries for each local date of a field.
+    :param queryset: a QuerySet of entries.
+    :param field: the name of the datetime field to group entries by.
+    :param aggregates: a dict of names and aggregates (e.g.
+                       `Count("pk", filter=Q(wet=True))`) of the entries of
+                       each date. Names may be those of fields.
+    :param dates: a tuple of the first and last date to get aggregates for.
+    :returns: a dict keyed by date of dicts with the value of each aggregate,
+              for the dates with entries only (one row per date).
+    """
+    start, end = day_bounds(*dates)
+    rows = (
+        queryset.filter(**{field + "__gte": start, field + "__lt": end})
+        .order_by()
+        .annotate(aggregates_date=local_date(field))
+        .values("aggregates_date")
+        .annotate(
+            **{
+                "aggregates_{}".format(i): value
+                for i, value in enumerate(aggregates.values())
+            }
+        )
+    )
+    return {
+        row["aggregates_date"]: {
+            name: row["aggregates_{}".format(i)] for i, name in enumerate(aggregates)
+        }
+        for row in rows
+    }
@@ -76,7 +76,9 @@ urlpatterns = [
     path("tags/<str:slug>/", views.TagAdminDetail.as_view(), name="tag-detail"),
     path("tags/<str:slug>/edit", views.TagAdminUpdate.as_view(), name="tag-update"),
     path("tags/<str:slug>/delete/", views.TagAdminDelete.as_view(), name="tag-delete"),
+    path("events/", views.EventStream.as_view(), name="events"),
     path("timers/", views.TimerList.as_view(), name="timer-list"),
+    path("timers/nav/", views.TimerNav.as_view(), name="timer-nav"),
     path("timers/add/", views.TimerAdd.as_view(), name="timer-add"),
     path("timers/add/quick/", views.TimerAddQuick.as_view(), name="timer-add-quick"),
     path("timers/<int:pk>/", views.TimerDetail.as_view(), name="timer-detail"),
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Change counters of children's data.
+
+Every tracked model has a counter per child, incremented whenever an entry of
+the model is saved or deleted for the child. Values derived from a child's
+entries (e.g. report graphs) can be cached under a key including the counters
+of the models they are derived from and are never read once the data changes,
+so they do not have to be invalidated explicitly.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core import changes, latest, models
+
+# Models with a counter per child. Children have a counter of their own, for
+# values derived from e.g. their birth date.
+VERSIONED_MODELS = [*latest.LATEST_FIELDS, models.MedicationSchedule, models.Child]
+
+CACHE_KEY = "core.versions.{}.{}"
+
+
+def _cache_key(child_id, model):
+    return CACHE_KEY.format(child_id, model._meta.model_name)
+
+
+def _initial_version():
+    # Counters may be culled from the cache. Starting from the current time
+    # keeps a counter from repeating a value it had before it was culled.
+    return time.time_ns() // 1000
+
+
+def get_versions(child_id, model_classes):
+    """
+    Get the change counters of models for a child.
+    :param child_id: the id of a Child instance.
+    :param model_classes: VERSIONED_MODELS models.
+    :returns: a list with the counter of each model, in the given order.
+    """
+    return get_children_versions([child_id], model_classes)[child_id]
+
+
+def get_children_versions(child_ids, model_classes):
+    """
+    Get the change counters of models for several children at once.
+    :param child_ids: ids of Child instances.
+    :param model_classes: VERSIONED_MODELS models.
+    :returns: a dict keyed by child id of lists with the counter of each
+              model, in the given order.
+    """
+    keys = {
+        (child_id, model): _cache_key(child_id, model)
+        for child_id in child_ids
+        for model in model_classes
+    }
+    versions = cache.get_many(keys.values())
+    missing = {key: _initial_version() for key in keys.values() if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {
+        child_id: [versions[keys[child_id, model]] for model in model_classes]
+        for child_id in child_ids
+    }
+
+
+def get_version(child_id, model_classes):
+    """
+    Get a single value changing whenever any model's counter for a child does.
+    :param child_id: the id of a Child instance.
+    :param model_classes: VERSIONED_MODELS models.
+    :returns: a string of the counters.
+    """
+    return "-".join(str(version) for version in get_versions(child_id, model_classes))
+
+
+def bump(child_ids, model_classes):
+    """
+    Increment the change counters of models for children.
+    :param child_ids: ids of Child instances (`None` values are ignored).
+    :param model_classes: VERSIONED_MODELS models.
+    """
+    keys = [
+        _cache_key(child_id, model)
+        for child_id in child_ids
+        if child_id
+        for model in model_classes
+    ]
+    if not keys:
+        return
+    _increment(keys)
+    # Values derived by other connections before the transaction commits may
+    # have been cached under the incremented counter in the meantime.
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _increment(keys))
+
+
+def _increment(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def on_post_save(sender, instance, **kwargs):
+    if sender is models.Child:
+        bump([instance.id], [sender])
+    else:
+        bump(changes.get_child_ids(instance), [sender])
+
+
+def on_post_delete(sender, instance, origin=None, **kwargs):
+    # Nothing is derived from the entries of deleted children.
+    if sender is models.Child or isinstance(origin, models.Child):
+        return
+    bump([instance.child_id], [sender])
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models import Count
 from django.db.models.functions import Lower
-from django.http import HttpResponseNotFound, HttpResponseRedirect
+from django.http import (
+    HttpResponseNotFound,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
@@ -16,7 +21,7 @@ from django.views.generic.edit import CreateView, UpdateView, DeleteView
 
 from babybuddy.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from babybuddy.views import BabyBuddyFilterView, BabyBuddyPaginatedView
-from core import filters, forms, models, timeline
+from core import events, filters, forms, latest, models, timeline
 
 
 def _prepare_timeline_context_data(context, date, child=None):
@@ -137,7 +142,11 @@ class LastEntryBannerView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         model_name = kwargs["model_name"]
         context["model_name"] = model_name
-        last = CHILD_MODELS[model_name].objects.filter(child=self.child).first()
+        model = CHILD_MODELS[model_name]
+        if model in latest.LATEST_FIELDS:
+            last = latest.get_child_latest(self.child, [model])[model]
+        else:
+            last = model.objects.filter(child=self.child).first()
         if not last:
             return context
         context["last_entry"] = last
@@ -735,6 +744,29 @@ class Timeline(LoginRequiredMixin, TemplateView):
         return context
 
 
+class EventStream(PermissionRequiredMixin, View):
+    """
+    Server-sent events of changes of children's data, see `core.events`.
+    """
+
+    permission_required = ("core.view_child",)
+
+    def get(self, request, *args, **kwargs):
+        config = settings.EVENT_STREAM
+        if not config["ENABLED"]:
+            return HttpResponseNotFound()
+        slugs = dict(models.Child.objects.values_list("id", "slug"))
+        response = StreamingHttpResponse(
+            events.stream(
+                slugs, slugs, heartbeat=config["HEARTBEAT"], max_age=config["MAX_AGE"]
+            ),
+            content_type="text/event-stream",
+        )
+        # Keep proxies (e.g. nginx) from buffering events.
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+
 class TimerList(PermissionRequiredMixin, BabyBuddyPaginatedView, BabyBuddyFilterView):
     model = models.Timer
     template_name = "core/timer_list.html"
@@ -742,6 +774,15 @@ class TimerList(PermissionRequiredMixin, BabyBuddyPaginatedView, BabyBuddyFilter
     filterset_fields = ("user",)
 
 
+class TimerNav(PermissionRequiredMixin, TemplateView):
+    """
+    The timers menu of the navigation bar, to refresh it when timers change.
+    """
+
+    permission_required = ("core.view_timer",)
+    template_name = "core/timer_nav_update.html"
+
+
 class TimerDetail(PermissionRequiredMixin, DetailView):
     model = models.Timer
     permission_required = ("core.view_timer",)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Child dashboard cards as HTML fragments.
+
+Each card of the child dashboard is also served on its own, with an ETag made
+of the change counters (see `core.versions`) of the models the card shows. The
+dashboard's refresh loop sends the ETag of every card back and only replaces
+cards whose data changed, so refreshing a dashboard without new data renders
+no cards.
+
+Cards also change with time alone (e.g. "5 minutes ago" or "Today's Tummy
+Time"), so ETags include the current local time, truncated to the period in
+which a card can change without changes of its data.
+"""
+
+import hashlib
+from collections import namedtuple
+
+from django.template import engines
+from django.utils import timezone, translation
+from django.utils.cache import quote_etag
+
+from babybuddy import VERSION
+from core import models, versions
+
+MINUTE = "%Y-%m-%d %H:%M"
+HOUR = "%Y-%m-%d %H"
+DAY = "%Y-%m-%d"
+
+# A card: the name of its template tag (in the cards library), the
+# VERSIONED_MODELS models it shows, the period (a strftime format) of its
+# changes without changes of the models and whether it only shows entries
+# within the user's `dashboard_hide_age` (changing every minute if set).
+Card = namedtuple("Card", ["tag", "models", "period", "aged"])
+
+CARDS = {
+    "breastfeeding": Card("card_breastfeeding", [models.Feeding], DAY, False),
+    "diaperchange-last": Card(
+        "card_diaperchange_last", [models.DiaperChange], MINUTE, True
+    ),
+    "diaperchange-types": Card(
+        "card_diaperchange_types", [models.DiaperChange], DAY, False
+    ),
+    "expirable-alert": Card("expirable_alert", [models.Expirable], MINUTE, False),
+    "feeding-last": Card("card_feeding_last", [models.Feeding], MINUTE, True),
+    "feeding-last-method": Card(
+        "card_feeding_last_method", [models.Feeding], DAY, True
+    ),
+    "feeding-recent": Card("card_feeding_recent", [models.Feeding], DAY, False),
+    "medication-last": Card(
+        "card_medication_last",
+        [models.Medication, models.MedicationSchedule],
+        MINUTE,
+        True,
+    ),
+    "medication-overdue-alert": Card(
+        "medication_overdue_alert",
+        [models.Medication, models.MedicationSchedule],
+        MINUTE,
+        False,
+    ),
+    "pumping-last": Card("card_pumping_last", [models.Pumping], MINUTE, True),
+    "sleep-last": Card("card_sleep_last", [models.Sleep], MINUTE, True),
+    "sleep-naps-day": Card("card_sleep_naps_day", [models.Sleep], DAY, False),
+    "sleep-recent": Card("card_sleep_recent", [models.Sleep], DAY, False),
+    "statistics": Card(
+        "card_statistics",
+        [
+            models.BMI,
+            models.DiaperChange,
+            models.Feeding,
+            models.HeadCircumference,
+            models.Height,
+            models.Sleep,
+            models.Weight,
+        ],
+        HOUR,
+        False,
+    ),
+    # Timers without a child are shown too, but not counted for children.
+    "timer-list": Card("card_timer_list", [models.Timer], MINUTE, False),
+    "tummytime-day": Card("card_tummytime_day", [models.TummyTime], DAY, False),
+}
+
+_templates = {}
+
+
+def get_etag(request, child, name, loader=None):
+    """
+    Get the ETag of a card.
+    :param request: the request the card is shown for.
+    :param child: an instance of the Child model.
+    :param name: a key of CARDS.
+    :param loader: a DashboardLoader of the card's page (optional).
+    :returns: a quoted ETag string.
+    """
+    card = CARDS[name]
+    if loader is None:
+        version = versions.get_version(child.id, card.models)
+    else:
+        version = loader.get_version(child, card.models)
+    settings = request.user.settings
+    period = card.period
+    if card.aged and settings.dashboard_hide_age:
+        period = MINUTE
+    parts = [
+        name,
+        child.id,
+        version,
+        timezone.localtime().strftime(period),
+        request.user.pk,
+        settings.dashboard_hide_empty,
+        settings.dashboard_hide_age,
+        translation.get_language(),
+        timezone.get_current_timezone_name(),
+        VERSION,
+    ]
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def render(request, child, name, loader=None):
+    """
+    Render a card.
+    :param request: the request the card is shown for.
+    :param child: an instance of the Child model.
+    :param name: a key of CARDS.
+    :param loader: a DashboardLoader of the card's page (optional).
+    :returns: the card's HTML (empty for hidden cards).
+    """
+    template = _templates.get(name)
+    if template is None:
+        template = engines["django"].from_string(
+            "{{% load cards %}}{{% {} child %}}".format(CARDS[name].tag)
+        )
+        _templates[name] = template
+    return template.render({"child": child, "dashboard_loader": loader}, request)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Data of the dashboard cards of several children, loaded together.
+
+Rendered one by one, every card looks up its change counters (for its ETag)
+and its latest entry on its own, so a page with cards of several children
+makes a few queries per card and child. A loader is created for all cards of
+a page instead. It reads the counters of all children at once and looks up
+the latest entries with one query per model for all children (see
+`core.latest`) and the medication schedules of all children at once, and is
+passed on to the card tags.
+"""
+
+from core import latest, schedules, versions
+
+from . import fragments
+
+
+class DashboardLoader:
+    """Load the data of cards for children.
+
+    Change counters are read when the loader is created, before any entries,
+    like the ETag of a single card is taken before rendering it, so changes
+    while loading are not missed. Latest entries of a model and medication
+    schedules are loaded for all children when the first card needs them.
+    """
+
+    def __init__(self, children, names):
+        self.children = list(children)
+        card_models = []
+        for name in names:
+            for model in fragments.CARDS[name].models:
+                if model not in card_models:
+                    card_models.append(model)
+
+        self._versions = {
+            child_id: dict(zip(card_models, values))
+            for child_id, values in versions.get_children_versions(
+                [child.id for child in self.children], card_models
+            ).items()
+        }
+        self._latest = {}
+        self._schedules = None
+
+    def get_version(self, child, model_classes):
+        """
+        Get the value of `core.versions.get_version` for a child.
+        :param child: an instance of the Child model.
+        :param model_classes: models of the loaded cards.
+        :returns: a string of the counters.
+        """
+        child_versions = self._versions[child.id]
+        return "-".join(str(child_versions[model]) for model in model_classes)
+
+    def get_latest(self, child, model):
+        """
+        Get the latest instance of a model for a child.
+        :param child: an instance of the Child model.
+        :param model: a LATEST_FIELDS model of the loaded cards.
+        :returns: an instance of the model, or `None`.
+        """
+        if model not in self._latest:
+            # Loaded for all children when first needed.
+            for child_id, instances in latest.get_latest(
+                self.children, [model]
+            ).items():
+                self._latest.setdefault(model, {})[child_id] = instances[model]
+        return self._latest[model][child.id]
+
+    def get_schedules(self, child):
+        """
+        Get the active medication schedules of a child.
+        :param child: an instance of the Child model.
+        :returns: a list of MedicationSchedule instances.
+        """
+        if self._schedules is None:
+            # Loaded for all children when first needed.
+            self._schedules = {child.id: [] for child in self.children}
+            for schedule in schedules.active(self._schedules):
+                self._schedules[schedule.child_id].append(schedule)
+        return self._schedules[child.id]
@@ -2,6 +2,11 @@
  *
  * Provides a "watch" function to update the dashboard at one minute intervals
  * and/or on visibility state changes.
+ *
+ * Cards with a `data-card-url` are requested with the ETag they were last
+ * shown with and only replaced when they changed. Pages without such cards
+ * are reloaded. `updateCards` updates the cards showing a child's models,
+ * e.g. on events of BabyBuddy.Events.
  */
 BabyBuddy.Dashboard = (function ($) {
   var runIntervalId = null;
@@ -54,8 +59,67 @@ BabyBuddy.Dashboard = (function ($) {
     },
 
     update: function () {
-      // TODO: Someday maybe update in place?
-      location.reload();
+      if ($("[data-card-url]").length === 0) {
+        location.reload();
+        return;
+      }
+      Dashboard.updateCards(null, null);
+    },
+
+    updateCards: function (child, models) {
+      $("[data-card-url]").each(function () {
+        var card = $(this);
+        if (child && card.attr("data-card-child") !== child) {
+          return;
+        }
+        if (models) {
+          var cardModels = card.attr("data-card-models").split(" ");
+          var changed = models.some(function (model) {
+            return cardModels.indexOf(model) !== -1;
+          });
+          if (!changed) {
+            return;
+          }
+        }
+        Dashboard.updateCard(card);
+      });
+    },
+
+    updateCard: function (card) {
+      fetch(card.attr("data-card-url"), {
+        cache: "no-store",
+        credentials: "same-origin",
+        headers: { "If-None-Match": card.attr("data-card-etag") },
+      })
+        .then(function (response) {
+          if (response.redirected) {
+            // E.g. to the login page, once the session expired.
+            location.reload();
+            return;
+          }
+          // Unchanged cards are answered with 304 Not Modified.
+          if (response.status !== 200) {
+            return;
+          }
+          return response.text().then(function (html) {
+            card.html(html);
+            card.attr("data-card-etag", response.headers.get("ETag"));
+            Dashboard.layout();
+          });
+        })
+        .catch(function (error) {
+          console.error("Baby Buddy: Dashboard card update failed.", error);
+        });
+    },
+
+    layout: function () {
+      if (typeof Masonry === "undefined") {
+        return;
+      }
+      var masonry = Masonry.data(dashboardElement[0]);
+      if (masonry) {
+        masonry.layout();
+      }
     },
   };
 
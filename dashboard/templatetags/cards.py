@@ -1,15 +1,16 @@
 # -*- coding: utf-8 -*-
 from django import template
-from django.db.models import Avg, Count, Q, Sum
+from django.db.models import Count, Q, Sum
 from django.db.models.functions import TruncDate
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
-import collections
+import datetime
 
-from core import models
-from core.choices import FeedingMethod, MedicationFrequency
+from core import latest, models, rollups, schedules, totals
+from core.choices import FeedingMethod, MedicationFrequency, RollupActivity
+from dashboard import fragments
 
 register = template.Library()
 
@@ -18,6 +19,61 @@ def _hide_empty(context):
     return context["request"].user.settings.dashboard_hide_empty
 
 
+def _latest(context, child, model):
+    """
+    Get the latest instance of a model for a child, unless it is older than the
+    user's dashboard age limit.
+    """
+    loader = context.get("dashboard_loader")
+    if loader is None:
+        instance = latest.get_child_latest(child, [model])[model]
+    else:
+        instance = loader.get_latest(child, model)
+    if not instance or not context["request"].user.settings.dashboard_hide_age:
+        return instance
+
+    field = latest.LATEST_FIELDS[model]
+    now = timezone.localtime()
+    if (
+        getattr(instance, field)
+        < now - context["request"].user.settings.dashboard_hide_age
+    ):
+        return None
+    if getattr(instance, field) > now:
+        # Entries are not normally in the future, but respect the age window.
+        return (
+            model.objects.filter(child=child)
+            .filter(**_filter_data_age(context, field))
+            .order_by("-" + field)
+            .first()
+        )
+    return instance
+
+
+def _active_schedules(context, child):
+    """
+    Get the active medication schedules of a child from the page's loader,
+    or `None` to look them up.
+    """
+    loader = context.get("dashboard_loader")
+    if loader is None:
+        return None
+    return loader.get_schedules(child)
+
+
+def _day(date):
+    """
+    Get the local date cards of a day are shown for.
+    :param date: a date or datetime object, or `None` for today.
+    :returns: a date object.
+    """
+    if not date:
+        return timezone.localdate()
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    return date
+
+
 def _filter_data_age(context, keyword="end"):
     filter = {}
     if context["request"].user.settings.dashboard_hide_age:
@@ -27,6 +83,29 @@ def _filter_data_age(context, keyword="end"):
     return filter
 
 
+@register.inclusion_tag("cards/fragment.html", takes_context=True)
+def dashboard_card(context, child, name):
+    """
+    A card of the child dashboard, refreshed on its own by the dashboard. The
+    card's data is taken from the page's `dashboard_loader`, if any.
+    :param child: an instance of the Child model.
+    :param name: a key of `dashboard.fragments.CARDS`.
+    :returns: a dictionary with the card's HTML, URL, ETag and the names of
+              the models it shows.
+    """
+    request = context["request"]
+    loader = context.get("dashboard_loader")
+    # The ETag is taken first, so changes while rendering are not missed.
+    etag = fragments.get_etag(request, child, name, loader)
+    return {
+        "card": fragments.render(request, child, name, loader),
+        "child": child,
+        "etag": etag,
+        "models": [model._meta.model_name for model in fragments.CARDS[name].models],
+        "url": reverse("dashboard:dashboard-child-card", args=[child.slug, name]),
+    }
+
+
 @register.inclusion_tag("cards/diaperchange_last.html", takes_context=True)
 def card_diaperchange_last(context, child):
     """
@@ -34,12 +113,7 @@ def card_diaperchange_last(context, child):
     :param child: an instance of the Child model.
     :returns: a dictionary with the most recent Diaper Change instance.
     """
-    instance = (
-        models.DiaperChange.objects.filter(child=child)
-        .filter(**_filter_data_age(context, "time"))
-        .order_by("-time")
-        .first()
-    )
+    instance = _latest(context, child, models.DiaperChange)
     empty = not instance
 
     return {
@@ -59,37 +133,26 @@ def card_diaperchange_types(context, child, date=None):
     :param date: a datetime object for the day to filter.
     :returns: a dictionary with the wet/solid/empty statistics.
     """
-    if not date:
-        date = timezone.localtime()
-    else:
-        date = timezone.datetime.combine(date, timezone.localtime().min.time())
-        date = timezone.make_aware(date)
-    max_date = (date + timezone.timedelta(days=1)).replace(hour=0, minute=0, second=0)
-    min_date = (max_date - timezone.timedelta(days=7)).replace(
-        hour=0, minute=0, second=0
+    day = _day(date)
+    days = totals.daily_aggregates(
+        models.DiaperChange.objects.filter(child=child),
+        "time",
+        {
+            "changes": Count("pk"),
+            "wet": Count("pk", filter=Q(wet=True)),
+            "solid": Count("pk", filter=Q(solid=True)),
+            "empty": Count("pk", filter=Q(wet=False, solid=False)),
+        },
+        dates=(day - timezone.timedelta(days=6), day),
     )
 
     stats = {}
     for x in range(7):
         stats[x] = {"wet": 0.0, "solid": 0.0, "empty": 0.0, "changes": 0.0}
-
-    instances = (
-        models.DiaperChange.objects.filter(child=child)
-        .filter(time__gt=min_date)
-        .filter(time__lt=max_date)
-        .order_by("-time")
-    )
-    empty = len(instances) == 0
-
-    for instance in instances:
-        key = (max_date - timezone.localtime(instance.time)).days
-        stats[key]["changes"] += 1
-        if instance.wet:
-            stats[key]["wet"] += 1
-        if instance.solid:
-            stats[key]["solid"] += 1
-        if not instance.wet and not instance.solid:
-            stats[key]["empty"] += 1
+    for date, counts in days.items():
+        stats[(day - date).days] = {
+            name: float(count) for name, count in counts.items()
+        }
 
     week_total = 0
     for key, info in stats.items():
@@ -104,7 +167,7 @@ def card_diaperchange_types(context, child, date=None):
         "type": "diaperchange",
         "stats": stats,
         "total": week_total,
-        "empty": empty,
+        "empty": not days,
         "hide_empty": _hide_empty(context),
     }
 
@@ -118,75 +181,42 @@ def card_breastfeeding(context, child, date=None):
     :param date: a datetime object for the day to filter.
     :returns: a dictionary with the statistics.
     """
-    if date:
-        date = timezone.datetime.combine(date, timezone.localtime().min.time())
-        date = timezone.make_aware(date)
-    else:
-        date = timezone.localtime()
-
-    max_date = (date + timezone.timedelta(days=1)).replace(hour=0, minute=0, second=0)
-    min_date = (max_date - timezone.timedelta(days=7)).replace(
-        hour=0, minute=0, second=0
-    )
-
-    instances = (
-        models.Feeding.objects.filter(child=child)
-        .filter(start__gt=min_date)
-        .filter(start__lt=max_date)
-        .filter(
-            method__in=(
-                FeedingMethod.LEFT_BREAST,
-                FeedingMethod.RIGHT_BREAST,
-                FeedingMethod.BOTH_BREASTS,
-            )
-        )
-        .order_by("-start")
+    day = _day(date)
+    left = (FeedingMethod.LEFT_BREAST, FeedingMethod.BOTH_BREASTS)
+    right = (FeedingMethod.RIGHT_BREAST, FeedingMethod.BOTH_BREASTS)
+    days = totals.daily_aggregates(
+        models.Feeding.objects.filter(child=child, method__in={*left, *right}),
+        "start",
+        {
+            "count": Count("pk"),
+            "duration": Sum("duration"),
+            "left_count": Count("pk", filter=Q(method__in=left)),
+            "right_count": Count("pk", filter=Q(method__in=right)),
+        },
+        dates=(day - timezone.timedelta(days=6), day),
     )
 
     # Create a `stats` dictionary, keyed by day for the past 7 days.
     stats = {}
     for x in range(7):
         stats[x] = {}
-
-    # Group feedings per day.
-    per_day = collections.defaultdict(list)
-    for instance in instances:
-        key = (max_date - timezone.localtime(instance.start)).days
-        per_day[key].append(instance)
-
-    # Go through each day, set the stats dictionary for that day.
-    for key, day_instances in per_day.items():
-        left_count = 0
-        right_count = 0
-        for instance in day_instances:
-            if instance.method in (
-                FeedingMethod.LEFT_BREAST,
-                FeedingMethod.BOTH_BREASTS,
-            ):
-                left_count += 1
-            if instance.method in (
-                FeedingMethod.RIGHT_BREAST,
-                FeedingMethod.BOTH_BREASTS,
-            ):
-                right_count += 1
-
-        stats[key] = {
-            "count": len(day_instances),
-            "duration": sum(
-                (instance.duration for instance in day_instances),
-                start=timezone.timedelta(),
-            ),
+    for date, counts in days.items():
+        left_count, right_count = counts["left_count"], counts["right_count"]
+        stats[(day - date).days] = {
+            "count": counts["count"],
+            "duration": counts["duration"] or timezone.timedelta(),
             "left_count": left_count,
             "right_count": right_count,
             "left_pct": 100 * left_count // (left_count + right_count),
             "right_pct": 100 * right_count // (left_count + right_count),
         }
 
+    total = sum(counts["count"] for counts in days.values())
     return {
         "type": "feeding",
         "stats": stats,
-        "total": len(instances),
-        "empty": len(instances) == 0,
+        "total": total,
+        "empty": total == 0,
         "hide_empty": _hide_empty(context),
     }
 
@@ -204,36 +234,32 @@ def card_feeding_recent(context, child, end_date=None):
 
     # push end_date to very end of that day
     end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=9999)
-    # we need a datetime to use the range helper in the model
-    start_date = end_date - timezone.timedelta(
-        days=8
-    )  # end of the -8th day so we get the FULL 7th day
+    # the 7 days before as well
+    dates = ((end_date - timezone.timedelta(days=7)).date(), end_date.date())
 
-    instances = models.Feeding.objects.filter(child=child).filter(
-        start__range=[start_date, end_date]
+    day_totals = totals.daily_totals(
+        models.Feeding.objects.filter(child=child),
+        sums={"amount": Sum("amount"), "amounts": Count("amount")},
+        dates=dates,
     )
 
     # prepare the result list for the last 7 days
-    dates = [end_date - timezone.timedelta(days=i) for i in range(8)]
-    results = [{"date": d, "total": 0, "count": 0, "has_amount": False} for d in dates]
-
-    # do one pass over the data and add it to the appropriate day
-    for instance in instances:
-        # convert to local tz and push feed_date to end so we're comparing apples to apples for the date
-        feed_date = timezone.localtime(instance.end).replace(
-            hour=23, minute=59, second=59, microsecond=9999
+    results = []
+    for i in range(8):
+        day = day_totals[(end_date - timezone.timedelta(days=i)).date()]
+        results.append(
+            {
+                "date": end_date - timezone.timedelta(days=i),
+                "total": day["amount"] or 0,
+                "count": day["entries"],
+                "has_amount": bool(day["amounts"]),
+            }
         )
-        idx = (end_date - feed_date).days
-        result = results[idx]
-        if instance.amount is not None:
-            result["total"] += instance.amount
-            result["has_amount"] = True
-        result["count"] += 1
 
     return {
         "feedings": results,
         "type": "feeding",
-        "empty": len(instances) == 0,
+        "empty": not any(result["count"] for result in results),
         "hide_empty": _hide_empty(context),
     }
 
@@ -245,12 +271,7 @@ def card_feeding_last(context, child):
     :param child: an instance of the Child model.
     :returns: a dictionary with the most recent Feeding instance.
     """
-    instance = (
-        models.Feeding.objects.filter(child=child)
-        .filter(**_filter_data_age(context))
-        .order_by("-end")
-        .first()
-    )
+    instance = _latest(context, child, models.Feeding)
     empty = not instance
 
     return {
@@ -292,12 +313,7 @@ def card_pumping_last(context, child):
     :param child: an instance of the Child model.
     :returns: a dictionary with the most recent Pumping instance.
     """
-    instance = (
-        models.Pumping.objects.filter(child=child)
-        .filter(**_filter_data_age(context))
-        .order_by("-end")
-        .first()
-    )
+    instance = _latest(context, child, models.Pumping)
     empty = not instance
 
     return {
@@ -315,12 +331,7 @@ def card_sleep_last(context, child):
     :param child: an instance of the Child model.
     :returns: a dictionary with the most recent Sleep instance.
     """
-    instance = (
-        models.Sleep.objects.filter(child=child)
-        .filter(**_filter_data_age(context))
-        .order_by("-end")
-        .first()
-    )
+    instance = _latest(context, child, models.Sleep)
     empty = not instance
 
     return {
@@ -344,58 +355,32 @@ def card_sleep_recent(context, child, end_date=None):
 
     # push end_date to very end of that day
     end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=9999)
-    # we need a datetime to use the range helper in the model
-    start_date = end_date - timezone.timedelta(
-        days=8
-    )  # end of the -8th day so we get the FULL 7th day
-
-    instances = models.Sleep.objects.filter(child=child).filter(
-        start__range=[start_date, end_date]
-    ) | models.Sleep.objects.filter(child=child).filter(
-        end__range=[start_date, end_date]
+    # the 7 days before as well
+    dates = ((end_date - timezone.timedelta(days=7)).date(), end_date.date())
+
+    day_totals = totals.daily_totals(
+        models.Sleep.objects.filter(child=child),
+        dates=dates,
     )
 
-    # prepare the result list for the last 7 days
-    dates = [end_date - timezone.timedelta(days=i) for i in range(8)]
-    results = [{"date": d, "total": timezone.timedelta(), "count": 0} for d in dates]
-
-    # do one pass over the data and add it to the appropriate day
-    for instance in instances:
-        # convert to local tz and push feed_date to end so we're comparing apples to apples for the date
-        start = timezone.localtime(instance.start)
-        end = timezone.localtime(instance.end)
-        sleep_start_date = start.replace(
-            hour=23, minute=59, second=59, microsecond=9999
+    # prepare the result list for the last 7 days, with only the PORTION of
+    # each sleep that is a part of the day (e.g. starts sleep at 7PM and
+    # finishes at 7AM = 5 hrs yesterday 7 hrs today)
+    results = []
+    for i in range(8):
+        day = day_totals[(end_date - timezone.timedelta(days=i)).date()]
+        results.append(
+            {
+                "date": end_date - timezone.timedelta(days=i),
+                "total": day["duration"],
+                "count": day["count"],
+            }
         )
-        sleep_end_date = end.replace(hour=23, minute=59, second=59, microsecond=9999)
-        start_idx = (end_date - sleep_start_date).days
-        end_idx = (end_date - sleep_end_date).days
-        # this is more complicated than feedings because we only want to capture the PORTION of sleep
-        # that is a part of this day (e.g. starts sleep at 7PM and finished at 7AM = 5 hrs yesterday 7 hrs today)
-        # (Assuming you have a unicorn sleeper. Congratulations)
-        if start_idx == end_idx:  # if we're in the same day it's simple
-            result = results[start_idx]
-            result["total"] += end - start
-            result["count"] += 1
-        else:  # otherwise we need to split the time up
-            midnight = end.replace(hour=0, minute=0, second=0)
-
-            if 0 <= start_idx < len(results):
-                result = results[start_idx]
-                # only the portion that is today
-                result["total"] += midnight - start
-                result["count"] += 1
-
-            if 0 <= end_idx < len(results):
-                result = results[end_idx]
-                # only the portion that is tomorrow
-                result["total"] += end - midnight
-                result["count"] += 1
 
     return {
         "sleeps": results,
         "type": "sleep",
-        "empty": len(instances) == 0,
+        "empty": not any(result["count"] for result in results),
         "hide_empty": _hide_empty(context),
     }
 
@@ -409,20 +394,18 @@ def card_sleep_naps_day(context, child, date=None):
     :param date: a Date object for the day to filter.
     :returns: a dictionary of nap data statistics.
     """
-    if not date:
-        date = timezone.localtime().date()
-    instances = models.Sleep.objects.filter(child=child, nap=True).filter(
-        start__year=date.year, start__month=date.month, start__day=date.day
-    ) | models.Sleep.objects.filter(child=child, nap=True).filter(
-        end__year=date.year, end__month=date.month, end__day=date.day
+    start, end = totals.day_bounds(_day(date), _day(date))
+    naps = (
+        models.Sleep.objects.filter(child=child, nap=True)
+        .filter(Q(start__gte=start, start__lt=end) | Q(end__gte=start, end__lt=end))
+        .aggregate(count=Count("pk"), total=Sum("duration"))
     )
-    empty = len(instances) == 0
 
     return {
         "type": "sleep",
-        "total": instances.aggregate(Sum("duration"))["duration__sum"],
-        "count": len(instances),
-        "empty": empty,
+        "total": naps["total"],
+        "count": naps["count"],
+        "empty": naps["count"] == 0,
         "hide_empty": _hide_empty(context),
     }
 
@@ -537,6 +520,31 @@ def card_statistics(context, child):
     return {"stats": stats, "empty": empty, "hide_empty": _hide_empty(context)}
 
 
+def _interval_statistics(child, activity, timespans):
+    """
+    Fill in average time between entries for each timespan from rollups.
+    :param child: an instance of the Child model.
+    :param activity: a RollupActivity value.
+    :param timespans: a list of dictionaries with a "start" datetime (or None).
+    :returns: the updated list of timespans or False if there are no entries.
+    """
+    lifetime = rollups.totals(child, activity)
+    if not lifetime["count"]:
+        return False
+
+    for timespan in timespans:
+        if timespan["start"] is None:
+            totals = lifetime
+        else:
+            totals = rollups.totals(child, activity, timespan["start"])
+        timespan["btwn_total"] = totals["gap_total"]
+        timespan["btwn_count"] = totals["gap_count"]
+        timespan["btwn_average"] = 0.0
+        if timespan["btwn_count"] > 0:
+            timespan["btwn_average"] = timespan["btwn_total"] / timespan["btwn_count"]
+    return timespans
+
+
 def _diaperchange_statistics(child):
     """
     Averaged Diaper Change data.
@@ -557,31 +565,7 @@ def _diaperchange_statistics(child):
             "title": _("Diaper change frequency"),
         },
     ]
-    for timespan in changes:
-        timespan["btwn_total"] = timezone.timedelta(0)
-        timespan["btwn_count"] = 0
-        timespan["btwn_average"] = 0.0
-
-    instances = models.DiaperChange.objects.filter(child=child).order_by("time")
-    if len(instances) == 0:
-        return False
-    last_instance = None
-
-    for instance in instances:
-        if last_instance:
-            for timespan in changes:
-                last_time = timezone.localtime(last_instance.time)
-                if timespan["start"] is None or last_time > timespan["start"]:
-                    timespan["btwn_total"] += (
-                        timezone.localtime(instance.time) - last_time
-                    )
-                    timespan["btwn_count"] += 1
-        last_instance = instance
-
-    for timespan in changes:
-        if timespan["btwn_count"] > 0:
-            timespan["btwn_average"] = timespan["btwn_total"] / timespan["btwn_count"]
-    return changes
+    return _interval_statistics(child, RollupActivity.DIAPER_CHANGE, changes)
 
 
 def _feeding_statistics(child):
@@ -604,31 +588,7 @@ def _feeding_statistics(child):
             "title": _("Feeding frequency"),
         },
     ]
-    for timespan in feedings:
-        timespan["btwn_total"] = timezone.timedelta(0)
-        timespan["btwn_count"] = 0
-        timespan["btwn_average"] = 0.0
-
-    instances = models.Feeding.objects.filter(child=child).order_by("start")
-    if len(instances) == 0:
-        return False
-    last_instance = None
-
-    for instance in instances:
-        if last_instance:
-            for timespan in feedings:
-                start = timezone.localtime(instance.start)
-                last_start = timezone.localtime(last_instance.start)
-                last_end = timezone.localtime(last_instance.end)
-                if timespan["start"] is None or last_start > timespan["start"]:
-                    timespan["btwn_total"] += start - last_end
-                    timespan["btwn_count"] += 1
-        last_instance = instance
-
-    for timespan in feedings:
-        if timespan["btwn_count"] > 0:
-            timespan["btwn_average"] = timespan["btwn_total"] / timespan["btwn_count"]
-    return feedings
+    return _interval_statistics(child, RollupActivity.FEEDING, feedings)
 
 
 def _nap_statistics(child):
@@ -637,28 +597,26 @@ def _nap_statistics(child):
     :param child: an instance of the Child model.
     :returns: a dictionary of statistics.
     """
-    instances = models.Sleep.objects.filter(child=child, nap=True).order_by("start")
-    if len(instances) == 0:
+    totals = rollups.totals(child, RollupActivity.NAP)
+    if totals["count"] == 0:
         return False
-    naps = {
-        "total": instances.aggregate(Sum("duration"))["duration__sum"],
-        "count": instances.count(),
-        "average": 0.0,
-        "avg_per_day": 0.0,
+    days = totals["days"]
+    if timezone.get_current_timezone_name() != timezone.get_default_timezone_name():
+        # Rollups are dated in the default time zone, naps are counted per
+        # day of the user's time zone.
+        days = (
+            models.Sleep.objects.filter(child=child, nap=True)
+            .annotate(date=TruncDate("start"))
+            .values("date")
+            .distinct()
+            .count()
+        )
+    return {
+        "total": totals["duration_total"],
+        "count": totals["count"],
+        "average": totals["duration_total"] / totals["count"],
+        "avg_per_day": totals["count"] / days,
     }
-    if naps["count"] > 0:
-        naps["average"] = naps["total"] / naps["count"]
-
-    naps_avg = (
-        instances.annotate(date=TruncDate("start"))
-        .values("date")
-        .annotate(naps_count=Count("id"))
-        .order_by()
-        .aggregate(Avg("naps_count"))
-    )
-    naps["avg_per_day"] = naps_avg["naps_count__avg"]
-
-    return naps
 
 
 def _sleep_statistics(child):
@@ -667,29 +625,18 @@ def _sleep_statistics(child):
     :param child: an instance of the Child model.
     :returns: a dictionary of statistics.
     """
-    instances = models.Sleep.objects.filter(child=child).order_by("start")
-    if len(instances) == 0:
+    totals = rollups.totals(child, RollupActivity.SLEEP)
+    if totals["count"] == 0:
         return False
 
     sleep = {
-        "total": instances.aggregate(Sum("duration"))["duration__sum"],
-        "count": instances.count(),
-        "average": 0.0,
-        "btwn_total": timezone.timedelta(0),
-        "btwn_count": instances.count() - 1,
+        "total": totals["duration_total"],
+        "count": totals["count"],
+        "average": totals["duration_total"] / totals["count"],
+        "btwn_total": totals["gap_total"],
+        "btwn_count": totals["gap_count"],
         "btwn_average": 0.0,
     }
-
-    last_instance = None
-    for instance in instances:
-        if last_instance:
-            start = timezone.localtime(instance.start)
-            last_end = timezone.localtime(last_instance.end)
-            sleep["btwn_total"] += start - last_end
-        last_instance = instance
-
-    if sleep["count"] > 0:
-        sleep["average"] = sleep["total"] / sleep["count"]
     if sleep["btwn_count"] > 0:
         sleep["btwn_average"] = sleep["btwn_total"] / sleep["btwn_count"]
 
@@ -819,12 +766,7 @@ def card_tummytime_last(context, child):
     :param child: an instance of the Child model.
     :returns: a dictionary with the most recent Tummy Time instance.
     """
-    instance = (
-        models.TummyTime.objects.filter(child=child)
-        .filter(**_filter_data_age(context))
-        .order_by("-end")
-        .first()
-    )
+    instance = _latest(context, child, models.TummyTime)
     empty = not instance
 
     return {
@@ -850,9 +792,12 @@ def card_tummytime_day(context, child, date=None):
     ).order_by("-end")
     empty = len(instances) == 0
 
-    stats = {"total": timezone.timedelta(seconds=0), "count": instances.count()}
-    for instance in instances:
-        stats["total"] += timezone.timedelta(seconds=instance.duration.seconds)
+    if isinstance(date, timezone.datetime):
+        date = date.date()
+    day = totals.daily_totals(
+        models.TummyTime.objects.filter(child=child), dates=(date, date)
+    )[date]
+    stats = {"total": day["duration"], "count": day["entries"]}
 
     return {
         "type": "tummytime",
@@ -864,45 +809,54 @@ def card_tummytime_day(context, child, date=None):
     }
 
 
-def _medication_pending(child):
+def _medication_pending(child, active=None):
     """
     Build a list of pending medication schedule items whose next dose is
     due today or is already overdue.
 
-    For every active schedule we find the most recent dose and compute the
-    next due time via ``MedicationSchedule.next_due_time()``.  For daily and
-    weekly schedules the model method uses a 12-hour buffer so that a late
-    dose given just after midnight is correctly attributed to the *previous*
-    day's schedule rather than suppressing the real next-day dose.
+    Active schedules store their next due time (see ``core.schedules``),
+    computed by ``MedicationSchedule.next_due_time()`` from their last dose
+    in the default time zone, and it is computed again for users in other
+    time zones.
+    For daily and weekly schedules the model method uses a 12-hour buffer so
+    that a late dose given just after midnight is correctly attributed to
+    the *previous* day's schedule rather than suppressing the real next-day
+    dose.  First doses due "now" have no stored due time and are computed.
 
     Interval schedules are always shown (with their computed next-due time)
     regardless of date.
 
     Shared by card_medication_last and medication_overdue_alert.
+    :param child: an instance of the Child model.
+    :param active: the child's active MedicationSchedule instances, if
+                   already loaded.
     """
     now = timezone.localtime()
     today = now.date()
     pending = []
+    # Stored due times are in the default time zone, see ``core.schedules``.
+    stored = timezone.get_current_timezone_name() == (
+        timezone.get_default_timezone_name()
+    )
 
-    for schedule in models.MedicationSchedule.objects.filter(child=child, active=True):
+    if active is None:
+        active = schedules.active([child.id])
+    for schedule in active:
         # Quick filter: skip weekly schedules with no days configured.
         if schedule.frequency == MedicationFrequency.WEEKLY:
             if not schedule.get_scheduled_days():
                 continue
 
-        last = (
-            models.Medication.objects.filter(medication_schedule=schedule, child=child)
-            .order_by("-time")
-            .first()
+        due = (stored and schedule.next_due_at) or schedule.next_due_time(
+            schedule.last_given_at
         )
-
-        due = schedule.next_due_time(last.time if last else None)
+        due = due.astimezone(now.tzinfo)
 
         if schedule.frequency == MedicationFrequency.INTERVAL:
             # Interval schedules always show with their next due time.
             # "has_specific_time" is true only when there is a previous dose
             # to measure the interval from.  The very first dose is "due now".
-            has_specific_time = last is not None
+            has_specific_time = schedule.last_given_at is not None
         else:
             # Daily / weekly: only show if the next dose falls today or earlier.
             if due.date() > today:
@@ -938,7 +892,7 @@ def card_medication_last(context, child):
         .first()
     )
     empty = not instance
-    pending = _medication_pending(child)
+    pending = _medication_pending(child, _active_schedules(context, child))
 
     return {
         "type": "medication",
@@ -949,15 +903,15 @@ def card_medication_last(context, child):
     }
 
 
-@register.inclusion_tag("cards/medication_overdue_alert.html")
-def medication_overdue_alert(child):
+@register.inclusion_tag("cards/medication_overdue_alert.html", takes_context=True)
+def medication_overdue_alert(context, child):
     """
     Alert banner for overdue medications, shown above dashboard cards.
     Uses the shared _expiry_alert.html template via the wrapper.
     :param child: an instance of the Child model.
     :returns: a dictionary for the shared _expiry_alert.html template.
     """
-    pending = _medication_pending(child)
+    pending = _medication_pending(child, _active_schedules(context, child))
     overdue = [item for item in pending if item["overdue"]]
     if not overdue:
         return {"items": []}
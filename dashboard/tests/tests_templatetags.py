@@ -6,8 +6,8 @@ from django.test import TestCase
 from django.utils import timezone
 
 from babybuddy.models import Settings
-from core import models
-from core.choices import MedicationFrequency
+from core import models, rollups
+from core.choices import MedicationFrequency, RollupActivity
 from dashboard.templatetags import cards
 
 from unittest import mock
@@ -159,6 +159,24 @@ class TemplateTagsTestCase(TestCase):
         }
         self.assertEqual(data["stats"], stats)
 
+    def test_card_breastfeeding(self):
+        data = cards.card_breastfeeding(self.context, self.child, self.date)
+        self.assertEqual(data["type"], "feeding")
+        self.assertFalse(data["empty"])
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(
+            data["stats"][0],
+            {
+                "count": 2,
+                "duration": timezone.timedelta(hours=1),
+                "left_count": 1,
+                "right_count": 1,
+                "left_pct": 50,
+                "right_pct": 50,
+            },
+        )
+        self.assertEqual([data["stats"][x] for x in range(1, 7)], [{}] * 6)
+
     def test_card_feeding_recent(self):
         data = cards.card_feeding_recent(self.context, self.child, self.date)
 
@@ -309,6 +327,34 @@ class TemplateTagsTestCase(TestCase):
         self.assertFalse(data["empty"])
         self.assertFalse(data["hide_empty"])
 
+    def test_nap_statistics_time_zone(self):
+        child = models.Child.objects.create(
+            first_name="Nap", last_name="Child", birth_date=datetime.date(2024, 1, 1)
+        )
+        # Both naps are on 2024-01-01 in New York, on two days in UTC.
+        for hour in (23, 25):
+            start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+            start += datetime.timedelta(hours=hour)
+            models.Sleep.objects.create(
+                child=child,
+                start=start,
+                end=start + datetime.timedelta(hours=1),
+                nap=True,
+            )
+        with timezone.override("UTC"):
+            self.assertEqual(cards._nap_statistics(child)["avg_per_day"], 1.0)
+        with timezone.override("America/New_York"):
+            self.assertEqual(cards._nap_statistics(child)["avg_per_day"], 2.0)
+
+    def test_interval_statistics_lifetime(self):
+        timespans = [{"start": timezone.now()}, {"start": None}]
+        with mock.patch(
+            "dashboard.templatetags.cards.rollups.totals", wraps=rollups.totals
+        ) as totals:
+            cards._interval_statistics(self.child, RollupActivity.FEEDING, timespans)
+        # The lifetime totals are read once.
+        self.assertEqual(totals.call_count, 2)
+
     def test_card_timer_list(self):
         user = get_user_model().objects.first()
         child = models.Child.objects.first()
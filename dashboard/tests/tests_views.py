@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
+import datetime
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.test import Client as HttpClient
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
 
 from faker import Faker
 
-from core.models import Child
+from django.utils import timezone
+
+from core.models import Child, Feeding
+from dashboard import fragments
 
 
 class ViewsTestCase(TestCase):
@@ -50,3 +57,85 @@ class ViewsTestCase(TestCase):
         )
         page = self.c.get("/dashboard/")
         self.assertEqual(page.status_code, 200)
+
+    def test_dashboard_card(self):
+        child = Child.objects.create(
+            first_name="First", last_name="Child", birth_date="2000-01-01"
+        )
+        page = self.c.get("/children/{}/dashboard/".format(child.slug))
+        url = "/children/{}/dashboard/cards/feeding-recent/".format(child.slug)
+        self.assertContains(page, 'data-card-url="{}"'.format(url))
+        for name in fragments.CARDS:
+            self.assertContains(page, "/dashboard/cards/{}/".format(name))
+
+        page = self.c.get(url)
+        self.assertEqual(page.status_code, 200)
+        self.assertContains(page, "card-feeding")
+        self.assertEqual(page.headers["Cache-Control"], "private, no-cache")
+        etag = page.headers["ETag"]
+
+        # Unchanged cards are not rendered.
+        with CaptureQueriesContext(connection) as context:
+            page = self.c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(page.status_code, 304)
+        self.assertFalse(
+            [q for q in context.captured_queries if '"core_feeding"' in q["sql"]]
+        )
+
+        end = timezone.localtime()
+        Feeding.objects.create(
+            child=child,
+            start=end - datetime.timedelta(minutes=15),
+            end=end,
+            type="formula",
+            method="bottle",
+            amount=2,
+        )
+        page = self.c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(page.status_code, 200)
+        self.assertNotEqual(page.headers["ETag"], etag)
+
+        page = self.c.get("/children/{}/dashboard/cards/nope/".format(child.slug))
+        self.assertEqual(page.status_code, 404)
+
+    def _create_children(self, count):
+        end = timezone.localtime()
+        first = Child.objects.count()
+        for i in range(first, first + count):
+            child = Child.objects.create(
+                first_name="Child", last_name=str(i), birth_date="2000-01-01"
+            )
+            Feeding.objects.create(
+                child=child,
+                start=end - datetime.timedelta(minutes=15),
+                end=end,
+                type="formula",
+                method="bottle",
+            )
+
+    def _dashboard_queries(self):
+        # The database cache writes missing keys one by one.
+        self.c.get("/dashboard/")
+        with CaptureQueriesContext(connection) as context:
+            page = self.c.get("/dashboard/")
+        self.assertEqual(page.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_dashboard_queries(self):
+        # Cards of all children are loaded together.
+        self._create_children(2)
+        queries = self._dashboard_queries()
+        self._create_children(4)
+        self.assertEqual(self._dashboard_queries(), queries)
+
+        # Cards are shown with the ETags of the cards' own views.
+        child = Child.objects.first()
+        page = self.c.get("/dashboard/")
+        url = "/children/{}/dashboard/cards/feeding-last/".format(child.slug)
+        card = self.c.get(url)
+        self.assertContains(
+            page,
+            'data-card-url="{}"\n     data-card-etag="{}"'.format(
+                url, card.headers["ETag"].replace('"', "&quot;")
+            ),
+        )
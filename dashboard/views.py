@@ -1,16 +1,22 @@
 # -*- coding: utf-8 -*-
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django.views.generic.base import TemplateView
 from django.views.generic.detail import DetailView
 
 from babybuddy.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from core.models import Child
 
+from . import fragments
+from .loader import DashboardLoader
+
 
 class Dashboard(LoginRequiredMixin, TemplateView):
     # TODO: Use .card-deck in this template once BS4 is finalized.
     template_name = "dashboard/dashboard.html"
+    # Cards shown for every child.
+    cards = ["feeding-last", "diaperchange-last", "sleep-last"]
 
     # Show the overall dashboard or a child dashboard if one Child instance.
     def get(self, request, *args, **kwargs):
@@ -28,6 +34,8 @@ class Dashboard(LoginRequiredMixin, TemplateView):
         context["objects"] = Child.objects.all().order_by(
             "last_name", "first_name", "id"
         )
+        context["cards"] = self.cards
+        context["dashboard_loader"] = DashboardLoader(context["objects"], self.cards)
         return context
 
 
@@ -35,3 +43,37 @@ class ChildDashboard(PermissionRequiredMixin, DetailView):
     model = Child
     permission_required = ("core.view_child",)
     template_name = "dashboard/child.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["dashboard_loader"] = DashboardLoader([self.object], fragments.CARDS)
+        return context
+
+
+class ChildDashboardCard(PermissionRequiredMixin, DetailView):
+    """
+    A card of the child dashboard as an HTML fragment, answered with 304 Not
+    Modified while the card's data is unchanged (see `fragments`).
+    """
+
+    model = Child
+    permission_required = ("core.view_child",)
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if response.has_header("ETag"):
+            # Cards may be stored as long as they are revalidated.
+            response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    def get(self, request, *args, **kwargs):
+        name = kwargs["card"]
+        if name not in fragments.CARDS:
+            raise Http404
+        self.object = self.get_object()
+        etag = fragments.get_etag(request, self.object, name)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(fragments.render(request, self.object, name))
+        response.headers["ETag"] = etag
+        return response
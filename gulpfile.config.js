@@ -72,7 +72,11 @@ const config = {
     ignore: ["babybuddy.scss"],
   },
   testsConfig: {
-    isolated: ["babybuddy.tests.tests_views.ViewsTestCase.test_password_reset"],
+    isolated: [
+      "babybuddy.tests.tests_views.ViewsTestCase.test_password_reset",
+      "reports.tests.tests_pool.RenderPoolTestCase.test_run",
+      "reports.tests.tests_pool.RenderPoolTestCase.test_timeout",
+    ],
   },
   watchConfig: {
     scriptsGlob: ["*/static_src/js/**/*.js", "!babybuddy/static/js/"],
@@ -316,6 +316,10 @@ gulp.task("collectstatic", function (cb) {
   spawn("uv", command, { stdio: "inherit" }).on("exit", cb);
 });
 
+gulp.task("benchmark", () => {
+  return _runInUv(["python", "manage.py", "benchmark"]);
+});
+
 gulp.task("compilemessages", () => {
   return _runInUv(["python", "manage.py", "compilemessages"]);
 });
@@ -5,7 +5,6 @@ import atexit
 import logging
 import os
 
-import paho.mqtt.client as paho_mqtt
 from django.db import close_old_connections
 
 from .utils import get_mqtt_settings, get_topic_prefix
@@ -35,6 +34,9 @@ class MqttClient:
         if self._started:
             return
 
+        # paho is only imported by processes connecting to a broker.
+        import paho.mqtt.client as paho_mqtt
+
         s = get_mqtt_settings()
         prefix = get_topic_prefix()
         client_id = f"babybuddy_{os.getpid()}"
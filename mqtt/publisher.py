@@ -4,6 +4,10 @@
 import json
 import logging
 
+from django.conf import settings
+from django.db import transaction
+
+from core import changes, latest
 from core.models import (
     BMI,
     Child,
@@ -43,6 +47,7 @@ from .serializers import (
 )
 from .stats import compute_stats
 from .utils import get_mqtt_settings, get_topic_prefix
+from .worker import publish_worker
 
 logger = logging.getLogger(__name__)
 
@@ -84,24 +89,6 @@ MODEL_SERIALIZER_MAP = {
     Weight: MqttWeightSerializer,
 }
 
-# Ordering field used to find the latest entry for each model.
-MODEL_ORDER_FIELD = {
-    BMI: "-date",
-    DiaperChange: "-time",
-    Feeding: "-end",
-    HeadCircumference: "-date",
-    Height: "-date",
-    Medication: "-time",
-    Note: "-time",
-    Pumping: "-end",
-    Sleep: "-end",
-    Temperature: "-time",
-    Timer: "-start",
-    TummyTime: "-end",
-    Weight: "-date",
-}
-
-
 # ------------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------------
@@ -163,30 +150,27 @@ def on_model_save(sender, instance, created, **kwargs):
         return
 
     child = _get_child(instance)
-    if child is None:
-        return
-
-    prefix = get_topic_prefix()
-    model_key = MODEL_TOPIC_MAP.get(sender)
-    if model_key is None:
+    if child is None or sender not in MODEL_TOPIC_MAP:
         return
 
-    # For MedicationSchedule, publish the full list of active schedules.
-    if sender is MedicationSchedule:
-        _publish_medication_schedules(child, mqtt_client, prefix)
+    # The child an entry was moved from no longer has it.
+    previous_ids = set()
+    if sender is not Child:
+        previous_ids = changes.get_child_ids(instance) - {child.id}
+
+    if settings.MQTT_PUBLISH["ASYNC"]:
+        # Wait for the commit so the worker reads the saved data.
+        transaction.on_commit(lambda: publish_worker.enqueue(child.id, sender, created))
+        for child_id in previous_ids:
+            transaction.on_commit(
+                lambda child_id=child_id: publish_worker.enqueue(child_id, sender)
+            )
     else:
-        payload = _serialize(sender, instance, child)
-        topic = f"{prefix}/{child.slug}/{model_key}/state"
-        mqtt_client.publish(topic, json.dumps(payload, default=str))
-
-    # Child creation triggers discovery for new child.
-    if sender is Child and created:
-        try:
-            publish_child_discovery(child)
-        except Exception:
-            logger.exception("Error publishing discovery for new child %s", child.slug)
-
-    _publish_stats(child)
+        # This handler may run before the one invalidating cached entries.
+        latest.invalidate([child.id, *previous_ids], [sender])
+        publish_child_state(child, [sender], created)
+        for previous in Child.objects.filter(id__in=previous_ids):
+            publish_child_state(previous, [sender])
 
 
 def on_model_delete(sender, instance, **kwargs):
@@ -195,29 +179,80 @@ def on_model_delete(sender, instance, **kwargs):
         return
 
     child = _get_child(instance)
-    if child is None:
-        return
-
-    prefix = get_topic_prefix()
-    model_key = MODEL_TOPIC_MAP.get(sender)
-    if model_key is None:
+    if child is None or sender not in MODEL_TOPIC_MAP:
         return
 
-    if sender is MedicationSchedule:
-        _publish_medication_schedules(child, mqtt_client, prefix)
-    elif sender is Child:
+    if sender is Child:
         # Remove discovery configs by publishing empty payloads.
         try:
             remove_child_discovery(child)
         except Exception:
             logger.exception("Error removing discovery for child %s", child.slug)
         return  # No stats to publish for a deleted child.
+
+    if settings.MQTT_PUBLISH["ASYNC"]:
+        transaction.on_commit(lambda: publish_worker.enqueue(child.id, sender))
     else:
-        order_field = MODEL_ORDER_FIELD.get(sender, "-id")
-        latest = sender.objects.filter(child=child).order_by(order_field).first()
-        payload = _serialize(sender, latest, child) if latest else None
-        topic = f"{prefix}/{child.slug}/{model_key}/state"
-        mqtt_client.publish(topic, json.dumps(payload, default=str))
+        # This handler may run before the one invalidating cached entries.
+        latest.invalidate([child.id], [sender])
+        publish_child_state(child, [sender])
+
+
+def on_bulk_save(sender, child_ids, **kwargs):
+    """Publish updated state once per child after entries are saved in bulk."""
+    if not _ensure_client() or sender not in MODEL_TOPIC_MAP:
+        return
+
+    if settings.MQTT_PUBLISH["ASYNC"]:
+        for child_id in child_ids:
+            transaction.on_commit(
+                lambda child_id=child_id: publish_worker.enqueue(child_id, sender)
+            )
+    else:
+        for child in Child.objects.filter(id__in=child_ids):
+            publish_child_state(child, [sender])
+
+
+# ------------------------------------------------------------------
+# Child state
+# ------------------------------------------------------------------
+
+
+def publish_child_state(child, model_classes, created=False):
+    """Publish the current state of *model_classes* for *child*, then its stats.
+
+    Event models publish their latest entry (or null), medication schedules
+    the list of active schedules and the child itself its own details (and
+    discovery configs when *created*).
+    """
+    prefix = get_topic_prefix()
+    event_models = [model for model in model_classes if model in latest.LATEST_FIELDS]
+    entries = latest.get_child_latest(child, event_models) if event_models else {}
+
+    for model_class in model_classes:
+        model_key = MODEL_TOPIC_MAP[model_class]
+        if model_class is MedicationSchedule:
+            _publish_medication_schedules(child, mqtt_client, prefix)
+            continue
+
+        if model_class is Child:
+            payload = _serialize(Child, child, child)
+        else:
+            entry = entries[model_class]
+            payload = _serialize(model_class, entry, child) if entry else None
+        mqtt_client.publish(
+            f"{prefix}/{child.slug}/{model_key}/state",
+            json.dumps(payload, default=str),
+        )
+
+        # Child creation triggers discovery for new child.
+        if model_class is Child and created:
+            try:
+                publish_child_discovery(child)
+            except Exception:
+                logger.exception(
+                    "Error publishing discovery for new child %s", child.slug
+                )
 
     _publish_stats(child)
 
@@ -242,7 +277,9 @@ def publish_all_state():
     """
     prefix = get_topic_prefix()
 
-    for child in Child.objects.all():
+    children = list(Child.objects.all())
+    latest_entries = latest.get_latest(children)
+    for child in children:
         # Child info
         payload = _serialize(Child, child, child)
         mqtt_client.publish(
@@ -255,11 +292,8 @@ def publish_all_state():
             if model_class in (Child, MedicationSchedule):
                 continue  # handled separately
 
-            order_field = MODEL_ORDER_FIELD.get(model_class, "-id")
-            latest = (
-                model_class.objects.filter(child=child).order_by(order_field).first()
-            )
-            payload = _serialize(model_class, latest, child) if latest else None
+            entry = latest_entries[child.id][model_class]
+            payload = _serialize(model_class, entry, child) if entry else None
             mqtt_client.publish(
                 f"{prefix}/{child.slug}/{topic_key}/state",
                 json.dumps(payload, default=str),
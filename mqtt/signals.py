@@ -2,11 +2,13 @@
 """Connect Django signals for MQTT publishing.
 
 Importing this module (done in ``MqttConfig.ready()``) wires up
-``post_save`` and ``post_delete`` for every tracked core model.
+``post_save`` and ``post_delete`` for every tracked core model, after the
+handlers invalidating cached stats so published stats are up to date.
 """
 
 from django.db.models.signals import post_delete, post_save
 
+from core.bulk import post_bulk_save
 from core.models import (
     BMI,
     Child,
@@ -25,7 +27,8 @@ from core.models import (
     Weight,
 )
 
-from .publisher import on_model_delete, on_model_save
+from . import stats
+from .publisher import on_bulk_save, on_model_delete, on_model_save
 
 TRACKED_MODELS = [
     BMI,
@@ -45,6 +48,18 @@ TRACKED_MODELS = [
     Weight,
 ]
 
+for _model in stats.STATS_MODELS:
+    post_save.connect(
+        stats.on_post_save,
+        sender=_model,
+        dispatch_uid=f"mqtt_stats_save_{_model.__name__}",
+    )
+    post_delete.connect(
+        stats.on_post_delete,
+        sender=_model,
+        dispatch_uid=f"mqtt_stats_delete_{_model.__name__}",
+    )
+
 for _model in TRACKED_MODELS:
     post_save.connect(
         on_model_save, sender=_model, dispatch_uid=f"mqtt_save_{_model.__name__}"
@@ -52,3 +67,6 @@ for _model in TRACKED_MODELS:
     post_delete.connect(
         on_model_delete, sender=_model, dispatch_uid=f"mqtt_delete_{_model.__name__}"
     )
+
+post_bulk_save.connect(stats.on_bulk_save, dispatch_uid="mqtt_stats_bulk_save")
+post_bulk_save.connect(on_bulk_save, dispatch_uid="mqtt_bulk_save")
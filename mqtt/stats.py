@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 """Computed daily aggregate statistics for MQTT publishing."""
 
+import datetime
 import logging
 
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
 from django.utils import timezone
 
+from core import changes, schedules
 from core.models import (
+    Child,
     DiaperChange,
     Feeding,
     Medication,
@@ -15,62 +21,164 @@ from core.models import (
 
 logger = logging.getLogger(__name__)
 
+# Models the stats are computed from (all of them with previous values, see
+# `core.changes`).
+STATS_MODELS = [DiaperChange, Feeding, Medication, MedicationSchedule, Sleep]
+
+CACHE_KEY = "mqtt.stats.{}"
+CACHE_TIMEOUT = 60
+
 
 def compute_stats(child):
     """Return a dict of daily stats for *child*, suitable for JSON encoding.
 
     Published to ``<prefix>/<child_slug>/stats/state``.
     """
-    today = timezone.localdate()
     now = timezone.now()
+    data = _get_data(child)
+    totals = data["totals"]
 
-    feedings_today = Feeding.objects.filter(child=child, start__date=today).count()
-
-    diaper_changes_today = DiaperChange.objects.filter(
-        child=child, time__date=today
-    ).count()
-
-    sleep_entries = Sleep.objects.filter(child=child, end__date=today)
-    sleep_total = sum(
-        (s.duration.total_seconds() / 60 for s in sleep_entries if s.duration),
-        0,
-    )
-
-    last_feeding = Feeding.objects.filter(child=child).order_by("-end").first()
-    last_diaper = DiaperChange.objects.filter(child=child).order_by("-time").first()
-
-    overdue_names = []
-    for schedule in MedicationSchedule.objects.filter(child=child, active=True):
-        try:
-            # Look up the most recent dose so next_due_time() correctly
-            # accounts for doses already given today.
-            last_dose = (
-                Medication.objects.filter(medication_schedule=schedule, child=child)
-                .order_by("-time")
-                .first()
-            )
-            due = schedule.next_due_time(last_dose.time if last_dose else None)
-            if due and due < now:
-                overdue_names.append(schedule.name)
-        except Exception:
-            logger.exception(
-                "Error computing next_due_time for schedule %s", schedule.id
-            )
+    overdue_names = [name for name, due in data["due_times"] if due < now]
 
+    last_feeding_end = totals["last_feeding_end"]
+    last_diaper_time = totals["last_diaper_time"]
+    sleep_total = totals["sleep_total_today"]
     return {
-        "feedings_today": feedings_today,
-        "diaper_changes_today": diaper_changes_today,
-        "sleep_total_today_minutes": round(sleep_total, 1),
+        "feedings_today": totals["feedings_today"] or 0,
+        "diaper_changes_today": totals["diaper_changes_today"] or 0,
+        "sleep_total_today_minutes": round(
+            sleep_total.total_seconds() / 60 if sleep_total else 0, 1
+        ),
         "last_feeding_minutes_ago": (
-            round((now - last_feeding.end).total_seconds() / 60)
-            if last_feeding and last_feeding.end
+            round((now - last_feeding_end).total_seconds() / 60)
+            if last_feeding_end
             else None
         ),
         "last_diaper_change_minutes_ago": (
-            round((now - last_diaper.time).total_seconds() / 60)
-            if last_diaper
+            round((now - last_diaper_time).total_seconds() / 60)
+            if last_diaper_time
             else None
         ),
         "medications_overdue": overdue_names,
         "medications_overdue_count": len(overdue_names),
     }
+
+
+def invalidate(child_ids):
+    """
+    Remove cached stats data for children.
+    :param child_ids: ids of Child instances (`None` values are ignored).
+    """
+    keys = [CACHE_KEY.format(child_id) for child_id in child_ids if child_id]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _get_data(child):
+    """
+    Get the data stats are computed from, cached per child and timezone.
+
+    Only stored values are cached, so values relative to the current time are
+    always computed fresh.
+    """
+    today = timezone.localdate()
+    tz_name = timezone.get_current_timezone_name()
+    key = CACHE_KEY.format(child.id)
+    cached = cache.get(key) or {}
+    if tz_name in cached and cached[tz_name]["date"] == today:
+        return cached[tz_name]
+
+    data = {
+        "date": today,
+        "totals": _totals(child, today),
+        "due_times": _due_times(child),
+    }
+    cached[tz_name] = data
+    cache.set(key, cached, CACHE_TIMEOUT)
+    return data
+
+
+def _child_aggregate(model, aggregate, **filters):
+    """
+    Get a subquery of an aggregate over a model's entries for a child.
+    :param model: the entry model.
+    :param aggregate: the aggregate expression.
+    :param filters: lookups limiting the entries, e.g. to a day. They go in
+                    the subquery's WHERE clause so the (child, time) indexes
+                    bound the rows scanned.
+    :returns: a Subquery of the aggregate value.
+    """
+    return Subquery(
+        model.objects.filter(child=OuterRef("pk"), **filters)
+        .order_by()
+        .values("child")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+
+
+def _totals(child, today):
+    """Get the daily totals and last entry times of a child in one query."""
+    tz = timezone.get_current_timezone()
+    day_start = timezone.make_aware(
+        datetime.datetime.combine(today, datetime.time.min), tz
+    )
+    day_end = timezone.make_aware(
+        datetime.datetime.combine(
+            today + datetime.timedelta(days=1), datetime.time.min
+        ),
+        tz,
+    )
+    return (
+        Child.objects.filter(pk=child.pk)
+        .annotate(
+            feedings_today=_child_aggregate(
+                Feeding, Count("id"), start__gte=day_start, start__lt=day_end
+            ),
+            last_feeding_end=_child_aggregate(Feeding, Max("end")),
+            diaper_changes_today=_child_aggregate(
+                DiaperChange, Count("id"), time__gte=day_start, time__lt=day_end
+            ),
+            last_diaper_time=_child_aggregate(DiaperChange, Max("time")),
+            sleep_total_today=_child_aggregate(
+                Sleep, Sum("duration"), end__gte=day_start, end__lt=day_end
+            ),
+        )
+        .values(
+            "feedings_today",
+            "last_feeding_end",
+            "diaper_changes_today",
+            "last_diaper_time",
+            "sleep_total_today",
+        )
+        .get()
+    )
+
+
+def _due_times(child):
+    """
+    Get the names and next due times of the active schedules of a child with
+    a due time (see `core.schedules`), in the order they become overdue.
+    """
+    return list(
+        schedules.active([child.id])
+        .filter(next_due_at__isnull=False)
+        .order_by("next_due_at")
+        .values_list("name", "next_due_at")
+    )
+
+
+def on_post_save(sender, instance, **kwargs):
+    # Entries moved to another child change the stats of both children.
+    invalidate(changes.get_child_ids(instance))
+
+
+def on_post_delete(sender, instance, **kwargs):
+    invalidate([instance.child_id])
+
+
+def on_bulk_save(sender, child_ids, **kwargs):
+    invalidate(child_ids)
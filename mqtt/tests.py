@@ -11,15 +11,19 @@ import json
 from unittest.mock import MagicMock, patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from core import bulk, schedules
 from core.models import (
     Child,
     DiaperChange,
     Feeding,
     Medication,
     MedicationSchedule,
+    Sleep,
     Temperature,
     Timer,
 )
@@ -50,6 +54,7 @@ from mqtt.serializers import (
     MqttTimerSerializer,
 )
 from mqtt.stats import compute_stats
+from mqtt.worker import PublishWorker
 
 
 def _create_child(first_name="Leo", last_name="Test"):
@@ -218,6 +223,111 @@ class ComputeStatsTests(TestCase):
             self.assertIn("Vitamin D", stats["medications_overdue"])
             self.assertGreaterEqual(stats["medications_overdue_count"], 1)
 
+    def test_sleep_total_summed(self):
+        now = timezone.localtime()
+        # Keep both entries within today.
+        end = max(now, now.replace(hour=2, minute=0, second=0, microsecond=0))
+        for minutes in (30, 45):
+            Sleep.objects.create(
+                child=self.child,
+                start=end - datetime.timedelta(minutes=minutes),
+                end=end,
+                nap=False,
+            )
+            end -= datetime.timedelta(minutes=minutes)
+        stats = compute_stats(self.child)
+        self.assertEqual(stats["sleep_total_today_minutes"], 75)
+
+    def test_totals_bounded_to_today(self):
+        yesterday = timezone.now() - datetime.timedelta(days=2)
+        Feeding.objects.create(
+            child=self.child,
+            start=yesterday,
+            end=yesterday + datetime.timedelta(minutes=20),
+            type=FeedingType.FORMULA,
+            method=FeedingMethod.BOTTLE,
+        )
+        DiaperChange.objects.create(
+            child=self.child, time=yesterday, wet=True, solid=False
+        )
+        with CaptureQueriesContext(connection) as context:
+            stats = compute_stats(self.child)
+        self.assertEqual(stats["feedings_today"], 0)
+        self.assertEqual(stats["diaper_changes_today"], 0)
+        self.assertIsNotNone(stats["last_feeding_minutes_ago"])
+        # The day bounds limit the rows the subqueries read instead of only
+        # filtering their aggregates.
+        sql = next(
+            q["sql"] for q in context.captured_queries if "core_feeding" in q["sql"]
+        )
+        self.assertNotIn("FILTER", sql)
+        self.assertNotIn("CASE WHEN", sql)
+        self.assertIn('AND U0."start" >=', sql)
+        self.assertIn('AND U0."time" >=', sql)
+        self.assertIn('AND U0."end" >=', sql)
+
+    def test_query_count(self):
+        schedule = MedicationSchedule.objects.create(
+            child=self.child,
+            name="Vitamin D",
+            frequency=MedicationFrequency.DAILY,
+            schedule_time=datetime.time(8, 0),
+            active=True,
+        )
+        MedicationSchedule.objects.create(
+            child=self.child,
+            name="Iron",
+            frequency=MedicationFrequency.INTERVAL,
+            interval_hours=8,
+            active=True,
+        )
+        Medication.objects.create(
+            child=self.child,
+            medication_schedule=schedule,
+            name="Vitamin D",
+            time=timezone.now(),
+        )
+
+        # Totals, then due times of schedules (after the daily rollover).
+        schedules.rollover()
+        with CaptureQueriesContext(connection) as context:
+            compute_stats(self.child)
+        queries = [q for q in context.captured_queries if '"core_' in q["sql"]]
+        self.assertEqual(len(queries), 2)
+
+        # Cached data only needs the cache lookup.
+        with self.assertNumQueries(1):
+            compute_stats(self.child)
+
+    def test_cache_invalidated_on_change(self):
+        self.assertEqual(compute_stats(self.child)["diaper_changes_today"], 0)
+        change = DiaperChange.objects.create(
+            child=self.child, time=timezone.now(), wet=True, solid=False
+        )
+        self.assertEqual(compute_stats(self.child)["diaper_changes_today"], 1)
+        change.delete()
+        self.assertEqual(compute_stats(self.child)["diaper_changes_today"], 0)
+
+    def test_cache_invalidated_on_move(self):
+        schedule = MedicationSchedule.objects.create(
+            child=self.child,
+            name="Iron",
+            frequency=MedicationFrequency.INTERVAL,
+            interval_hours=8,
+        )
+        Medication.objects.create(
+            child=self.child,
+            medication_schedule=schedule,
+            name="Iron",
+            time=timezone.now() - datetime.timedelta(hours=10),
+        )
+        self.assertEqual(compute_stats(self.child)["medications_overdue"], ["Iron"])
+
+        # The schedule is no longer overdue for the child it was moved from.
+        schedule.child = _create_child(first_name="Mia")
+        schedule.save()
+        self.assertEqual(compute_stats(self.child)["medications_overdue"], [])
+
 
 # -----------------------------------------------------------------------
 # Test signal handlers / publisher (mocked MQTT client)
@@ -360,6 +470,28 @@ class PublisherSignalTests(TestCase):
         else:
             self.fail("medication_schedule/state topic not published")
 
+    @patch("mqtt.publisher.publish_child_state")
+    @patch("mqtt.publisher.get_mqtt_settings")
+    @patch("mqtt.publisher.mqtt_client")
+    def test_moved_schedule_publishes_both_children(
+        self, mock_client, mock_get_settings, mock_publish
+    ):
+        mock_client.is_started = True
+        mock_get_settings.return_value = _mock_mqtt_settings(enabled=True)
+        other_child = _create_child(first_name="Mia")
+        schedule = MedicationSchedule.objects.create(
+            child=self.child, name="Iron", interval_hours=8
+        )
+        mock_publish.reset_mock()
+
+        schedule.child = other_child
+        schedule.save()
+
+        self.assertEqual(
+            sorted(call[0][0].id for call in mock_publish.call_args_list),
+            sorted([self.child.id, other_child.id]),
+        )
+
     @patch("mqtt.publisher.get_topic_prefix", return_value="babybuddy")
     @patch("mqtt.publisher.get_mqtt_settings")
     @patch("mqtt.publisher.mqtt_client")
@@ -383,6 +515,26 @@ class PublisherSignalTests(TestCase):
         # No publish calls should have been made
         mock_client.publish.assert_not_called()
 
+    @patch("mqtt.publisher.publish_child_state")
+    @patch("mqtt.publisher.get_mqtt_settings")
+    @patch("mqtt.publisher.mqtt_client")
+    def test_bulk_save_publishes_once_per_child(
+        self, mock_client, mock_get_settings, mock_publish
+    ):
+        mock_client.is_started = True
+        mock_get_settings.return_value = _mock_mqtt_settings(enabled=True)
+        other_child = _create_child(first_name="Mia")
+        mock_publish.reset_mock()
+
+        bulk.entries_changed(DiaperChange, [self.child.id, other_child.id])
+
+        self.assertEqual(
+            sorted(call[0][0].id for call in mock_publish.call_args_list),
+            sorted([self.child.id, other_child.id]),
+        )
+        for call in mock_publish.call_args_list:
+            self.assertEqual(call[0][1], [DiaperChange])
+
     @patch("mqtt.publisher.get_topic_prefix", return_value="babybuddy")
     @patch("mqtt.publisher.get_mqtt_settings")
     @patch("mqtt.publisher.mqtt_client")
@@ -495,6 +647,91 @@ class PublishAllStateTests(TestCase):
         self.assertIn(f"babybuddy/{slug}/stats/state", call_topics)
 
 
+# -----------------------------------------------------------------------
+# Test the publish worker
+# -----------------------------------------------------------------------
+
+
+@patch("mqtt.worker.close_old_connections")
+class PublishWorkerTests(TestCase):
+    def setUp(self):
+        self.child = _create_child()
+        self.other_child = _create_child(first_name="Mia")
+
+    @patch("mqtt.publisher.publish_child_state")
+    def test_markers_coalesced_per_child(self, mock_publish, mock_close):
+        worker = PublishWorker()
+        worker._publish(
+            [
+                (self.child.id, Feeding, True),
+                (self.child.id, Feeding, False),
+                (self.child.id, DiaperChange, False),
+                (self.other_child.id, Temperature, False),
+            ]
+        )
+
+        calls = {call[0][0]: call[0][1:] for call in mock_publish.call_args_list}
+        self.assertEqual(len(mock_publish.call_args_list), 2)
+        self.assertEqual(calls[self.child], ({Feeding, DiaperChange}, True))
+        self.assertEqual(calls[self.other_child], ({Temperature}, False))
+        self.assertEqual(worker.metrics()["coalesced"], 2)
+        self.assertEqual(worker.metrics()["batches"], 1)
+
+    @patch("mqtt.publisher.publish_child_state")
+    @patch("mqtt.publisher.publish_all_state")
+    @patch("mqtt.discovery.publish_all_discovery")
+    def test_overflow_republishes_everything(
+        self, mock_discovery, mock_all_state, mock_publish, mock_close
+    ):
+        worker = PublishWorker(queue_size=2)
+        with patch.object(worker, "start"):
+            for model in (Feeding, DiaperChange, Temperature):
+                worker.enqueue(self.child.id, model)
+        metrics = worker.metrics()
+        self.assertEqual(metrics["enqueued"], 2)
+        self.assertEqual(metrics["dropped"], 1)
+        self.assertEqual(metrics["depth"], 2)
+
+        worker._publish([worker._queue.get_nowait() for _ in range(2)])
+        mock_discovery.assert_called_once_with()
+        mock_all_state.assert_called_once_with()
+        mock_publish.assert_not_called()
+
+        # Later batches only publish dirty children again.
+        worker._publish([(self.child.id, Feeding, False)])
+        mock_all_state.assert_called_once_with()
+        mock_publish.assert_called_once_with(self.child, {Feeding}, False)
+
+    def test_burst_published_in_one_batch(self, mock_close):
+        worker = PublishWorker(debounce=0.2)
+        with patch.object(worker, "_publish") as mock_publish:
+            for model in (Feeding, DiaperChange, Temperature):
+                worker.enqueue(self.child.id, model)
+            worker.flush()
+        mock_publish.assert_called_once()
+        self.assertEqual(len(mock_publish.call_args[0][0]), 3)
+
+    @override_settings(MQTT_PUBLISH={"ASYNC": True})
+    @patch("mqtt.publisher.publish_worker")
+    @patch("mqtt.publisher.get_mqtt_settings")
+    @patch("mqtt.publisher.mqtt_client")
+    def test_async_enqueues_on_commit(
+        self, mock_client, mock_get_settings, mock_worker, mock_close
+    ):
+        mock_client.is_started = True
+        mock_get_settings.return_value = _mock_mqtt_settings(enabled=True)
+
+        dc = DiaperChange.objects.create(
+            child=self.child, time=timezone.now(), wet=True, solid=False
+        )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            on_model_save(DiaperChange, dc, created=True)
+            mock_worker.enqueue.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        mock_worker.enqueue.assert_called_once_with(self.child.id, DiaperChange, True)
+        mock_client.publish.assert_not_called()
+
+
 # -----------------------------------------------------------------------
 # Test MQTT disabled
 # -----------------------------------------------------------------------
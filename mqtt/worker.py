@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Background worker that coalesces MQTT state publishes per child."""
+
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PublishWorker:
+    """Publish child state from a background thread.
+
+    Signal handlers enqueue ``(child id, model, created)`` markers.  The
+    worker collects markers until none arrived for ``debounce`` seconds (or
+    ``max_delay`` seconds passed since the first one), merges them per child
+    and publishes each dirty child's latest state and stats once.
+
+    The queue is bounded.  When it is full, markers are dropped instead of
+    blocking the request and the next batch republishes the full state of
+    every child (and discovery) so nothing is lost.
+    """
+
+    def __init__(self, queue_size=1000, debounce=0.5, max_delay=5.0):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._lock = threading.Lock()
+        self._thread = None
+        self._overflowed = False
+        self._metrics = {
+            "enqueued": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "batches": 0,
+            "max_depth": 0,
+            "last_batch_seconds": None,
+        }
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the worker thread if it is not running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="mqtt-publish-worker", daemon=True
+            )
+            self._thread.start()
+
+    def enqueue(self, child_id, model, created=False):
+        """Mark *model* as changed for a child without blocking."""
+        self.start()
+        try:
+            self._queue.put_nowait((child_id, model, created))
+        except queue.Full:
+            with self._lock:
+                first_drop = not self._overflowed
+                self._overflowed = True
+                self._metrics["dropped"] += 1
+            if first_drop:
+                logger.warning(
+                    "MQTT publish queue is full, the full state will be republished"
+                )
+            return
+        depth = self._queue.qsize()
+        with self._lock:
+            self._metrics["enqueued"] += 1
+            self._metrics["max_depth"] = max(self._metrics["max_depth"], depth)
+
+    def flush(self):
+        """Block until every enqueued marker has been published."""
+        self._queue.join()
+
+    def metrics(self):
+        """Return a snapshot of the queue and publishing counters."""
+        with self._lock:
+            return dict(self._metrics, depth=self._queue.qsize())
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            markers = [self._queue.get()]
+            deadline = time.monotonic() + self._max_delay
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    markers.append(
+                        self._queue.get(timeout=min(self._debounce, remaining))
+                    )
+                except queue.Empty:
+                    break
+
+            try:
+                self._publish(markers)
+            except Exception:
+                logger.exception("Error publishing MQTT state")
+            finally:
+                for _ in markers:
+                    self._queue.task_done()
+
+    def _publish(self, markers):
+        # Imported here as the publisher imports this module.
+        from core.models import Child
+
+        from .discovery import publish_all_discovery
+        from .publisher import publish_all_state, publish_child_state
+
+        with self._lock:
+            overflowed = self._overflowed
+            self._overflowed = False
+
+        dirty = {}
+        for child_id, model, created in markers:
+            models, was_created = dirty.get(child_id, (set(), False))
+            models.add(model)
+            dirty[child_id] = (models, was_created or created)
+
+        start = time.monotonic()
+        close_old_connections()
+        try:
+            if overflowed:
+                # Dropped markers may include new children, so republish
+                # everything as on (re)connect.
+                publish_all_discovery()
+                publish_all_state()
+            else:
+                for child in Child.objects.filter(id__in=dirty):
+                    models, created = dirty[child.id]
+                    publish_child_state(child, models, created)
+        finally:
+            close_old_connections()
+
+        with self._lock:
+            self._metrics["batches"] += 1
+            self._metrics["coalesced"] += len(markers) - len(dirty)
+            self._metrics["last_batch_seconds"] = time.monotonic() - start
+        logger.debug(
+            "Published MQTT state for %d children from %d changes",
+            len(dirty),
+            len(markers),
+        )
+
+
+# Module-level singleton used by the signal handlers.
+publish_worker = PublishWorker(
+    queue_size=settings.MQTT_PUBLISH["QUEUE_SIZE"],
+    debounce=settings.MQTT_PUBLISH["DEBOUNCE"],
+    max_delay=settings.MQTT_PUBLISH["MAX_DELAY"],
+)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Split time intervals in to segments of the local days they cover.
+
+Local midnights are computed once per day and intervals are assigned to days by
+bisecting them, instead of converting every interval to local time. Offsets
+are only looked up for the few segments on days with a daylight saving time
+change, so segment positions are wall clock times on every day.
+"""
+
+import datetime
+from bisect import bisect_right
+from collections import namedtuple
+
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+
+# A part of an interval within one day. `start` and `end` are wall clock
+# minutes since midnight, `duration` is the time elapsed between them and
+# `index` is the position of the interval the segment is a part of.
+Segment = namedtuple("Segment", ["start", "end", "duration", "index"])
+
+# A block of a stacked day: a segment, or a gap between segments (`None`),
+# from `start` to `end` minutes since midnight.
+Block = namedtuple("Block", ["start", "end", "segment"])
+
+
+def day_segments(intervals, tz=None):
+    """
+    Split intervals in to segments of the local days they cover.
+    :param intervals: a sequence of (start, end) tuples of UTC epoch seconds,
+                      sorted by start.
+    :param tz: the timezone of days (the current timezone if `None`).
+    :returns: a dict keyed by every date from the first to the last interval,
+              in order, of lists of Segment tuples.
+    """
+    if not intervals:
+        return {}
+    tz = tz or timezone.get_current_timezone()
+    first = datetime.datetime.fromtimestamp(intervals[0][0], tz).date()
+    last = datetime.datetime.fromtimestamp(max(end for _, end in intervals), tz)
+    days = [
+        first + datetime.timedelta(days=i) for i in range((last.date() - first).days)
+    ]
+    days.append(last.date())
+    midnights = [
+        timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), tz)
+        for day in days + [last.date() + datetime.timedelta(days=1)]
+    ]
+    bounds = [midnight.timestamp() for midnight in midnights]
+    offsets = [midnight.utcoffset() for midnight in midnights]
+
+    def minutes(epoch, i):
+        elapsed = (epoch - bounds[i]) / 60
+        if offsets[i] == offsets[i + 1]:
+            return elapsed
+        offset = datetime.datetime.fromtimestamp(epoch, tz).utcoffset() - offsets[i]
+        return elapsed + offset.total_seconds() / 60
+
+    segments = {day: [] for day in days}
+    for index, (start, end) in enumerate(intervals):
+        i = bisect_right(bounds, start) - 1
+        while True:
+            if end <= bounds[i + 1]:
+                segment_end, end_minutes = end, minutes(end, i)
+            else:
+                segment_end, end_minutes = bounds[i + 1], MINUTES_PER_DAY
+            segments[days[i]].append(
+                Segment(
+                    minutes(start, i),
+                    end_minutes,
+                    datetime.timedelta(seconds=segment_end - start),
+                    index,
+                )
+            )
+            if segment_end == end:
+                break
+            i += 1
+            start = bounds[i]
+    return segments
+
+
+def stack_days(segments):
+    """
+    Fill the time between the segments of each day with gaps.
+    :param segments: a dict of dates and segments, see `day_segments`.
+    :returns: a dict keyed by the same dates of lists of Block tuples
+              alternating between gaps and segments, starting with a gap.
+              Gaps last until the end of the day on all but the last day.
+    """
+    days = {}
+    last_day = next(reversed(segments), None)
+    for day, day_segments in segments.items():
+        blocks = []
+        previous_end = 0
+        for segment in day_segments:
+            start = max(segment.start, previous_end)
+            blocks.append(Block(previous_end, start, None))
+            blocks.append(Block(start, max(segment.end, start), segment))
+            previous_end = max(segment.end, start)
+        if blocks and day != last_day:
+            blocks.append(Block(previous_end, MINUTES_PER_DAY, None))
+        days[day] = blocks
+    return days
+
+
+def wall_time(day, minutes):
+    """
+    Get the local (naive) time of a position within a day.
+    :param day: a date.
+    :param minutes: wall clock minutes since midnight.
+    :returns: a datetime.
+    """
+    return datetime.datetime.combine(day, datetime.time.min) + datetime.timedelta(
+        minutes=minutes
+    )
@@ -9,6 +9,7 @@ from .feeding_intervals import feeding_intervals  # NOQA
 from .feeding_pattern import feeding_pattern  # NOQA
 from .head_circumference_change import head_circumference_change  # NOQA
 from .height_change import height_change  # NOQA
+from .medication_adherence import medication_adherence  # NOQA
 from .pumping_amounts import pumping_amounts  # NOQA
 from .sleep_pattern import sleep_pattern  # NOQA
 from .sleep_totals import sleep_totals  # NOQA
@@ -2,28 +2,27 @@
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
 from reports import utils
 
 
-def diaperchange_amounts(instances):
+def diaperchange_amounts(instances, bucket="day"):
     """
-    Create a graph showing daily diaper change amounts over time.
+    Create a graph showing diaper change amounts over time.
     :param instances: a QuerySet of DiaperChange instances.
-    :returns: a tuple of the graph's html and javascript.
+    :param bucket: a key of utils.BUCKETS to group entries by.
+    :returns: a dict of the graph's data and layout.
     """
     totals = {}
     for instance in instances:
         time_local = timezone.localtime(instance.time)
-        date = time_local.date()
+        date = utils.bucket_start(time_local.date(), bucket)
         if date not in totals.keys():
             totals[date] = 0
         totals[date] += instance.amount or 0
 
     amounts = [round(amount, 2) for amount in totals.values()]
-    trace = go.Bar(
+    trace = dict(
+        type="bar",
         name=_("Diaper change amount"),
         x=list(totals.keys()),
         y=amounts,
@@ -34,10 +33,8 @@ def diaperchange_amounts(instances):
 
     layout_args = utils.default_graph_layout_options()
     layout_args["title"] = "<b>" + _("Diaper Change Amounts") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Change amount")
+    layout_args["yaxis"]["title"]["text"] = _("Change amount")
 
-    fig = go.Figure({"data": [trace], "layout": go.Layout(**layout_args)})
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": [trace], "layout": layout_args}
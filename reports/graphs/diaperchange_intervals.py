@@ -1,94 +1,38 @@
 # -*- coding: utf-8 -*-
+from django.db.models import Q
 from django.utils.translation import gettext as _
-from django.utils.translation import get_language
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
-from core.utils import duration_parts
-
-from reports import utils
+from reports import intervals, utils
 
 
 def diaperchange_intervals(changes):
     """
-    Create a graph showing intervals of diaper changes.
+    Create a graph showing the average interval between diaper changes per
+    day.
     :param changes: a QuerySet of Diaper Change instances.
-    :returns: a tuple of the graph's html and javascript.
+    :returns: a dict of the graph's data and layout.
     """
-
-    changes = changes.order_by("time")
-    intervals = []
-    intervals_solid = []
-    intervals_wet = []
-    last_change = changes.first()
-    for change in changes[1:]:
-        interval = change.time - last_change.time
-        if interval.total_seconds() > 0:
-            intervals.append(interval)
-            if change.solid:
-                intervals_solid.append(interval)
-            if change.wet:
-                intervals_wet.append(interval)
-        last_change = change
-
-    trace_solid = go.Scatter(
-        name=_("Solid"),
-        line=dict(shape="spline"),
-        x=list(changes.values_list("time", flat=True))[1:],
-        y=[i.total_seconds() / 3600 for i in intervals_solid],
-        hoverinfo="text",
-        text=[_duration_string_hms(i) for i in intervals_solid],
+    days = intervals.daily_gaps(
+        changes,
+        "time",
+        {"solid": Q(solid=True), "wet": Q(wet=True), "total": None},
     )
 
-    trace_wet = go.Scatter(
-        name=_("Wet"),
-        line=dict(shape="spline"),
-        x=list(changes.values_list("time", flat=True))[1:],
-        y=[i.total_seconds() / 3600 for i in intervals_wet],
-        hoverinfo="text",
-        text=[_duration_string_hms(i) for i in intervals_wet],
-    )
-
-    trace_total = go.Scatter(
-        name=_("Total"),
-        line=dict(shape="spline"),
-        x=list(changes.values_list("time", flat=True))[1:],
-        y=[i.total_seconds() / 3600 for i in intervals],
-        hoverinfo="text",
-        text=[_duration_string_hms(i) for i in intervals],
-    )
+    trace_solid = utils.interval_trace(_("Solid"), days, "solid")
+    trace_wet = utils.interval_trace(_("Wet"), days, "wet")
+    trace_total = utils.interval_trace(_("Total"), days, "total")
 
     layout_args = utils.default_graph_layout_options()
     layout_args["barmode"] = "stack"
     layout_args["title"] = "<b>" + _("Diaper Change Intervals") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["type"] = "date"
     layout_args["xaxis"]["autorange"] = True
-    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace_total.x)
+    if trace_total["x"]:
+        layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(
+            trace_total["x"][::-1]
+        )
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Interval (hours)")
+    layout_args["yaxis"]["title"]["text"] = _("Interval (hours)")
 
-    fig = go.Figure(
-        {
-            "data": [trace_solid, trace_wet, trace_total],
-            "layout": go.Layout(**layout_args),
-        }
-    )
-    output = pio.to_html(
-        fig,
-        include_plotlyjs=False,
-        full_html=False,
-        config={"locale": get_language()},
-    )
-    return utils.split_graph_output(output)
-
-
-def _duration_string_hms(duration):
-    """
-    Format a duration string with hours, minutes and seconds. This is
-    intended to fit better in smaller spaces on a graph.
-    :returns: a string of the form Xm.
-    """
-    h, m, s = duration_parts(duration)
-    return "{}h{}m{}s".format(h, m, s)
+    return {"data": [trace_solid, trace_wet, trace_total], "layout": layout_args}
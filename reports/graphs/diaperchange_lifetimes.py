@@ -1,9 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
 from reports import utils
 
 
@@ -11,7 +8,7 @@ def diaperchange_lifetimes(changes):
     """
     Create a graph showing how long diapers last (time between changes).
     :param changes: a QuerySet of Diaper Change instances.
-    :returns: a tuple of the graph's html and javascript.
+    :returns: a dict of the graph's data and layout.
     """
     changes = changes.order_by("time")
     durations = []
@@ -22,7 +19,8 @@ def diaperchange_lifetimes(changes):
             durations.append(duration)
         last_change = change
 
-    trace = go.Box(
+    trace = dict(
+        type="box",
         y=[round(d.seconds / 3600, 2) for d in durations],
         name=_("Changes"),
         jitter=0.3,
@@ -33,10 +31,8 @@ def diaperchange_lifetimes(changes):
     layout_args = utils.default_graph_layout_options()
     layout_args["height"] = 800
     layout_args["title"] = "<b>" + _("Diaper Lifetimes") + "</b>"
-    layout_args["yaxis"]["title"] = _("Time between changes (hours)")
+    layout_args["yaxis"]["title"]["text"] = _("Time between changes (hours)")
     layout_args["yaxis"]["zeroline"] = False
     layout_args["yaxis"]["dtick"] = 1
 
-    fig = go.Figure({"data": [trace], "layout": go.Layout(**layout_args)})
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": [trace], "layout": layout_args}
@@ -1,23 +1,19 @@
 # -*- coding: utf-8 -*-
 from django.db.models import Count, Case, When
-from django.db.models.functions import TruncDate
 from django.utils.translation import gettext as _
-from django.utils.translation import get_language
-
-import plotly.graph_objs as go
-import plotly.io as pio
 
 from reports import utils
 
 
-def diaperchange_types(changes):
+def diaperchange_types(changes, bucket="day"):
     """
     Create a graph showing types of totals for diaper changes.
     :param changes: a QuerySet of Diaper Change instances.
-    :returns: a tuple of the graph's html and javascript.
+    :param bucket: a key of utils.BUCKETS to group entries by.
+    :returns: a dict of the graph's data and layout.
     """
     changes = (
-        changes.annotate(date=TruncDate("time"))
+        changes.annotate(date=utils.trunc_date("time", bucket))
         .values("date")
         .annotate(wet_count=Count(Case(When(wet=True, then=1))))
         .annotate(solid_count=Count(Case(When(solid=True, then=1))))
@@ -25,19 +21,22 @@ def diaperchange_types(changes):
         .order_by("-date")
     )
 
-    solid_trace = go.Scatter(
+    solid_trace = dict(
+        type="scatter",
         mode="markers",
         name=_("Solid"),
         x=list(changes.values_list("date", flat=True)),
         y=list(changes.values_list("solid_count", flat=True)),
     )
-    wet_trace = go.Scatter(
+    wet_trace = dict(
+        type="scatter",
         mode="markers",
         name=_("Wet"),
         x=list(changes.values_list("date", flat=True)),
         y=list(changes.values_list("wet_count", flat=True)),
     )
-    total_trace = go.Scatter(
+    total_trace = dict(
+        type="scatter",
         name=_("Total"),
         x=list(changes.values_list("date", flat=True)),
         y=list(changes.values_list("total", flat=True)),
@@ -46,23 +45,11 @@ def diaperchange_types(changes):
     layout_args = utils.default_graph_layout_options()
     layout_args["barmode"] = "stack"
     layout_args["title"] = "<b>" + _("Diaper Change Types") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["type"] = "date"
     layout_args["xaxis"]["autorange"] = True
-    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(total_trace.x)
+    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(total_trace["x"])
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Number of changes")
+    layout_args["yaxis"]["title"]["text"] = _("Number of changes")
 
-    fig = go.Figure(
-        {
-            "data": [solid_trace, wet_trace, total_trace],
-            "layout": go.Layout(**layout_args),
-        }
-    )
-    output = pio.to_html(
-        fig,
-        include_plotlyjs=False,
-        full_html=False,
-        config={"locale": get_language()},
-    )
-    return utils.split_graph_output(output)
+    return {"data": [solid_trace, wet_trace, total_trace], "layout": layout_args}
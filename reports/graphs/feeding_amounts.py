@@ -1,49 +1,45 @@
 # -*- coding: utf-8 -*-
-from django.utils import timezone
+from django.db.models import Q, Sum
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
-from reports import utils
+from core import totals
 from core.choices import FeedingType
+from reports import utils
 
 
-def feeding_amounts(instances):
+def feeding_amounts(instances, bucket="day"):
     """
-    Create a graph showing daily feeding amounts over time.
+    Create a graph showing feeding amounts over time.
     :param instances: a QuerySet of Feeding instances.
-    :returns: a tuple of the graph's html and javascript.
+    :param bucket: a key of utils.BUCKETS to group entries by.
+    :returns: a dict of the graph's data and layout.
     """
     feeding_types, feeding_types_desc = map(list, zip(*FeedingType.choices))
-    total_idx = len(feeding_types) + 1  # +1 for aggregate total
-    totals_list = list()
-    for i in range(total_idx):
-        totals_list.append({})
-    for instance in instances:
-        end = timezone.localtime(instance.end)
-        date = end.date()
-        if date not in totals_list[total_idx - 1].keys():
-            for item in totals_list:
-                item[date] = 0
-        feeding_idx = feeding_types.index(instance.type)
-        totals_list[feeding_idx][date] += instance.amount or 0
-        totals_list[total_idx - 1][date] += instance.amount or 0
-    zeros = [0 for a in totals_list[total_idx - 1].values()]
+    sums = {
+        feeding_type: Sum("amount", filter=Q(type=feeding_type))
+        for feeding_type in feeding_types
+    }
+    sums["total"] = Sum("amount")
+    buckets = utils.bucket_totals(totals.daily_totals(instances, sums=sums), bucket)
+    dates = list(buckets.keys())
+    zeros = [0 for date in dates]
 
     # sum each feeding type for graph
-    amounts_array = []
-    for i in range(total_idx):
-        amounts_array.append([round(a, 2) for a in totals_list[i].values()])
+    amounts_array = [
+        [round(total[name] or 0, 2) for total in buckets.values()]
+        for name in feeding_types + ["total"]
+    ]
+    total_idx = len(amounts_array)
 
     traces = []
     for i in range(total_idx - 1):
         for x in amounts_array[i]:
             if x != 0:  # Only include if it has non zero values
                 traces.append(
-                    go.Bar(
+                    dict(
+                        type="bar",
                         name=str(feeding_types_desc[i]),
-                        x=list(totals_list[total_idx - 1].keys()),
+                        x=dates,
                         y=amounts_array[i],
                         text=amounts_array[i],
                         hovertemplate=str(feeding_types_desc[i]),
@@ -52,9 +48,10 @@ def feeding_amounts(instances):
                 break
 
     traces.append(
-        go.Bar(
+        dict(
+            type="bar",
             name=_("Total"),
-            x=list(totals_list[total_idx - 1].keys()),
+            x=dates,
             y=zeros,
             hoverinfo="text",
             textposition="outside",
@@ -65,11 +62,9 @@ def feeding_amounts(instances):
 
     layout_args = utils.default_graph_layout_options()
     layout_args["title"] = "<b>" + _("Total Feeding Amount by Type") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Feeding amount")
+    layout_args["yaxis"]["title"]["text"] = _("Feeding amount")
 
-    fig = go.Figure({"data": traces, "layout": go.Layout(**layout_args)})
-    fig.update_layout(barmode="stack")
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    layout_args["barmode"] = "stack"
+    return {"data": traces, "layout": layout_args}
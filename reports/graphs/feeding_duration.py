@@ -1,18 +1,16 @@
 # -*- coding: utf-8 -*-
+import copy
 
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate
+from django.db.models import Sum
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
+from core import totals
 from core.utils import duration_parts
 
 from reports import utils
 
 
-def feeding_duration(instances):
+def feeding_duration(instances, bucket="day"):
     """
     Create a graph showing average duration of feeding instances over time.
 
@@ -21,55 +19,54 @@ def feeding_duration(instances):
     was equal to seven.
 
     :param instances: a QuerySet of Feeding instances.
-    :returns: a tuple of the graph's html and javascript.
+    :param bucket: a key of utils.BUCKETS to group entries by.
+    :returns: a dict of the graph's data and layout.
     """
-    totals = (
-        instances.annotate(date=TruncDate("start"))
-        .values("date")
-        .annotate(count=Count("id"))
-        .annotate(sum=Sum("duration"))
-        .order_by("-date")
+    buckets = utils.bucket_totals(
+        totals.daily_totals(
+            instances, sums={"feeding_duration": Sum("duration")}, anchor="start"
+        ),
+        bucket,
     )
+    buckets = {date: total for date, total in buckets.items() if total["entries"]}
 
     averages = []
-    for total in totals:
-        averages.append(total["sum"] / total["count"])
+    for total in buckets.values():
+        averages.append(total["feeding_duration"] / total["entries"])
 
-    trace_avg = go.Scatter(
+    trace_avg = dict(
+        type="scatter",
         name=_("Average duration"),
         line=dict(shape="spline"),
-        x=list(totals.values_list("date", flat=True)),
+        x=list(buckets.keys()),
         y=[td.seconds / 60 for td in averages],
         hoverinfo="text",
         text=[_duration_string_ms(td) for td in averages],
     )
-    trace_count = go.Scatter(
+    trace_count = dict(
+        type="scatter",
         name=_("Total feedings"),
         mode="markers",
-        x=list(totals.values_list("date", flat=True)),
-        y=list(totals.values_list("count", flat=True)),
+        x=list(buckets.keys()),
+        y=[total["entries"] for total in buckets.values()],
         yaxis="y2",
         hoverinfo="y",
     )
 
     layout_args = utils.default_graph_layout_options()
     layout_args["title"] = "<b>" + _("Average Feeding Durations") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["type"] = "date"
     layout_args["xaxis"]["autorange"] = True
-    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace_avg.x)
+    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace_avg["x"])
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Average duration (minutes)")
-    layout_args["yaxis2"] = dict(layout_args["yaxis"])
-    layout_args["yaxis2"]["title"] = _("Number of feedings")
+    layout_args["yaxis"]["title"]["text"] = _("Average duration (minutes)")
+    layout_args["yaxis2"] = copy.deepcopy(layout_args["yaxis"])
+    layout_args["yaxis2"]["title"]["text"] = _("Number of feedings")
     layout_args["yaxis2"]["overlaying"] = "y"
     layout_args["yaxis2"]["side"] = "right"
 
-    fig = go.Figure(
-        {"data": [trace_avg, trace_count], "layout": go.Layout(**layout_args)}
-    )
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": [trace_avg, trace_count], "layout": layout_args}
 
 
 def _duration_string_ms(duration):
@@ -1,60 +1,30 @@
 # -*- coding: utf-8 -*-
-from django.db.models import Count
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
-from core.utils import duration_parts
-
-from reports import utils
+from reports import intervals, utils
 
 
 def feeding_intervals(instances):
     """
-    Create a graph showing intervals of feeding instances over time.
+    Create a graph showing the average interval between feedings per day.
 
     :param instances: a QuerySet of Feeding instances.
-    :returns: a tuple of the graph's html and javascript.
+    :returns: a dict of the graph's data and layout.
     """
-    totals = instances.annotate(count=Count("id")).order_by("start")
+    days = intervals.daily_gaps(instances, "start")
 
-    intervals = []
-    last_feeding = totals.first()
-    for feeding in totals[1:]:
-        interval = feeding.start - last_feeding.start
-        if interval.total_seconds() > 0:
-            intervals.append(interval)
-        last_feeding = feeding
-
-    trace_avg = go.Scatter(
-        name=_("Interval"),
-        line=dict(shape="spline"),
-        x=list(totals.values_list("start", flat=True)),
-        y=[i.total_seconds() / 3600 for i in intervals],
-        hoverinfo="text",
-        text=[_duration_string_hms(i) for i in intervals],
-    )
+    trace_avg = utils.interval_trace(_("Interval"), days, "total")
 
     layout_args = utils.default_graph_layout_options()
     layout_args["title"] = "<b>" + _("Feeding intervals") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["type"] = "date"
     layout_args["xaxis"]["autorange"] = True
-    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace_avg.x)
+    if trace_avg["x"]:
+        layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(
+            trace_avg["x"][::-1]
+        )
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Feeding interval (hours)")
-
-    fig = go.Figure({"data": [trace_avg], "layout": go.Layout(**layout_args)})
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    layout_args["yaxis"]["title"]["text"] = _("Feeding interval (hours)")
 
-
-def _duration_string_hms(duration):
-    """
-    Format a duration string with hours, minutes and seconds. This is
-    intended to fit better in smaller spaces on a graph.
-    :returns: a string of the form Xm.
-    """
-    h, m, s = duration_parts(duration)
-    return "{}h{}m{}s".format(h, m, s)
+    return {"data": [trace_avg], "layout": layout_args}
@@ -1,9 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
 from reports import utils
 
 
@@ -11,24 +8,28 @@ def head_circumference_change(objects):
     """
     Create a graph showing head_circumference over time.
     :param objects: a QuerySet of Head Circumference instances.
-    :returns: a tuple of the graph's html and javascript.
+    :returns: a dict of the graph's data and layout.
     """
     objects = objects.order_by("-date")
 
-    trace = go.Scatter(
+    x, y = utils.downsample(
+        list(objects.values_list("date", flat=True)),
+        list(objects.values_list("head_circumference", flat=True)),
+    )
+
+    trace = dict(
+        type="scatter",
         name=_("Head Circumference"),
-        x=list(objects.values_list("date", flat=True)),
-        y=list(objects.values_list("head_circumference", flat=True)),
+        x=x,
+        y=y,
         fill="tozeroy",
     )
 
     layout_args = utils.default_graph_layout_options()
     layout_args["barmode"] = "stack"
     layout_args["title"] = "<b>" + _("Head Circumference") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Head Circumference")
+    layout_args["yaxis"]["title"]["text"] = _("Head Circumference")
 
-    fig = go.Figure({"data": [trace], "layout": go.Layout(**layout_args)})
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": [trace], "layout": layout_args}
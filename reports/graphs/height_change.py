@@ -3,21 +3,22 @@ from datetime import datetime, timedelta
 from django.utils.translation import gettext as _
 from django.db.models.manager import BaseManager
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
+from core.percentiles import PercentileCurves
 from reports import utils
 
 
 def height_change(
-    actual_heights: BaseManager, percentile_heights: BaseManager, birthday: datetime
+    actual_heights: BaseManager,
+    percentile_heights: PercentileCurves | None,
+    birthday: datetime,
 ):
     """
     Create a graph showing height over time.
     :param actual_heights: a QuerySet of Height instances.
-    :param percentile_heights: a QuerySet of Height Percentile instances.
+    :param percentile_heights: the height percentile curves of the child's sex
+                               (see `core.percentiles.get_curves`), or `None`.
     :param birthday: a datetime of the child's birthday
-    :returns: a tuple of the graph's html and javascript.
+    :returns: a dict of the graph's data and layout.
     """
     actual_heights = actual_heights.order_by("-date")
 
@@ -26,84 +27,39 @@ def height_change(
     )
     measured_heights = list(actual_heights.values_list("height", flat=True))
 
-    actual_heights_trace = go.Scatter(
+    trace_dates, trace_heights = utils.downsample(measuring_dates, measured_heights)
+    actual_heights_trace = dict(
+        type="scatter",
         name=_("Height"),
-        x=measuring_dates,
-        y=measured_heights,
+        x=trace_dates,
+        y=trace_heights,
         fill="tozeroy",
         mode="lines+markers",
     )
 
-    if percentile_heights:
-        dates = list(
-            map(
-                lambda timedelta: birthday + timedelta,
-                percentile_heights.values_list("age_in_days", flat=True),
-            )
-        )
-
-        # reduce percentile data xrange to end 1 day after last height measurement in for formatting purposes
-        # https://github.com/babybuddy/babybuddy/pull/708#discussion_r1332335789
-        last_date_for_percentiles = min(max(dates), max(measuring_dates))
-        dates = dates[: dates.index(last_date_for_percentiles) + 1]
-
-        percentile_height_3_trace = go.Scatter(
-            name=_("P3"),
-            x=dates,
-            y=list(percentile_heights.values_list("p3_height", flat=True)),
-            line={"color": "red"},
-        )
-        percentile_height_15_trace = go.Scatter(
-            name=_("P15"),
-            x=dates,
-            y=list(percentile_heights.values_list("p15_height", flat=True)),
-            line={"color": "orange"},
-        )
-        percentile_height_50_trace = go.Scatter(
-            name=_("P50"),
-            x=dates,
-            y=list(percentile_heights.values_list("p50_height", flat=True)),
-            line={"color": "green"},
-        )
-        percentile_height_85_trace = go.Scatter(
-            name=_("P85"),
-            x=dates,
-            y=list(percentile_heights.values_list("p85_height", flat=True)),
-            line={"color": "orange"},
-        )
-        percentile_height_97_trace = go.Scatter(
-            name=_("P97"),
-            x=dates,
-            y=list(percentile_heights.values_list("p97_height", flat=True)),
-            line={"color": "red"},
-        )
-
     data = [
         actual_heights_trace,
     ]
     layout_args = utils.default_graph_layout_options()
     layout_args["barmode"] = "stack"
     layout_args["title"] = "<b>" + _("Height") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Height")
+    layout_args["yaxis"]["title"]["text"] = _("Height")
     if percentile_heights:
+        actual_heights_trace["text"] = utils.percentile_labels(
+            percentile_heights, birthday, trace_dates, trace_heights
+        )
+        # reduce percentile data xrange to end 1 day after last height measurement in for formatting purposes
+        # https://github.com/babybuddy/babybuddy/pull/708#discussion_r1332335789
+        data.extend(
+            utils.percentile_traces(percentile_heights, birthday, max(measuring_dates))
+        )
         # zoom in on the relevant dates
         layout_args["xaxis"]["range"] = [
             birthday,
             max(measuring_dates) + timedelta(days=1),
         ]
         layout_args["yaxis"]["range"] = [0, max(measured_heights) * 1.5]
-        data.extend(
-            [
-                percentile_height_97_trace,
-                percentile_height_85_trace,
-                percentile_height_50_trace,
-                percentile_height_15_trace,
-                percentile_height_3_trace,
-            ]
-        )
 
-    fig = go.Figure({"data": data, "layout": go.Layout(**layout_args)})
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": data, "layout": layout_args}
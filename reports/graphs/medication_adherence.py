@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from reports import utils
+
+
+def medication_adherence(adherence, bucket="day"):
+    """
+    Create a graph showing doses taken on time, taken late (or early) and
+    missed for each day (or bucket).
+    :param adherence: a list of core.occurrences.Adherence instances.
+    :param bucket: a key of utils.BUCKETS to group doses by.
+    :returns: a dict of the graph's data and layout.
+    """
+    day_totals = {}
+    for schedule_adherence in adherence:
+        for occurrence in schedule_adherence.occurrences:
+            date = timezone.localtime(occurrence.time).date()
+            totals = day_totals.setdefault(date, {"on_time": 0, "late": 0, "missed": 0})
+            if occurrence.dose_time is None:
+                totals["missed"] += 1
+            elif occurrence.on_time:
+                totals["on_time"] += 1
+            else:
+                totals["late"] += 1
+    buckets = utils.bucket_totals(day_totals, bucket)
+
+    traces = [
+        dict(
+            type="bar",
+            name=name,
+            x=list(buckets.keys()),
+            y=[totals[key] for totals in buckets.values()],
+        )
+        for key, name in [
+            ("on_time", _("On time")),
+            ("late", _("Late or early")),
+            ("missed", _("Missed")),
+        ]
+    ]
+
+    layout_args = utils.default_graph_layout_options()
+    layout_args["barmode"] = "stack"
+    layout_args["title"] = "<b>" + _("Medication Adherence") + "</b>"
+    layout_args["xaxis"]["title"]["text"] = _("Date")
+    layout_args["xaxis"]["type"] = "date"
+    layout_args["xaxis"]["autorange"] = True
+    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(traces[0]["x"])
+    layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
+    layout_args["yaxis"]["title"]["text"] = _("Number of doses")
+
+    return {"data": traces, "layout": layout_args}
@@ -2,17 +2,15 @@
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
 from reports import utils
 
 
-def pumping_amounts(objects):
+def pumping_amounts(objects, bucket="day"):
     """
     Create a graph showing pumping amounts over time.
     :param instances: a QuerySet of Pumping instances.
-    :returns: a tuple of the graph's html and javascript.
+    :param bucket: a key of utils.BUCKETS to group entries by.
+    :returns: a dict of the graph's data and layout.
     """
     objects = objects.order_by("start")
 
@@ -21,7 +19,7 @@ def pumping_amounts(objects):
     date_totals = {}
     for object in objects:
         date_s = timezone.localtime(object.start)
-        date_s = str(date_s.date())
+        date_s = str(utils.bucket_start(date_s.date(), bucket))
         if curr_date != date_s:
             date_totals[date_s] = 0.0
             curr_date = date_s
@@ -32,7 +30,7 @@ def pumping_amounts(objects):
     index_x, index_y = 0, -1
     for object in objects:
         date_s = timezone.localtime(object.start)
-        date_s = str(date_s.date())
+        date_s = str(utils.bucket_start(date_s.date(), bucket))
         if date_s not in dates:
             dates.append(date_s)
             index_y += 1
@@ -45,7 +43,8 @@ def pumping_amounts(objects):
     traces = []
     for i in range(0, len(amounts)):
         traces.append(
-            go.Bar(
+            dict(
+                type="bar",
                 name="Amount",
                 x=dates,
                 y=amounts[i],
@@ -57,16 +56,15 @@ def pumping_amounts(objects):
 
     layout_args = utils.default_graph_layout_options()
     layout_args["title"] = "<b>" + _("Total Pumping Amount") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Pumping Amount")
+    layout_args["yaxis"]["title"]["text"] = _("Pumping Amount")
 
     total_labels = [
         {"x": x, "y": total * 1.1, "text": str(total), "showarrow": False}
         for x, total in zip(list(dates), date_totals.values())
     ]
 
-    fig = go.Figure({"data": traces, "layout": go.Layout(**layout_args)})
-    fig.update_layout(barmode="stack", annotations=total_labels)
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    layout_args["barmode"] = "stack"
+    layout_args["annotations"] = total_labels
+    return {"data": traces, "layout": layout_args}
@@ -1,71 +1,43 @@
 # -*- coding: utf-8 -*-
-from django.utils import timezone
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
+from core import totals
 from core.utils import duration_parts
 
 from reports import utils
 
 
-def sleep_totals(instances):
+def sleep_totals(instances, bucket="day"):
     """
-    Create a graph showing total time sleeping for each day.
+    Create a graph showing total time sleeping for each day (or bucket).
     :param instances: a QuerySet of Sleep instances.
-    :returns: a tuple of the graph's html and javascript.
+    :param bucket: a key of utils.BUCKETS to group entries by.
+    :returns: a dict of the graph's data and layout.
     """
-    totals = {}
-    for instance in instances:
-        start = timezone.localtime(instance.start)
-        end = timezone.localtime(instance.end)
-        if start.date() not in totals.keys():
-            totals[start.date()] = timezone.timedelta(seconds=0)
-        if end.date() not in totals.keys():
-            totals[end.date()] = timezone.timedelta(seconds=0)
-
-        # Account for dates crossing midnight.
-        if start.date() != end.date():
-            totals[start.date()] += (
-                end.replace(
-                    year=start.year,
-                    month=start.month,
-                    day=start.day,
-                    hour=23,
-                    minute=59,
-                    second=59,
-                )
-                - start
-            )
-            totals[end.date()] += end - start.replace(
-                year=end.year, month=end.month, day=end.day, hour=0, minute=0, second=0
-            )
-        else:
-            totals[start.date()] += instance.duration
+    buckets = utils.bucket_totals(totals.daily_totals(instances), bucket)
+    durations = [total["duration"] for total in buckets.values()]
 
-    trace = go.Bar(
+    trace = dict(
+        type="bar",
         name=_("Total sleep"),
-        x=list(totals.keys()),
-        y=[td.seconds / 3600 for td in totals.values()],
+        x=list(buckets.keys()),
+        y=[td.total_seconds() / 3600 for td in durations],
         hoverinfo="text",
         textposition="outside",
-        text=[_duration_string_short(td) for td in totals.values()],
+        text=[_duration_string_short(td) for td in durations],
     )
 
     layout_args = utils.default_graph_layout_options()
     layout_args["barmode"] = "stack"
     layout_args["title"] = "<b>" + _("Sleep Totals") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["type"] = "date"
     layout_args["xaxis"]["autorange"] = True
-    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace.x)
+    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace["x"])
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Hours of sleep")
+    layout_args["yaxis"]["title"]["text"] = _("Hours of sleep")
 
-    fig = go.Figure({"data": [trace], "layout": go.Layout(**layout_args)})
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": [trace], "layout": layout_args}
 
 
 def _duration_string_short(duration):
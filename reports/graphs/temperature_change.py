@@ -1,9 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.utils.translation import gettext as _
 
-import plotly.graph_objs as go
-import plotly.io as pio
-
 from reports import utils
 
 
@@ -11,26 +8,30 @@ def temperature_change(objects):
     """
     Create a graph showing temperature over time.
     :param objects: a QuerySet of Temperature instances.
-    :returns: a tuple of the graph's html and javascript.
+    :returns: a dict of the graph's data and layout.
     """
     objects = objects.order_by("-time")
 
-    trace = go.Scatter(
+    x, y = utils.downsample(
+        list(objects.values_list("time", flat=True)),
+        list(objects.values_list("temperature", flat=True)),
+    )
+
+    trace = dict(
+        type="scatter",
         name=_("Temperature"),
-        x=list(objects.values_list("time", flat=True)),
-        y=list(objects.values_list("temperature", flat=True)),
+        x=x,
+        y=y,
     )
 
     layout_args = utils.default_graph_layout_options()
     layout_args["barmode"] = "stack"
     layout_args["title"] = "<b>" + _("Temperature") + "</b>"
-    layout_args["xaxis"]["title"] = _("Time")
+    layout_args["xaxis"]["title"]["text"] = _("Time")
     layout_args["xaxis"]["type"] = "date"
     layout_args["xaxis"]["autorange"] = True
-    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace.x)
+    layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(trace["x"])
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_time()
-    layout_args["yaxis"]["title"] = _("Temperature")
+    layout_args["yaxis"]["title"]["text"] = _("Temperature")
 
-    fig = go.Figure({"data": [trace], "layout": go.Layout(**layout_args)})
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": [trace], "layout": layout_args}
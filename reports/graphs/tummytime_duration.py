@@ -1,71 +1,64 @@
 # -*- coding: utf-8 -*-
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate
-from django.utils.translation import gettext as _
+import copy
 
-import plotly.graph_objs as go
-import plotly.io as pio
+from django.utils.translation import gettext as _
 
+from core import totals
 from core.utils import duration_parts
 
 from reports import utils
 
 
-def tummytime_duration(instances):
+def tummytime_duration(instances, bucket="day"):
     """
-    Create a graph showing total duration of tummy time instances per day.
+    Create a graph showing total duration of tummy time instances per day (or
+    bucket).
 
     :param instances: a QuerySet of TummyTime instances.
-    :returns: a tuple of the graph's html and javascript.
+    :param bucket: a key of utils.BUCKETS to group entries by.
+    :returns: a dict of the graph's data and layout.
     """
-    totals = (
-        instances.annotate(date=TruncDate("start"))
-        .values("date")
-        .annotate(count=Count("id"))
-        .annotate(sum=Sum("duration"))
-        .order_by("-date")
-    )
+    buckets = utils.bucket_totals(totals.daily_totals(instances), bucket)
+    buckets = {date: total for date, total in buckets.items() if total["count"]}
 
     sums = []
-    for total in totals:
-        sums.append(total["sum"])
+    for total in buckets.values():
+        sums.append(total["duration"])
 
-    trace_avg = go.Bar(
+    trace_avg = dict(
+        type="bar",
         name=_("Total duration"),
-        x=list(totals.values_list("date", flat=True)),
-        y=[td.seconds / 60 for td in sums],
+        x=list(buckets.keys()),
+        y=[td.total_seconds() / 60 for td in sums],
         hoverinfo="text",
         text=[_duration_string_ms(td) for td in sums],
     )
-    trace_count = go.Scatter(
+    trace_count = dict(
+        type="scatter",
         name=_("Number of sessions"),
         mode="markers",
-        x=list(totals.values_list("date", flat=True)),
-        y=list(totals.values_list("count", flat=True)),
+        x=list(buckets.keys()),
+        y=[total["count"] for total in buckets.values()],
         yaxis="y2",
         hoverinfo="y",
     )
 
     layout_args = utils.default_graph_layout_options()
     layout_args["title"] = "<b>" + _("Total Tummy Time Durations") + "</b>"
-    layout_args["xaxis"]["title"] = _("Date")
+    layout_args["xaxis"]["title"]["text"] = _("Date")
     layout_args["xaxis"]["type"] = "date"
     layout_args["xaxis"]["autorange"] = True
     layout_args["xaxis"]["autorangeoptions"] = utils.autorangeoptions(
-        trace_avg.x, 35000000
+        trace_avg["x"], 35000000
     )
     layout_args["xaxis"]["rangeselector"] = utils.rangeselector_date()
-    layout_args["yaxis"]["title"] = _("Total duration (minutes)")
-    layout_args["yaxis2"] = dict(layout_args["yaxis"])
-    layout_args["yaxis2"]["title"] = _("Number of sessions")
+    layout_args["yaxis"]["title"]["text"] = _("Total duration (minutes)")
+    layout_args["yaxis2"] = copy.deepcopy(layout_args["yaxis"])
+    layout_args["yaxis2"]["title"]["text"] = _("Number of sessions")
     layout_args["yaxis2"]["overlaying"] = "y"
     layout_args["yaxis2"]["side"] = "right"
 
-    fig = go.Figure(
-        {"data": [trace_avg, trace_count], "layout": go.Layout(**layout_args)}
-    )
-    output = pio.to_html(fig, include_plotlyjs=False, full_html=False)
-    return utils.split_graph_output(output)
+    return {"data": [trace_avg, trace_count], "layout": layout_args}
 
 
 def _duration_string_ms(duration):
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Time between consecutive entries, summarized per day by the database.
+
+The time since the previous entry of the same child is computed with the
+`LAG` window function and grouped by the local date of each entry in an
+outer query, so only one row per day is read from the database.
+"""
+
+import datetime
+from collections import namedtuple
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import (
+    Case,
+    DateField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Lag, TruncDate
+from django.db.models.lookups import GreaterThan
+
+# The number and total duration of the gaps of a series on one day.
+Gaps = namedtuple("Gaps", ["count", "total"])
+
+# The gaps of each series (by name) ending on a date.
+DailyGaps = namedtuple("DailyGaps", ["date", "series"])
+
+
+def daily_gaps(queryset, field, series=None):
+    """
+    Get the time between consecutive entries of a child, per local date.
+    Gaps belong to the date of the entry ending them. Entries at the same
+    time as the previous entry have no gap.
+    :param queryset: a QuerySet of entries of a model with a `child` field.
+    :param field: the name of the time field to order entries by.
+    :param series: a dict of series names and conditions (Q objects, or
+                   `None` for all entries) selecting the entries ending the
+                   gaps of a series. Defaults to a single "total" series.
+    :returns: a list of DailyGaps tuples ordered by date, with a Gaps tuple
+              for every series.
+    """
+    series = series or {"total": None}
+    gap = ExpressionWrapper(
+        F(field)
+        - Window(Lag(field), partition_by=[F("child")], order_by=F(field).asc()),
+        output_field=DurationField(),
+    )
+    positive = GreaterThan(gap, Value(datetime.timedelta(0), DurationField()))
+    columns = {"gap_{}".format(i): name for i, name in enumerate(series)}
+    inner = queryset.order_by().annotate(
+        gap_day=TruncDate(field),
+        **{
+            column: Case(
+                When(positive & condition if condition else positive, then=gap),
+                output_field=DurationField(),
+            )
+            for column, condition in zip(columns, series.values())
+        },
+    )
+    inner = inner.values("gap_day", *columns)
+
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    try:
+        sql, params = inner.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return []
+    aggregates = ", ".join(
+        "COUNT({0}), SUM({0})".format(qn(column)) for column in columns
+    )
+    sql = (
+        "SELECT {day}, {aggregates} FROM ({sql}) {alias} "
+        "GROUP BY {day} ORDER BY {day}"
+    ).format(day=qn("gap_day"), aggregates=aggregates, sql=sql, alias=qn("gaps"))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    date_field = DateField()
+    days = []
+    for day, *values in rows:
+        days.append(
+            DailyGaps(
+                date_field.to_python(day),
+                {
+                    name: Gaps(count, _duration(total))
+                    for name, count, total in zip(
+                        columns.values(), values[::2], values[1::2]
+                    )
+                },
+            )
+        )
+    return days
+
+
+def _duration(value):
+    # Databases without a duration type sum microseconds.
+    if value is None:
+        return datetime.timedelta(0)
+    if isinstance(value, datetime.timedelta):
+        return value
+    return datetime.timedelta(microseconds=float(value))
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.db.models import DateTimeField
+from django.utils import timezone, translation
+from django.utils.cache import get_conditional_response, quote_etag
+
+from babybuddy import VERSION
+from core import models, versions
+
+from . import utils
+from .pool import RenderFailed, RenderTimeout, report_pool
+
+CACHE_KEY = "reports.{}.{}.{}"
+CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+class CachedReportMixin:
+    """
+    Cache the graph of a child report until the child's data changes.
+
+    Graphs are cached under a key made of the report, the child, the report's
+    parameters and the change counters of `report_models` for the child, so
+    cached graphs are shown without any queries for entries. The same key is
+    used as ETag of the page, along with the change counters of the children
+    shown in the page's header.
+
+    Reports show the entries of a date range, set by the `from` and `to`
+    parameters (dates) and the DEFAULT_DAYS setting. Reports grouping entries
+    by day group them by the period of the `bucket` parameter instead.
+
+    Graphs of `pooled` reports are created in `pool.report_pool`. Pages are
+    answered with 503 Service Unavailable (and no ETag) while they are being
+    created for longer than the WAIT setting, and with 500 Internal Server
+    Error if they could not be created.
+    """
+
+    # The VERSIONED_MODELS models the graph is created from.
+    report_models = []
+    # Whether to show all entries rather than the last DEFAULT_DAYS days when
+    # there is no `from` parameter.
+    full_history = False
+    # Whether the graph groups entries by the `bucket` parameter.
+    bucketed = False
+    # Whether the graph is created in the report pool, for slow reports.
+    pooled = False
+
+    def get_report(self, child):
+        """
+        Create the graph of a report.
+        :param child: an instance of the Child model.
+        :returns: a dict of the graph's plotly.js data and layout, or `None` if
+                  the child has no data to show.
+        """
+        raise NotImplementedError
+
+    def get_report_range(self):
+        """
+        Get the date range and bucket of a report from the request.
+        :returns: a tuple of the first date (`None` for no limit), the last
+                  date and a key of `utils.BUCKETS`.
+        :raises BadRequest: if a parameter is invalid.
+        """
+        if getattr(self, "_report_range", None) is None:
+            start, end = utils.date_range(self.request.GET, self.full_history)
+            bucket = self.request.GET.get("bucket", "day")
+            if bucket not in utils.BUCKETS:
+                raise BadRequest(
+                    "`bucket` must be one of: {}.".format(", ".join(utils.BUCKETS))
+                )
+            self._report_range = (start, end, bucket)
+        return self._report_range
+
+    def filter_range(self, queryset, field):
+        """
+        Limit entries to the date range of a report.
+        :param queryset: a QuerySet of entries.
+        :param field: the name of the date or time field to filter by.
+        :returns: the filtered QuerySet.
+        """
+        start, end, bucket = self.get_report_range()
+        if isinstance(queryset.model._meta.get_field(field), DateTimeField):
+            start, end = [
+                (
+                    timezone.make_aware(
+                        datetime.datetime.combine(day, datetime.time.min)
+                    )
+                    if day
+                    else None
+                )
+                for day in (start, end + datetime.timedelta(days=1))
+            ]
+            filters = {field + "__lt": end}
+        else:
+            filters = {field + "__lte": end}
+        if start:
+            filters[field + "__gte"] = start
+        return queryset.filter(**filters)
+
+    def get_report_params(self):
+        """
+        Get the parameters of a report affecting its graph.
+        :returns: a list of (name, value) tuples.
+        """
+        start, end, bucket = self.get_report_range()
+        return [("from", start), ("to", end), ("bucket", self.bucketed and bucket)]
+
+    def get_report_key(self, child):
+        """
+        Get the cache key of the graph of a report.
+        :param child: an instance of the Child model.
+        :returns: a string.
+        """
+        parts = [
+            self.get_report_params(),
+            translation.get_language(),
+            timezone.get_current_timezone_name(),
+            versions.get_version(child.id, self.report_models),
+        ]
+        digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False)
+        return CACHE_KEY.format(type(self).__name__, child.id, digest.hexdigest())
+
+    def get_etag(self):
+        # Pages also show the user, a CSRF token (changed on login) and the
+        # names and photos of all children (in the header and quick switch).
+        child_ids = list(
+            models.Child.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        parts = [
+            self.report_key,
+            self.request.user.pk,
+            self.request.META.get("CSRF_COOKIE"),
+            VERSION,
+            versions.get_children_versions(child_ids, [models.Child]),
+        ]
+        digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False)
+        return quote_etag(digest.hexdigest())
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if response.has_header("ETag"):
+            # Pages may be stored as long as they are revalidated.
+            response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        self.report_key = self.get_report_key(self.object)
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response.headers["ETag"] = etag
+            return response
+        context = self.get_context_data(object=self.object)
+        response = self.render_to_response(context)
+        if context["report_pending"]:
+            response.status_code = 503
+            response.headers["Retry-After"] = str(settings.REPORTS["WAIT"])
+        elif context["report_failed"]:
+            response.status_code = 500
+        else:
+            response.headers["ETag"] = etag
+        return response
+
+    def get_cached_report(self, child):
+        """
+        Get the graph of a report from the cache, creating it if necessary.
+        :param child: an instance of the Child model.
+        :returns: see `get_report`.
+        :raises RenderTimeout: if the graph of a pooled report was not created
+                               in time.
+        :raises RenderFailed: if the graph of a pooled report could not be
+                              created.
+        """
+        if getattr(self, "report_key", None) is None:
+            self.report_key = self.get_report_key(child)
+        report = cache.get(self.report_key)
+        if report is None:
+            if self.pooled and report_pool.enabled:
+                # Cached by the pool's job.
+                report = report_pool.render(self, child)
+            else:
+                # Reports without data are cached as an empty dict.
+                report = self.get_report(child) or {}
+                cache.set(self.report_key, report, CACHE_TIMEOUT)
+        return report or None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["figure"] = None
+        context["report_pending"] = False
+        context["report_failed"] = False
+        try:
+            context["figure"] = self.get_cached_report(context["object"])
+        except RenderTimeout:
+            context["report_pending"] = True
+        except RenderFailed:
+            context["report_failed"] = True
+        context["report_from"], context["report_to"], context["report_bucket"] = (
+            self.get_report_range()
+        )
+        context["report_bucketed"] = self.bucketed
+        return context
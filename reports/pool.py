@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Create report graphs in a pool of processes.
+
+Graphs of long ranges of entries take seconds of CPU time to create, which
+would keep the web worker from serving other requests. Reports with `pooled`
+set are created by a bounded pool of processes instead and requests only wait
+for the result, for up to WAIT seconds. Identical requests share one job and
+results are cached when jobs finish, also when requests stopped waiting.
+Jobs failing (or running out of their TIMEOUT) are not run again for a while,
+so retried requests do not keep the pool busy with them.
+"""
+
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone, translation
+
+logger = logging.getLogger(__name__)
+
+
+class RenderTimeout(Exception):
+    """A graph was not created before the request stopped waiting for it."""
+
+
+class RenderFailed(Exception):
+    """A graph could not be created, e.g. as its job ran out of time."""
+
+
+def _alarm(signum, frame):
+    raise RenderFailed("The job ran out of time.")
+
+
+def _initialize():
+    # Processes are spawned, rather than forked with the connections of the
+    # web worker, so Django is set up again.
+    import django
+
+    django.setup()
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _alarm)
+
+
+def _call(timeout, function, *args):
+    timed = hasattr(signal, "setitimer") and (
+        threading.current_thread() is threading.main_thread()
+    )
+    if timed:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return function(*args)
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _render(key, view_class, child_id, query, language, tz):
+    # Imported here, as processes import this module before setting up Django
+    # and the mixins import this module.
+    from core import models
+
+    from .mixins import CACHE_TIMEOUT
+
+    request = HttpRequest()
+    request.GET = QueryDict(query)
+    view = view_class()
+    view.setup(request)
+    close_old_connections()
+    try:
+        with translation.override(language), timezone.override(tz):
+            child = models.Child.objects.get(pk=child_id)
+            # Reports without data are cached as an empty dict.
+            report = view.get_report(child) or {}
+            cache.set(key, report, CACHE_TIMEOUT)
+        return report
+    finally:
+        close_old_connections()
+
+
+class RenderPool:
+    """Run jobs in a pool of ``workers`` processes, started on first use.
+
+    Jobs are keyed by the cache key of their result.  A job for a key that is
+    already running is not started again, the running job's result is waited
+    for instead.  Jobs are stopped after ``timeout`` seconds, callers stop
+    waiting after ``wait`` seconds.  Jobs cache their result themselves, so
+    it is not lost when nobody waits for it any more.  Keys of failed jobs
+    are not run again for ``backoff`` seconds.
+    """
+
+    def __init__(self, workers=2, wait=10.0, timeout=120.0, backoff=600.0):
+        self._workers = workers
+        self._wait = wait
+        self._timeout = timeout
+        self._backoff = backoff
+        self._executor = None
+        self._jobs = {}
+        # Failed keys, with the time until which they are not run again and
+        # their error.
+        self._failures = {}
+        # Reentrant, as callbacks of finished jobs run when they are added.
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self):
+        """Return ``True`` if jobs run in the pool, ``False`` if there are no
+        workers."""
+        return self._workers > 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def render(self, view, child):
+        """Create the graph of a report in the pool.
+
+        :param view: a view with CachedReportMixin and a `report_key`.
+        :param child: an instance of the Child model.
+        :returns: the graph, or an empty dict if the child has no data to show.
+        :raises RenderTimeout: if the graph was not created in time.
+        :raises RenderFailed: if the graph could not be created.
+        """
+        return self.run(
+            view.report_key,
+            _render,
+            view.report_key,
+            type(view),
+            child.id,
+            view.request.GET.urlencode(),
+            translation.get_language(),
+            timezone.get_current_timezone_name(),
+        )
+
+    def run(self, key, function, *args):
+        """Run a job in the pool, unless a job with the same key is running.
+
+        :param key: a key identifying the job, e.g. the cache key of its result.
+        :param function: a function importable by the pool's processes.
+        :param args: the (picklable) arguments of the function.
+        :returns: the result of the function.
+        :raises RenderTimeout: if the job did not finish in time.
+        :raises RenderFailed: if the job (or a recent job with the same key)
+                              failed.
+        """
+        with self._lock:
+            failure = self._failures.get(key)
+            if failure is not None:
+                until, error = failure
+                if time.monotonic() < until:
+                    raise RenderFailed("The graph could not be created.") from error
+                del self._failures[key]
+            future = self._jobs.get(key)
+            if future is None or future.done():
+                try:
+                    future = self._get_executor().submit(
+                        _call, self._timeout, function, *args
+                    )
+                except BrokenProcessPool:
+                    # A process died (e.g. out of memory), start a new pool.
+                    logger.warning("Report pool is broken, restarting it")
+                    self._executor = None
+                    future = self._get_executor().submit(
+                        _call, self._timeout, function, *args
+                    )
+                self._jobs[key] = future
+                future.add_done_callback(lambda future: self._done(key, future))
+        # Jobs raising TimeoutError themselves have failed rather than not
+        # finished yet, so the future is not waited for with result().
+        futures.wait([future], timeout=self._wait)
+        if not future.done():
+            raise RenderTimeout("The graph is still being created.")
+        error = future.exception()
+        if error is not None:
+            raise RenderFailed("The graph could not be created.") from error
+        return future.result()
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = futures.ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize,
+            )
+        return self._executor
+
+    def _done(self, key, future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            if self._jobs.get(key) is future:
+                del self._jobs[key]
+            if error is not None:
+                now = time.monotonic()
+                self._failures = {
+                    failed: failure
+                    for failed, failure in self._failures.items()
+                    if failure[0] > now
+                }
+                self._failures[key] = (now + self._backoff, error)
+        if error is not None:
+            logger.warning("Report job %s failed: %r", key, error)
+
+
+# Module-level singleton used by the report views.
+report_pool = RenderPool(
+    workers=settings.REPORTS["WORKERS"],
+    wait=settings.REPORTS["WAIT"],
+    timeout=settings.REPORTS["TIMEOUT"],
+)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import datetime
+import zoneinfo
+
+from django.test import SimpleTestCase
+
+from reports import buckets
+
+TZ = zoneinfo.ZoneInfo("America/New_York")
+
+
+def _epoch(*args):
+    return datetime.datetime(*args, tzinfo=TZ).timestamp()
+
+
+class BucketsTestCase(SimpleTestCase):
+    def test_midnight(self):
+        intervals = [
+            (_epoch(2024, 1, 1, 8), _epoch(2024, 1, 1, 9, 30)),
+            (_epoch(2024, 1, 1, 22), _epoch(2024, 1, 3, 2)),
+        ]
+        segments = buckets.day_segments(intervals, TZ)
+        self.assertEqual(
+            list(segments),
+            [datetime.date(2024, 1, d) for d in (1, 2, 3)],
+        )
+        day = segments[datetime.date(2024, 1, 1)]
+        self.assertEqual(
+            [(s.start, s.end, s.index) for s in day], [(480, 570, 0), (1320, 1440, 1)]
+        )
+        self.assertEqual(day[1].duration, datetime.timedelta(hours=2))
+        self.assertEqual(
+            segments[datetime.date(2024, 1, 2)],
+            [buckets.Segment(0, 1440, datetime.timedelta(days=1), 1)],
+        )
+        self.assertEqual(
+            segments[datetime.date(2024, 1, 3)],
+            [buckets.Segment(0, 120, datetime.timedelta(hours=2), 1)],
+        )
+
+    def test_dst(self):
+        # Clocks skip from 2:00 to 3:00 on March 10th and return from 2:00 to
+        # 1:00 on November 3rd.
+        segments = buckets.day_segments(
+            [(_epoch(2024, 3, 9, 23), _epoch(2024, 3, 10, 4))], TZ
+        )
+        segment = segments[datetime.date(2024, 3, 10)][0]
+        self.assertEqual((segment.start, segment.end), (0, 240))
+        self.assertEqual(segment.duration, datetime.timedelta(hours=3))
+
+        segments = buckets.day_segments(
+            [(_epoch(2024, 11, 3, 0), _epoch(2024, 11, 3, 4))], TZ
+        )
+        segment = segments[datetime.date(2024, 11, 3)][0]
+        self.assertEqual((segment.start, segment.end), (0, 240))
+        self.assertEqual(segment.duration, datetime.timedelta(hours=5))
+
+    def test_stack_days(self):
+        intervals = [
+            (_epoch(2024, 1, 1, 8), _epoch(2024, 1, 1, 9)),
+            (_epoch(2024, 1, 1, 10), _epoch(2024, 1, 1, 11)),
+            (_epoch(2024, 1, 2, 1), _epoch(2024, 1, 2, 2)),
+        ]
+        days = buckets.stack_days(buckets.day_segments(intervals, TZ))
+        self.assertEqual(
+            [
+                (b.start, b.end, b.segment is None)
+                for b in days[datetime.date(2024, 1, 1)]
+            ],
+            [
+                (0, 480, True),
+                (480, 540, False),
+                (540, 600, True),
+                (600, 660, False),
+                (660, 1440, True),
+            ],
+        )
+        # The last day ends with its last segment.
+        self.assertEqual(len(days[datetime.date(2024, 1, 2)]), 2)
+
+    def test_empty(self):
+        self.assertEqual(buckets.day_segments([]), {})
+        self.assertEqual(buckets.stack_days({}), {})
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import datetime
+import zoneinfo
+
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+
+from core import models
+from reports import intervals
+
+TZ = zoneinfo.ZoneInfo("America/New_York")
+
+
+def _time(*args):
+    return datetime.datetime(*args, tzinfo=TZ)
+
+
+class IntervalsTestCase(TestCase):
+    def setUp(self):
+        self.child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date="2024-01-01"
+        )
+        other = models.Child.objects.create(
+            first_name="Other", last_name="Child", birth_date="2024-01-01"
+        )
+        for time, solid in [
+            (_time(2024, 1, 1, 8), False),
+            (_time(2024, 1, 1, 10), True),
+            (_time(2024, 1, 1, 13), False),
+            # Same time as the previous change, no gap.
+            (_time(2024, 1, 1, 13), True),
+            # Local date of the gap's end, in UTC on the next day.
+            (_time(2024, 1, 1, 23), True),
+            (_time(2024, 1, 2, 5), False),
+        ]:
+            models.DiaperChange.objects.create(
+                child=self.child, time=time, wet=not solid, solid=solid
+            )
+        models.DiaperChange.objects.create(
+            child=other, time=_time(2024, 1, 1, 9), wet=True, solid=False
+        )
+
+    def test_daily_gaps(self):
+        queryset = models.DiaperChange.objects.filter(child=self.child)
+        with timezone.override(TZ), self.assertNumQueries(1):
+            days = intervals.daily_gaps(queryset, "time")
+        hours = datetime.timedelta(hours=1)
+        self.assertEqual(
+            days,
+            [
+                intervals.DailyGaps(
+                    datetime.date(2024, 1, 1),
+                    {"total": intervals.Gaps(3, 15 * hours)},
+                ),
+                intervals.DailyGaps(
+                    datetime.date(2024, 1, 2),
+                    {"total": intervals.Gaps(1, 6 * hours)},
+                ),
+            ],
+        )
+
+    def test_daily_gaps_series(self):
+        queryset = models.DiaperChange.objects.all()
+        with timezone.override(TZ):
+            days = intervals.daily_gaps(
+                queryset, "time", {"solid": Q(solid=True), "wet": Q(wet=True)}
+            )
+        hours = datetime.timedelta(hours=1)
+        # Gaps are between the entries of each child.
+        self.assertEqual(
+            [day.series for day in days],
+            [
+                {
+                    "solid": intervals.Gaps(2, 12 * hours),
+                    "wet": intervals.Gaps(1, 3 * hours),
+                },
+                {
+                    "solid": intervals.Gaps(0, datetime.timedelta(0)),
+                    "wet": intervals.Gaps(1, 6 * hours),
+                },
+            ],
+        )
+
+    def test_daily_gaps_empty(self):
+        queryset = models.DiaperChange.objects.none()
+        self.assertEqual(intervals.daily_gaps(queryset, "time"), [])
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import datetime
+import threading
+import time
+from concurrent import futures
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, tag
+from django.utils import timezone
+
+from core import models
+from reports import pool, views
+
+
+class RenderPoolTestCase(SimpleTestCase):
+    def _pool(self, **kwargs):
+        render_pool = pool.RenderPool(workers=1, **kwargs)
+        self.addCleanup(
+            lambda: render_pool._executor and render_pool._executor.shutdown()
+        )
+        return render_pool
+
+    # Pool processes can not be started by parallel test processes.
+    @tag("isolate")
+    def test_run(self):
+        render_pool = self._pool(wait=60, timeout=60)
+        self.assertTrue(render_pool.enabled)
+        self.assertEqual(render_pool.run("key", pow, 2, 10), 1024)
+        self.assertFalse(pool.RenderPool(workers=0).enabled)
+
+    @tag("isolate")
+    def test_timeout(self):
+        # Requests stop waiting, jobs keep running.
+        render_pool = self._pool(wait=0.1, timeout=60)
+        with self.assertRaises(pool.RenderTimeout):
+            render_pool.run("key", time.sleep, 1)
+        self.assertIn("key", render_pool._jobs)
+
+        # Jobs are stopped after the timeout, and fail.
+        render_pool = self._pool(wait=60, timeout=0.5)
+        start = time.monotonic()
+        with self.assertRaises(pool.RenderFailed):
+            render_pool.run("key", time.sleep, 30)
+        self.assertLess(time.monotonic() - start, 30)
+
+    def test_single_flight(self):
+        render_pool = self._pool(wait=0.05)
+        render_pool._executor = futures.ThreadPoolExecutor(max_workers=2)
+        calls = []
+        release = threading.Event()
+
+        def job(name):
+            calls.append(name)
+            release.wait(10)
+            return name
+
+        # Identical requests share the running job.
+        for _ in range(3):
+            with self.assertRaises(pool.RenderTimeout):
+                render_pool.run("key", job, "graph")
+        self.assertEqual(calls, ["graph"])
+        self.assertEqual(render_pool.run("other", str.upper, "other"), "OTHER")
+
+        # Finished jobs are not shared.
+        release.set()
+        self.assertEqual(render_pool._jobs["key"].result(), "graph")
+        self.assertEqual(render_pool.run("key", job, "graph"), "graph")
+        self.assertEqual(calls, ["graph", "graph"])
+
+    def test_failure(self):
+        render_pool = self._pool(backoff=60)
+        render_pool._executor = futures.ThreadPoolExecutor(max_workers=1)
+        calls = []
+
+        def job(error):
+            calls.append(error)
+            raise error
+
+        # Jobs raising TimeoutError themselves have not just taken too long.
+        for error in (ValueError(), TimeoutError()):
+            with self.assertRaises(pool.RenderFailed) as context:
+                render_pool.run(type(error).__name__, job, error)
+            self.assertIs(context.exception.__cause__, error)
+
+        # Failed keys are not run again until the backoff passed.
+        with self.assertRaises(pool.RenderFailed):
+            render_pool.run("ValueError", job, ValueError())
+        self.assertEqual(len(calls), 2)
+        render_pool._backoff = 0
+        render_pool._failures["ValueError"] = (time.monotonic(), ValueError())
+        self.assertEqual(render_pool.run("ValueError", str.upper, "graph"), "GRAPH")
+        self.assertNotIn("ValueError", render_pool._failures)
+
+
+class RenderTestCase(TestCase):
+    def test_render(self):
+        child = models.Child.objects.create(
+            first_name="First", last_name="Last", birth_date="2024-01-01"
+        )
+        end = timezone.now()
+        models.Sleep.objects.create(
+            child=child, start=end - datetime.timedelta(hours=2), end=end
+        )
+
+        report = pool._render(
+            "report", views.SleepPatternChildReport, child.id, "", "en-US", "UTC"
+        )
+        self.assertTrue(report["data"])
+        self.assertEqual(cache.get("report"), report)
+
+        # Reports without data are cached as an empty dict.
+        report = pool._render(
+            "report",
+            views.SleepPatternChildReport,
+            child.id,
+            "from=2000-01-01&to=2000-01-02",
+            "en-US",
+            "UTC",
+        )
+        self.assertEqual(report, {})
+        self.assertEqual(cache.get("report"), {})
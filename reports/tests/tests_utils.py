@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import datetime
+import math
+
+from django.core.exceptions import BadRequest
+from django.http import QueryDict
+from django.test import SimpleTestCase, override_settings
+
+from reports import utils
+
+
+class UtilsTestCase(SimpleTestCase):
+    def test_bucket_start(self):
+        date = datetime.date(2024, 5, 16)
+        self.assertEqual(utils.bucket_start(date), date)
+        self.assertEqual(utils.bucket_start(date, "week"), datetime.date(2024, 5, 13))
+        self.assertEqual(utils.bucket_start(date, "month"), datetime.date(2024, 5, 1))
+
+    def test_date_range(self):
+        params = QueryDict("to=2024-05-16")
+        with override_settings(REPORTS={"DEFAULT_DAYS": 7}):
+            self.assertEqual(
+                utils.date_range(params),
+                (datetime.date(2024, 5, 10), datetime.date(2024, 5, 16)),
+            )
+        self.assertEqual(
+            utils.date_range(params, full_history=True),
+            (None, datetime.date(2024, 5, 16)),
+        )
+        self.assertEqual(
+            utils.date_range(QueryDict("from=2024-05-01&to=2024-05-01")),
+            (datetime.date(2024, 5, 1), datetime.date(2024, 5, 1)),
+        )
+        for query in ("from=nope", "to=2024-02-30", "from=2024-05-17&to=2024-05-16"):
+            with self.assertRaises(BadRequest):
+                utils.date_range(QueryDict(query))
+
+    def test_downsample(self):
+        start = datetime.date(2020, 1, 1)
+        x = [start + datetime.timedelta(days=i) for i in range(1000)]
+        y = [math.sin(i / 50) for i in range(1000)]
+        # Peak of the series.
+        y[500] = 10
+        text = [str(value) for value in y]
+
+        sampled_x, sampled_y, sampled_text = utils.downsample(x, y, text, max_points=50)
+        self.assertEqual(len(sampled_x), 50)
+        self.assertEqual((sampled_x[0], sampled_x[-1]), (x[0], x[-1]))
+        self.assertIn(10, sampled_y)
+        self.assertEqual(sampled_text, [str(value) for value in sampled_y])
+        self.assertEqual(sampled_x, sorted(sampled_x))
+
+        # Series within the budget are unchanged.
+        self.assertEqual(utils.downsample(x, y, max_points=1000), (x, y))
+        with override_settings(REPORTS={"MAX_POINTS": 100}):
+            self.assertEqual(len(utils.downsample(x, y)[0]), 100)
@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
+import datetime
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.test import Client as HttpClient
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
@@ -7,6 +13,7 @@ from django.core.management import call_command
 from faker import Faker
 
 from core import models
+from reports.pool import RenderFailed, RenderTimeout
 
 
 class ViewsTestCase(TestCase):
@@ -64,6 +71,9 @@ class ViewsTestCase(TestCase):
         page = self.c.get("{}/height/height/".format(base_url))
         self.assertEqual(page.status_code, 200)
 
+        page = self.c.get("{}/medication/adherence/".format(base_url))
+        self.assertEqual(page.status_code, 200)
+
         page = self.c.get("{}/pumping/amounts/".format(base_url))
         self.assertEqual(page.status_code, 200)
 
@@ -80,3 +90,134 @@ class ViewsTestCase(TestCase):
 
         page = self.c.get("{}/weight/weight/".format(base_url))
         self.assertEqual(page.status_code, 200)
+
+    def test_graph_cache(self):
+        child = models.Child.objects.first()
+        url = "/children/{}/reports/sleep/totals/".format(child.slug)
+
+        page = self.c.get(url)
+        self.assertEqual(page.status_code, 200)
+        self.assertIn("ETag", page.headers)
+        self.assertNotIn("no-store", page.headers["Cache-Control"])
+
+        # Cached graphs are shown without querying entries or creating them.
+        with CaptureQueriesContext(connection) as context:
+            with mock.patch("reports.graphs.sleep_totals") as sleep_totals:
+                cached = self.c.get(url)
+        sleep_totals.assert_not_called()
+        self.assertEqual(cached.context["figure"], page.context["figure"])
+        self.assertFalse(
+            [q for q in context.captured_queries if '"core_sleep"' in q["sql"]]
+        )
+
+        page = self.c.get(url, HTTP_IF_NONE_MATCH=cached.headers["ETag"])
+        self.assertEqual(page.status_code, 304)
+
+        # Changes of other models keep the graph, changes of sleep entries do not.
+        models.Note.objects.create(child=child, note="Note", time=timezone.now())
+        page = self.c.get(url, HTTP_IF_NONE_MATCH=cached.headers["ETag"])
+        self.assertEqual(page.status_code, 304)
+
+        models.Sleep.objects.filter(child=child).first().delete()
+        with mock.patch(
+            "reports.graphs.sleep_totals", return_value={"data": [], "layout": {}}
+        ) as sleep_totals:
+            page = self.c.get(url, HTTP_IF_NONE_MATCH=cached.headers["ETag"])
+        sleep_totals.assert_called_once()
+        self.assertEqual(page.status_code, 200)
+        self.assertNotEqual(page.headers["ETag"], cached.headers["ETag"])
+
+    def test_graph_etag_children(self):
+        child = models.Child.objects.first()
+        url = "/children/{}/reports/sleep/totals/".format(child.slug)
+        etag = self.c.get(url).headers["ETag"]
+        self.assertEqual(self.c.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Pages show the names of all children.
+        child.first_name = "Renamed"
+        child.save()
+        url = "/children/{}/reports/sleep/totals/".format(child.slug)
+        page = self.c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(page.status_code, 200)
+        self.assertContains(page, "Renamed")
+
+        etag = page.headers["ETag"]
+        other = models.Child.objects.create(
+            first_name="Other", last_name="Child", birth_date=timezone.localdate()
+        )
+        page = self.c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(page.status_code, 200)
+        self.assertContains(page, other.first_name)
+
+    def test_graph_pending(self):
+        child = models.Child.objects.first()
+        url = "/children/{}/reports/sleep/pattern/".format(child.slug)
+
+        with (
+            mock.patch("reports.pool.report_pool._workers", 1),
+            mock.patch(
+                "reports.pool.report_pool.render", side_effect=RenderTimeout
+            ) as render,
+        ):
+            page = self.c.get(url)
+        render.assert_called_once()
+        self.assertEqual(page.status_code, 503)
+        self.assertTrue(page.context["report_pending"])
+        self.assertIn("Retry-After", page.headers)
+        # Pages without the graph must not be revalidated as up to date.
+        self.assertNotIn("ETag", page.headers)
+
+        page = self.c.get(url)
+        self.assertEqual(page.status_code, 200)
+        self.assertIsNotNone(page.context["figure"])
+
+    def test_graph_failed(self):
+        child = models.Child.objects.first()
+        url = "/children/{}/reports/sleep/pattern/".format(child.slug)
+
+        with (
+            mock.patch("reports.pool.report_pool._workers", 1),
+            mock.patch("reports.pool.report_pool.render", side_effect=RenderFailed),
+        ):
+            page = self.c.get(url)
+        self.assertEqual(page.status_code, 500)
+        self.assertTrue(page.context["report_failed"])
+        self.assertNotIn("Retry-After", page.headers)
+        self.assertNotIn("ETag", page.headers)
+
+    def test_graph_range(self):
+        child = models.Child.objects.create(
+            first_name="Range", last_name="Child", birth_date=timezone.localdate()
+        )
+        url = "/children/{}/reports/sleep/totals/".format(child.slug)
+        now = timezone.localtime().replace(hour=12, minute=0, second=0)
+        for days_ago in (1, 8, 200):
+            models.Sleep.objects.create(
+                child=child,
+                start=now - datetime.timedelta(days=days_ago, hours=2),
+                end=now - datetime.timedelta(days=days_ago),
+            )
+
+        # The last DEFAULT_DAYS days are shown by default.
+        page = self.c.get(url)
+        self.assertEqual(len(page.context["figure"]["data"][0]["x"]), 2)
+
+        start = (now - datetime.timedelta(days=300)).date().isoformat()
+        page = self.c.get(url, {"from": start})
+        self.assertEqual(len(page.context["figure"]["data"][0]["x"]), 3)
+
+        end = (now - datetime.timedelta(days=100)).date().isoformat()
+        page = self.c.get(url, {"from": start, "to": end})
+        self.assertEqual(len(page.context["figure"]["data"][0]["x"]), 1)
+
+        page = self.c.get(url, {"from": start, "bucket": "month"})
+        x = page.context["figure"]["data"][0]["x"]
+        self.assertTrue(all(date.day == 1 for date in x))
+
+        for params in (
+            {"from": "nope"},
+            {"bucket": "year"},
+            {"from": end, "to": start},
+        ):
+            page = self.c.get(url, params)
+            self.assertEqual(page.status_code, 400)
@@ -66,6 +66,11 @@ urlpatterns = [
         views.FeedingDurationChildReport.as_view(),
         name="report-feeding-duration-child",
     ),
+    path(
+        "children/<str:slug>/reports/medication/adherence/",
+        views.MedicationAdherenceChildReport.as_view(),
+        name="report-medication-adherence-child",
+    ),
     path(
         "children/<str:slug>/reports/pumping/amounts/",
         views.PumpingAmounts.as_view(),
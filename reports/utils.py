@@ -1,5 +1,26 @@
 # -*- coding: utf-8 -*-
+import datetime
 import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db.models import DateField
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import formats, timezone
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext as _
+
+from core import percentiles
+from core.utils import duration_parts
+
+# Periods entries can be grouped by, with the database function truncating a
+# date or time to the start of the period.
+BUCKETS = {
+    "day": TruncDate,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
 
 
 def autorangeoptions(dates, padding=10000000):
@@ -20,7 +41,7 @@ def autorangeoptions(dates, padding=10000000):
 
 def default_graph_layout_options():
     """
-    Default layout options for all graphs.
+    Default layout options for all graphs, in the format of plotly.js.
     :returns: a dict of default options.
     """
     return {
@@ -37,12 +58,12 @@ def default_graph_layout_options():
         },
         "margin": {"b": 80, "t": 80},
         "xaxis": {
-            "title_font_color": "rgba(255, 255, 255, 0.5)",
+            "title": {"font": {"color": "rgba(255, 255, 255, 0.5)"}},
             "gridcolor": "rgba(0, 0, 0, 0.25)",
             "zerolinecolor": "rgba(0, 0, 0, 0.5)",
         },
         "yaxis": {
-            "title_font_color": "rgba(255, 255, 255, 0.5)",
+            "title": {"font": {"color": "rgba(255, 255, 255, 0.5)"}},
             "gridcolor": "rgba(0, 0, 0, 0.25)",
             "zerolinecolor": "rgba(0, 0, 0, 0.5)",
         },
@@ -86,12 +107,304 @@ def rangeselector_time():
     }
 
 
-def split_graph_output(output):
+def day_pattern_traces(days, color, label):
+    """
+    Create the stacked bar traces of a graph of blocks within each day.
+    :param days: a dict of dates and blocks, see `buckets.stack_days`.
+    :param color: a function returning the color of a day's block.
+    :param label: a function returning the hover text of a day's block.
+    :returns: a list of traces, one for each position of blocks in a day.
+    """
+    # Use a 12:00:00 time to ensure correct positioning of bars (covering the
+    # entire day).
+    dates = ["{} 12:00:00".format(day.isoformat()) for day in days]
+    traces = []
+    for i in range(max((len(blocks) for blocks in days.values()), default=0)):
+        y = []
+        text = []
+        colors = []
+        for day, blocks in days.items():
+            if i < len(blocks):
+                block = blocks[i]
+                y.append(block.end - block.start)
+                text.append(label(day, block))
+                colors.append(color(day, block))
+            else:
+                y.append(None)
+                text.append(None)
+                colors.append(None)
+        traces.append(
+            dict(
+                type="bar",
+                x=dates,
+                y=y,
+                hovertext=text,
+                # `hoverinfo` is deprecated but if we use the new `hovertemplate`
+                # the "filler" areas for gaps get a hover that says "null" and
+                # there is no way to prevent this currently with Plotly.
+                hoverinfo="text",
+                marker={"color": colors},
+                showlegend=False,
+            )
+        )
+    return traces
+
+
+def day_pattern_layout(title):
+    """
+    Layout options of a graph of blocks within each day, with days on the x
+    axis and the time of day on the y axis.
+    :param title: the title of the graph.
+    :returns: a dict of layout options.
+    """
+    layout_args = default_graph_layout_options()
+    layout_args["margin"]["b"] = 100
+
+    layout_args["barmode"] = "stack"
+    layout_args["bargap"] = 0
+    layout_args["hovermode"] = "closest"
+    layout_args["title"] = "<b>" + title + "</b>"
+    layout_args["height"] = 800
+
+    layout_args["xaxis"]["title"]["text"] = _("Date")
+    layout_args["xaxis"]["tickangle"] = -65
+    layout_args["xaxis"]["tickformat"] = "%b %e\n%Y"
+    layout_args["xaxis"]["ticklabelmode"] = "period"
+    layout_args["xaxis"]["rangeselector"] = rangeselector_date()
+
+    start = timezone.localtime().strptime("12:00 AM", "%I:%M %p")
+    ticks = OrderedDict()
+    ticks[0] = start.strftime("%I:%M %p")
+    for i in range(0, 60 * 24, 30):
+        ticks[i] = formats.time_format(
+            start + timezone.timedelta(minutes=i), "TIME_FORMAT"
+        )
+
+    layout_args["yaxis"]["title"]["text"] = _("Time of day")
+    layout_args["yaxis"]["range"] = [24 * 60, 0]
+    layout_args["yaxis"]["tickmode"] = "array"
+    layout_args["yaxis"]["tickvals"] = list(ticks.keys())
+    layout_args["yaxis"]["ticktext"] = list(ticks.values())
+    layout_args["yaxis"]["tickfont"] = {"size": 10}
+    return layout_args
+
+
+def percentile_traces(curves, birthday, last_date):
+    """
+    Create the line traces of growth percentile curves.
+    :param curves: a `core.percentiles.PercentileCurves` instance.
+    :param birthday: the date of the child's birth.
+    :param last_date: the last date to show the curves for.
+    :returns: a list of traces, from the highest to the lowest percentile.
+    """
+    curves = curves.until((last_date - birthday).days)
+    dates = [birthday + datetime.timedelta(days=age) for age in curves.ages]
+    names = {3: _("P3"), 15: _("P15"), 50: _("P50"), 85: _("P85"), 97: _("P97")}
+    colors = {3: "red", 15: "orange", 50: "green", 85: "orange", 97: "red"}
+    traces = [
+        dict(
+            type="scatter",
+            name=names[percentile],
+            x=dates,
+            y=list(values),
+            line={"color": colors[percentile]},
+        )
+        for percentile, values in zip(percentiles.PERCENTILES, curves.values)
+    ]
+    return traces[::-1]
+
+
+def percentile_labels(curves, birthday, dates, values):
+    """
+    Get the percentile ranks of measurements as hover text.
+    :param curves: a `core.percentiles.PercentileCurves` instance.
+    :param birthday: the date of the child's birth.
+    :param dates: the dates of the measurements.
+    :param values: the measured values.
+    :returns: a list of strings (`None` for measurements outside of the
+              reference data).
+    """
+    labels = []
+    for date, value in zip(dates, values):
+        rank = curves.rank((date - birthday).days, value)
+        labels.append(None if rank is None else "P{:.0f}".format(rank))
+    return labels
+
+
+def interval_trace(name, days, series):
+    """
+    Create a line trace of the average time between entries per day.
+    :param name: the name of the trace.
+    :param days: a list of DailyGaps tuples, see `intervals.daily_gaps`.
+    :param series: the name of the series of `days` to show.
+    :returns: a trace with the average interval (in hours) of each date with
+              gaps in the series.
+    """
+    dates = []
+    averages = []
+    for day in days:
+        gaps = day.series[series]
+        if gaps.count:
+            dates.append(day.date)
+            averages.append(gaps.total / gaps.count)
+    return dict(
+        type="scatter",
+        name=name,
+        line=dict(shape="spline"),
+        x=dates,
+        y=[average.total_seconds() / 3600 for average in averages],
+        hoverinfo="text",
+        text=[_duration_string_hms(average) for average in averages],
+    )
+
+
+def _duration_string_hms(duration):
     """
-    Split out of a Plotly graph in to html and javascript.
-    :param output: a string of html and javascript comprising the graph.
-    :returns: a tuple of the graph's html and javascript.
+    Format a duration string with hours, minutes and seconds. This is
+    intended to fit better in smaller spaces on a graph.
+    :returns: a string of the form XhXmXs.
     """
-    html, js = output.split("<script")
-    js = "<script" + js
-    return html, js
+    h, m, s = duration_parts(duration)
+    return "{}h{}m{}s".format(h, m, s)
+
+
+def date_range(params, full_history=False):
+    """
+    Get the date range of a report from the `from` and `to` parameters.
+    :param params: a QueryDict of request parameters.
+    :param full_history: whether to leave the range open, rather than start
+                         DEFAULT_DAYS days before its end, without `from`.
+    :returns: a tuple of the first date (`None` for no limit) and the last
+              date (today without `to`).
+    :raises BadRequest: if a parameter is invalid.
+    """
+    end = _date_param(params, "to") or timezone.localdate()
+    start = _date_param(params, "from")
+    if start is None and not full_history:
+        days = settings.REPORTS["DEFAULT_DAYS"]
+        start = end - datetime.timedelta(days=days - 1)
+    if start and start > end:
+        raise BadRequest("`from` must not be after `to`.")
+    return start, end
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise BadRequest("`{}` must be a date (YYYY-MM-DD).".format(name))
+    return date
+
+
+def bucket_start(date, bucket="day"):
+    """
+    Get the start of the period a date is in.
+    :param date: a date.
+    :param bucket: a key of BUCKETS.
+    :returns: the date of the first day of the period.
+    """
+    if bucket == "week":
+        return date - datetime.timedelta(days=date.weekday())
+    if bucket == "month":
+        return date.replace(day=1)
+    return date
+
+
+def trunc_date(field, bucket="day"):
+    """
+    Truncate a date or time field to the start of the period it is in, in the
+    current timezone.
+    :param field: the name of a date or time field.
+    :param bucket: a key of BUCKETS.
+    :returns: a database function returning a date.
+    """
+    if bucket == "day":
+        return TruncDate(field)
+    return BUCKETS[bucket](field, output_field=DateField())
+
+
+def bucket_totals(day_totals, bucket="day"):
+    """
+    Add up daily totals per bucket.
+    :param day_totals: a dict of dates and totals, see `totals.daily_totals`.
+    :param bucket: a key of BUCKETS.
+    :returns: a dict keyed by the first date of each bucket, newest first, of
+              totals.
+    """
+    buckets = {}
+    for date, totals in day_totals.items():
+        key = bucket_start(date, bucket)
+        if key not in buckets:
+            buckets[key] = dict(totals)
+            continue
+        for name, value in totals.items():
+            if value is not None:
+                total = buckets[key][name]
+                buckets[key][name] = value if total is None else total + value
+    return dict(sorted(buckets.items(), reverse=True))
+
+
+def downsample(x, y, *series, max_points=None):
+    """
+    Reduce the points of a series while preserving its shape, using the
+    Largest-Triangle-Three-Buckets algorithm.
+    :param x: a list of dates, times or numbers, sorted in either direction.
+    :param y: a list of numbers.
+    :param series: other lists with a value for each point (e.g. hover text).
+    :param max_points: the number of points to keep (the MAX_POINTS setting
+                       if `None`).
+    :returns: a tuple of `x`, `y` and `series` lists, with at most
+              `max_points` values each.
+    """
+    if max_points is None:
+        max_points = settings.REPORTS["MAX_POINTS"]
+    if max_points < 3 or len(x) <= max_points:
+        return (x, y, *series)
+    indices = _lttb([_number(value) for value in x], y, max_points)
+    return tuple([values[i] for i in indices] for values in (x, y, *series))
+
+
+def _number(value):
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    return value
+
+
+def _lttb(x, y, threshold):
+    """
+    Select the indices of points to keep with Largest-Triangle-Three-Buckets.
+    The first and last points are always kept. The remaining points are
+    divided in to buckets and the point of each bucket forming the largest
+    triangle with the previously kept point and the average of the next bucket
+    is kept.
+    """
+    size = (len(x) - 2) / (threshold - 2)
+    indices = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * size) + 1
+        end = int((i + 1) * size) + 1
+        next_start = end
+        next_end = min(int((i + 2) * size) + 1, len(x))
+        count = next_end - next_start
+        avg_x = sum(x[next_start:next_end]) / count
+        avg_y = sum(y[next_start:next_end]) / count
+
+        largest = -1
+        selected = start
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > largest:
+                largest = area
+                selected = j
+        indices.append(selected)
+        a = selected
+    indices.append(len(x) - 1)
+    return indices
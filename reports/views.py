@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
+from django.utils import timezone
 from django.views.generic.detail import DetailView
 
 from babybuddy.mixins import PermissionRequiredMixin
-from core import models
+from core import models, occurrences, percentiles, totals
 
 from . import graphs
+from .mixins import CachedReportMixin
 
 
-class BMIChangeChildReport(PermissionRequiredMixin, DetailView):
+class BMIChangeChildReport(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of BMI change over time.
     """
@@ -15,14 +17,13 @@ class BMIChangeChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/bmi_change.html"
+    report_models = [models.BMI]
+    full_history = True
 
-    def get_context_data(self, **kwargs):
-        context = super(BMIChangeChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        objects = models.BMI.objects.filter(child=child)
+    def get_report(self, child):
+        objects = self.filter_range(models.BMI.objects.filter(child=child), "date")
         if objects:
-            context["html"], context["js"] = graphs.bmi_change(objects)
-        return context
+            return graphs.bmi_change(objects)
 
 
 class ChildReportList(PermissionRequiredMixin, DetailView):
@@ -35,7 +36,7 @@ class ChildReportList(PermissionRequiredMixin, DetailView):
     template_name = "reports/report_list.html"
 
 
-class DiaperChangeAmounts(PermissionRequiredMixin, DetailView):
+class DiaperChangeAmounts(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of diaper "amounts" - measurements of urine output.
     """
@@ -43,17 +44,22 @@ class DiaperChangeAmounts(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/diaperchange_amounts.html"
+    report_models = [models.DiaperChange]
+    bucketed = True
 
-    def get_context_data(self, **kwargs):
-        context = super(DiaperChangeAmounts, self).get_context_data(**kwargs)
-        child = context["object"]
-        changes = models.DiaperChange.objects.filter(child=child, amount__gt=0)
+    def get_report(self, child):
+        changes = self.filter_range(
+            models.DiaperChange.objects.filter(child=child, amount__gt=0), "time"
+        )
         if changes and changes.count() > 0:
-            context["html"], context["js"] = graphs.diaperchange_amounts(changes)
-        return context
+            return graphs.diaperchange_amounts(
+                changes, bucket=self.get_report_range()[2]
+            )
 
 
-class DiaperChangeLifetimesChildReport(PermissionRequiredMixin, DetailView):
+class DiaperChangeLifetimesChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of diaper "lifetimes" - time between diaper changes.
     """
@@ -61,19 +67,20 @@ class DiaperChangeLifetimesChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/diaperchange_lifetimes.html"
+    report_models = [models.DiaperChange]
+    pooled = True
 
-    def get_context_data(self, **kwargs):
-        context = super(DiaperChangeLifetimesChildReport, self).get_context_data(
-            **kwargs
+    def get_report(self, child):
+        changes = self.filter_range(
+            models.DiaperChange.objects.filter(child=child), "time"
         )
-        child = context["object"]
-        changes = models.DiaperChange.objects.filter(child=child)
         if changes and changes.count() > 1:
-            context["html"], context["js"] = graphs.diaperchange_lifetimes(changes)
-        return context
+            return graphs.diaperchange_lifetimes(changes)
 
 
-class DiaperChangeTypesChildReport(PermissionRequiredMixin, DetailView):
+class DiaperChangeTypesChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of diaper changes by day and type.
     """
@@ -81,17 +88,20 @@ class DiaperChangeTypesChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/diaperchange_types.html"
+    report_models = [models.DiaperChange]
+    bucketed = True
 
-    def get_context_data(self, **kwargs):
-        context = super(DiaperChangeTypesChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        changes = models.DiaperChange.objects.filter(child=child)
+    def get_report(self, child):
+        changes = self.filter_range(
+            models.DiaperChange.objects.filter(child=child), "time"
+        )
         if changes:
-            context["html"], context["js"] = graphs.diaperchange_types(changes)
-        return context
+            return graphs.diaperchange_types(changes, bucket=self.get_report_range()[2])
 
 
-class DiaperChangeIntervalsChildReport(PermissionRequiredMixin, DetailView):
+class DiaperChangeIntervalsChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of diaper change intervals.
     """
@@ -99,19 +109,17 @@ class DiaperChangeIntervalsChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/diaperchange_intervals.html"
+    report_models = [models.DiaperChange]
 
-    def get_context_data(self, **kwargs):
-        context = super(DiaperChangeIntervalsChildReport, self).get_context_data(
-            **kwargs
+    def get_report(self, child):
+        changes = self.filter_range(
+            models.DiaperChange.objects.filter(child=child), "time"
         )
-        child = context["object"]
-        changes = models.DiaperChange.objects.filter(child=child)
-        if changes:
-            context["html"], context["js"] = graphs.diaperchange_intervals(changes)
-        return context
+        if changes.exists():
+            return graphs.diaperchange_intervals(changes)
 
 
-class FeedingAmountsChildReport(PermissionRequiredMixin, DetailView):
+class FeedingAmountsChildReport(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of daily feeding amounts over time.
     """
@@ -119,22 +127,25 @@ class FeedingAmountsChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/feeding_amounts.html"
+    report_models = [models.Feeding]
+    bucketed = True
 
     def __init__(self):
         super(FeedingAmountsChildReport, self).__init__()
         self.html = ""
         self.js = ""
 
-    def get_context_data(self, **kwargs):
-        context = super(FeedingAmountsChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        instances = models.Feeding.objects.filter(child=child)
+    def get_report(self, child):
+        instances = self.filter_range(
+            models.Feeding.objects.filter(child=child), "start"
+        )
         if instances:
-            context["html"], context["js"] = graphs.feeding_amounts(instances)
-        return context
+            return graphs.feeding_amounts(instances, bucket=self.get_report_range()[2])
 
 
-class FeedingDurationChildReport(PermissionRequiredMixin, DetailView):
+class FeedingDurationChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of feeding durations over time.
     """
@@ -142,22 +153,25 @@ class FeedingDurationChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/feeding_duration.html"
+    report_models = [models.Feeding]
+    bucketed = True
 
     def __init__(self):
         super(FeedingDurationChildReport, self).__init__()
         self.html = ""
         self.js = ""
 
-    def get_context_data(self, **kwargs):
-        context = super(FeedingDurationChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        instances = models.Feeding.objects.filter(child=child)
+    def get_report(self, child):
+        instances = self.filter_range(
+            models.Feeding.objects.filter(child=child), "start"
+        )
         if instances:
-            context["html"], context["js"] = graphs.feeding_duration(instances)
-        return context
+            return graphs.feeding_duration(instances, bucket=self.get_report_range()[2])
 
 
-class FeedingIntervalsChildReport(PermissionRequiredMixin, DetailView):
+class FeedingIntervalsChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of diaper change intervals.
     """
@@ -165,17 +179,17 @@ class FeedingIntervalsChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/feeding_intervals.html"
+    report_models = [models.Feeding]
 
-    def get_context_data(self, **kwargs):
-        context = super(FeedingIntervalsChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        instances = models.Feeding.objects.filter(child=child)
-        if instances:
-            context["html"], context["js"] = graphs.feeding_intervals(instances)
-        return context
+    def get_report(self, child):
+        instances = self.filter_range(
+            models.Feeding.objects.filter(child=child), "start"
+        )
+        if instances.exists():
+            return graphs.feeding_intervals(instances)
 
 
-class FeedingPatternChildReport(PermissionRequiredMixin, DetailView):
+class FeedingPatternChildReport(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of feeding pattern.
     """
@@ -183,22 +197,25 @@ class FeedingPatternChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/feeding_pattern.html"
+    report_models = [models.Feeding]
+    pooled = True
 
     def __init__(self):
         super(FeedingPatternChildReport, self).__init__()
         self.html = ""
         self.js = ""
 
-    def get_context_data(self, **kwargs):
-        context = super(FeedingPatternChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        instances = models.Feeding.objects.filter(child=child).order_by("start")
+    def get_report(self, child):
+        instances = self.filter_range(
+            models.Feeding.objects.filter(child=child), "start"
+        ).order_by("start")
         if instances:
-            context["html"], context["js"] = graphs.feeding_pattern(instances)
-        return context
+            return graphs.feeding_pattern(instances)
 
 
-class HeadCircumferenceChangeChildReport(PermissionRequiredMixin, DetailView):
+class HeadCircumferenceChangeChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of head circumference change over time.
     """
@@ -206,22 +223,18 @@ class HeadCircumferenceChangeChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/head_circumference_change.html"
+    report_models = [models.HeadCircumference]
+    full_history = True
 
-    def get_context_data(self, **kwargs):
-        context = super(HeadCircumferenceChangeChildReport, self).get_context_data(
-            **kwargs
+    def get_report(self, child):
+        objects = self.filter_range(
+            models.HeadCircumference.objects.filter(child=child), "date"
         )
-        child = context["object"]
-        objects = models.HeadCircumference.objects.filter(child=child)
         if objects:
-            (
-                context["html"],
-                context["js"],
-            ) = graphs.head_circumference_change(objects)
-        return context
+            return graphs.head_circumference_change(objects)
 
 
-class HeightChangeChildReport(PermissionRequiredMixin, DetailView):
+class HeightChangeChildReport(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of height change over time.
     """
@@ -232,20 +245,28 @@ class HeightChangeChildReport(PermissionRequiredMixin, DetailView):
         self.model = models.Child
         self.permission_required = ("core.view_child",)
         self.template_name = "reports/height_change.html"
+        self.report_models = [models.Height, models.Child]
+        self.full_history = True
         self.sex = sex
         self.target_url = target_url
 
+    def get_report_params(self):
+        return super(HeightChangeChildReport, self).get_report_params() + [
+            ("sex", self.sex)
+        ]
+
+    def get_report(self, child):
+        birthday = child.birth_date
+        actual_heights = self.filter_range(
+            models.Height.objects.filter(child=child), "date"
+        )
+        percentile_heights = percentiles.get_curves("height", self.sex)
+        if actual_heights:
+            return graphs.height_change(actual_heights, percentile_heights, birthday)
+
     def get_context_data(self, **kwargs):
         context = super(HeightChangeChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        birthday = child.birth_date
-        actual_heights = models.Height.objects.filter(child=child)
-        percentile_heights = models.HeightPercentile.objects.filter(sex=self.sex)
         context["target_url"] = self.target_url
-        if actual_heights:
-            context["html"], context["js"] = graphs.height_change(
-                actual_heights, percentile_heights, birthday
-            )
         return context
 
 
@@ -263,7 +284,41 @@ class HeightChangeChildGirlReport(HeightChangeChildReport):
         )
 
 
-class PumpingAmounts(PermissionRequiredMixin, DetailView):
+class MedicationAdherenceChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
+    """
+    Graph of medication doses taken and missed by day.
+    """
+
+    model = models.Child
+    permission_required = ("core.view_child",)
+    template_name = "reports/medication_adherence.html"
+    report_models = [models.Medication, models.MedicationSchedule]
+    bucketed = True
+
+    def get_report_now(self):
+        # Doses are missed as time passes, so graphs are created for the
+        # current hour.
+        return timezone.localtime().replace(minute=0, second=0, microsecond=0)
+
+    def get_report_params(self):
+        return super(MedicationAdherenceChildReport, self).get_report_params() + [
+            ("now", self.get_report_now())
+        ]
+
+    def get_report(self, child):
+        start, end, bucket = self.get_report_range()
+        adherence = occurrences.get_adherence(
+            models.MedicationSchedule.objects.filter(child=child),
+            *totals.day_bounds(start, end),
+            now=self.get_report_now(),
+        )
+        if any(schedule.occurrences for schedule in adherence):
+            return graphs.medication_adherence(adherence, bucket=bucket)
+
+
+class PumpingAmounts(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of pumping milk amounts collected.
     """
@@ -271,17 +326,16 @@ class PumpingAmounts(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/pumping_amounts.html"
+    report_models = [models.Pumping]
+    bucketed = True
 
-    def get_context_data(self, **kwargs):
-        context = super(PumpingAmounts, self).get_context_data(**kwargs)
-        child = context["object"]
-        changes = models.Pumping.objects.filter(child=child)
+    def get_report(self, child):
+        changes = self.filter_range(models.Pumping.objects.filter(child=child), "start")
         if changes and changes.count() > 0:
-            context["html"], context["js"] = graphs.pumping_amounts(changes)
-        return context
+            return graphs.pumping_amounts(changes, bucket=self.get_report_range()[2])
 
 
-class SleepPatternChildReport(PermissionRequiredMixin, DetailView):
+class SleepPatternChildReport(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of sleep pattern comparing sleep to wake times by day.
     """
@@ -289,22 +343,23 @@ class SleepPatternChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/sleep_pattern.html"
+    report_models = [models.Sleep]
+    pooled = True
 
     def __init__(self):
         super(SleepPatternChildReport, self).__init__()
         self.html = ""
         self.js = ""
 
-    def get_context_data(self, **kwargs):
-        context = super(SleepPatternChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        instances = models.Sleep.objects.filter(child=child).order_by("start")
+    def get_report(self, child):
+        instances = self.filter_range(
+            models.Sleep.objects.filter(child=child), "start"
+        ).order_by("start")
         if instances:
-            context["html"], context["js"] = graphs.sleep_pattern(instances)
-        return context
+            return graphs.sleep_pattern(instances)
 
 
-class SleepTotalsChildReport(PermissionRequiredMixin, DetailView):
+class SleepTotalsChildReport(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of total sleep by day.
     """
@@ -312,22 +367,25 @@ class SleepTotalsChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/sleep_totals.html"
+    report_models = [models.Sleep]
+    bucketed = True
 
     def __init__(self):
         super(SleepTotalsChildReport, self).__init__()
         self.html = ""
         self.js = ""
 
-    def get_context_data(self, **kwargs):
-        context = super(SleepTotalsChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        instances = models.Sleep.objects.filter(child=child).order_by("start")
+    def get_report(self, child):
+        instances = self.filter_range(
+            models.Sleep.objects.filter(child=child), "start"
+        ).order_by("start")
         if instances:
-            context["html"], context["js"] = graphs.sleep_totals(instances)
-        return context
+            return graphs.sleep_totals(instances, bucket=self.get_report_range()[2])
 
 
-class TemperatureChangeChildReport(PermissionRequiredMixin, DetailView):
+class TemperatureChangeChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of temperature change over time.
     """
@@ -335,17 +393,19 @@ class TemperatureChangeChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/temperature_change.html"
+    report_models = [models.Temperature]
 
-    def get_context_data(self, **kwargs):
-        context = super(TemperatureChangeChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        objects = models.Temperature.objects.filter(child=child)
+    def get_report(self, child):
+        objects = self.filter_range(
+            models.Temperature.objects.filter(child=child), "time"
+        )
         if objects:
-            context["html"], context["js"] = graphs.temperature_change(objects)
-        return context
+            return graphs.temperature_change(objects)
 
 
-class TummyTimeDurationChildReport(PermissionRequiredMixin, DetailView):
+class TummyTimeDurationChildReport(
+    CachedReportMixin, PermissionRequiredMixin, DetailView
+):
     """
     Graph of tummy time durations over time.
     """
@@ -353,22 +413,25 @@ class TummyTimeDurationChildReport(PermissionRequiredMixin, DetailView):
     model = models.Child
     permission_required = ("core.view_child",)
     template_name = "reports/tummytime_duration.html"
+    report_models = [models.TummyTime]
+    bucketed = True
 
     def __init__(self):
         super(TummyTimeDurationChildReport, self).__init__()
         self.html = ""
         self.js = ""
 
-    def get_context_data(self, **kwargs):
-        context = super(TummyTimeDurationChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        instances = models.TummyTime.objects.filter(child=child)
+    def get_report(self, child):
+        instances = self.filter_range(
+            models.TummyTime.objects.filter(child=child), "start"
+        )
         if instances:
-            context["html"], context["js"] = graphs.tummytime_duration(instances)
-        return context
+            return graphs.tummytime_duration(
+                instances, bucket=self.get_report_range()[2]
+            )
 
 
-class WeightChangeChildReport(PermissionRequiredMixin, DetailView):
+class WeightChangeChildReport(CachedReportMixin, PermissionRequiredMixin, DetailView):
     """
     Graph of weight change over time.
     """
@@ -379,20 +442,28 @@ class WeightChangeChildReport(PermissionRequiredMixin, DetailView):
         self.model = models.Child
         self.permission_required = ("core.view_child",)
         self.template_name = "reports/weight_change.html"
+        self.report_models = [models.Weight, models.Child]
+        self.full_history = True
         self.sex = sex
         self.target_url = target_url
 
+    def get_report_params(self):
+        return super(WeightChangeChildReport, self).get_report_params() + [
+            ("sex", self.sex)
+        ]
+
+    def get_report(self, child):
+        birthday = child.birth_date
+        actual_weights = self.filter_range(
+            models.Weight.objects.filter(child=child), "date"
+        )
+        percentile_weights = percentiles.get_curves("weight", self.sex)
+        if actual_weights:
+            return graphs.weight_change(actual_weights, percentile_weights, birthday)
+
     def get_context_data(self, **kwargs):
         context = super(WeightChangeChildReport, self).get_context_data(**kwargs)
-        child = context["object"]
-        birthday = child.birth_date
-        actual_weights = models.Weight.objects.filter(child=child)
-        percentile_weights = models.WeightPercentile.objects.filter(sex=self.sex)
         context["target_url"] = self.target_url
-        if actual_weights:
-            context["html"], context["js"] = graphs.weight_change(
-                actual_weights, percentile_weights, birthday
-            )
         return context
 
 
@@ -408,3 +479,30 @@ class WeightChangeChildGirlReport(WeightChangeChildReport):
         super(WeightChangeChildGirlReport, self).__init__(
             sex="girl", target_url="reports:report-weight-change-child-girl"
         )
+
+
+# Child reports available from the API by name.
+REPORTS = {
+    "bmi-change": BMIChangeChildReport,
+    "diaperchange-amounts": DiaperChangeAmounts,
+    "diaperchange-intervals": DiaperChangeIntervalsChildReport,
+    "diaperchange-lifetimes": DiaperChangeLifetimesChildReport,
+    "diaperchange-types": DiaperChangeTypesChildReport,
+    "feeding-amounts": FeedingAmountsChildReport,
+    "feeding-duration": FeedingDurationChildReport,
+    "feeding-intervals": FeedingIntervalsChildReport,
+    "feeding-pattern": FeedingPatternChildReport,
+    "head-circumference-change": HeadCircumferenceChangeChildReport,
+    "height-change": HeightChangeChildReport,
+    "height-change-boy": HeightChangeChildBoyReport,
+    "height-change-girl": HeightChangeChildGirlReport,
+    "medication-adherence": MedicationAdherenceChildReport,
+    "pumping-amounts": PumpingAmounts,
+    "sleep-pattern": SleepPatternChildReport,
+    "sleep-totals": SleepTotalsChildReport,
+    "temperature-change": TemperatureChangeChildReport,
+    "tummytime-duration": TummyTimeDurationChildReport,
+    "weight-change": WeightChangeChildReport,
+    "weight-change-boy": WeightChangeChildBoyReport,
+    "weight-change-girl": WeightChangeChildGirlReport,
+}